@@ -0,0 +1,198 @@
+// Student Case 儀表板的瀏覽器端交叉篩選
+// 伺服器只在篩選器改變時傳送精簡彙總資料（類別 × 月份 × 產品 × 折扣 的營收），
+// 點選圖表後的重新彙總與繪圖都在瀏覽器內完成，不呼叫伺服器
+(function () {
+    // 圖表 id → 交叉篩選維度
+    const CHART_DIMENSIONS = {
+        'category-revenue-chart': 'category',
+        'monthly-revenue-chart': 'month',
+        'product-revenue-chart': 'product_name',
+        'discount-analysis-chart': 'discount'
+    };
+    const DIMENSIONS = ['category', 'month', 'product_name', 'discount'];
+    const MONTH_NAMES = ['January', 'February', 'March', 'April', 'May', 'June', 'July',
+                         'August', 'September', 'October', 'November', 'December'];
+    const COLOR = '#636efa';
+    const SELECTED_COLOR = '#ef553b';
+
+    function pointValue(dimension, point) {
+        if (dimension === 'category') {
+            return point.label;
+        }
+        if (dimension === 'month') {
+            return point.customdata;
+        }
+        if (dimension === 'product_name') {
+            return point.y;
+        }
+        return point.x;
+    }
+
+    // 依維度加總營收；套用其他維度的交叉篩選（自己的維度不篩選，只標示選取）
+    function totalsBy(aggregates, dimension, filter) {
+        const labels = aggregates.labels[dimension];
+        const sums = new Array(labels.length).fill(0);
+        const present = new Array(labels.length).fill(false);
+        const active = [];
+        DIMENSIONS.forEach(function (other) {
+            if (other !== dimension && filter[other] !== undefined && filter[other] !== null) {
+                active.push([aggregates.codes[other], aggregates.labels[other].indexOf(filter[other])]);
+            }
+        });
+
+        const codes = aggregates.codes[dimension];
+        const revenue = aggregates.revenue;
+        rows:
+        for (let i = 0; i < revenue.length; i++) {
+            for (let j = 0; j < active.length; j++) {
+                if (active[j][0][i] !== active[j][1]) {
+                    continue rows;
+                }
+            }
+            sums[codes[i]] += revenue[i];
+            present[codes[i]] = true;
+        }
+
+        // 缺失值（null）計入其他維度的加總，但不在圖表上顯示
+        const totals = [];
+        labels.forEach(function (label, i) {
+            if (present[i] && label !== null) {
+                totals.push({label: label, value: sums[i]});
+            }
+        });
+        return totals;
+    }
+
+    function emptyFigure(title) {
+        return {data: [], layout: {title: {text: title}}};
+    }
+
+    function monthlyFigure(totals, selected) {
+        const years = {};
+        totals.forEach(function (item) {
+            const year = item.label.slice(0, 4);
+            (years[year] = years[year] || []).push(item);
+        });
+        const data = Object.keys(years).sort().map(function (year) {
+            const items = years[year].sort(function (a, b) {
+                return a.label.localeCompare(b.label);
+            });
+            return {
+                type: 'scatter',
+                mode: 'lines+markers',
+                name: year,
+                x: items.map(function (item) { return MONTH_NAMES[parseInt(item.label.slice(5, 7), 10) - 1]; }),
+                y: items.map(function (item) { return item.value; }),
+                customdata: items.map(function (item) { return item.label; }),
+                marker: {size: items.map(function (item) { return item.label === selected ? 14 : 6; })}
+            };
+        });
+        return {
+            data: data,
+            layout: {
+                title: {text: '月度營收趨勢'},
+                xaxis: {title: {text: '月份'}, categoryorder: 'array', categoryarray: MONTH_NAMES},
+                yaxis: {title: {text: '營收 ($)'}},
+                legend: {title: {text: '年份'}}
+            }
+        };
+    }
+
+    function categoryFigure(totals, selected) {
+        return {
+            data: [{
+                type: 'pie',
+                labels: totals.map(function (item) { return item.label; }),
+                values: totals.map(function (item) { return item.value; }),
+                pull: totals.map(function (item) { return item.label === selected ? 0.1 : 0; })
+            }],
+            layout: {title: {text: '產品類別營收分布'}}
+        };
+    }
+
+    function productFigure(totals, selected) {
+        totals.sort(function (a, b) { return a.value - b.value; });
+        return {
+            data: [{
+                type: 'bar',
+                orientation: 'h',
+                x: totals.map(function (item) { return item.value; }),
+                y: totals.map(function (item) { return item.label; }),
+                marker: {color: totals.map(function (item) { return item.label === selected ? SELECTED_COLOR : COLOR; })}
+            }],
+            layout: {
+                title: {text: '產品營收排行'},
+                xaxis: {title: {text: '營收 ($)'}},
+                yaxis: {title: {text: '產品名稱'}}
+            }
+        };
+    }
+
+    function discountFigure(totals, selected) {
+        const maxValue = Math.max.apply(null, totals.map(function (item) { return item.value; }).concat([0]));
+        return {
+            data: [{
+                type: 'scatter',
+                mode: 'markers',
+                x: totals.map(function (item) { return item.label; }),
+                y: totals.map(function (item) { return item.value; }),
+                marker: {
+                    // 與 plotly express 的 size 相同：面積比例，最大 20 像素
+                    size: totals.map(function (item) { return item.value; }),
+                    sizemode: 'area',
+                    sizeref: maxValue > 0 ? 2 * maxValue / (20 * 20) : 1,
+                    color: totals.map(function (item) { return item.label === selected ? SELECTED_COLOR : COLOR; })
+                }
+            }],
+            layout: {
+                title: {text: '折扣與營收關係'},
+                xaxis: {title: {text: '折扣 (%)'}},
+                yaxis: {title: {text: '營收 ($)'}}
+            }
+        };
+    }
+
+    window.dash_clientside = Object.assign({}, window.dash_clientside, {
+        student_case: {
+            // 點選圖表切換該維度的交叉篩選（再點一次取消），或清除全部
+            update_cross_filter: function (categoryClick, monthClick, productClick, discountClick, clearClicks, current) {
+                const triggered = window.dash_clientside.callback_context.triggered;
+                if (!triggered.length) {
+                    return window.dash_clientside.no_update;
+                }
+                const source = triggered[0].prop_id.split('.')[0];
+                if (source === 'clear-cross-filter') {
+                    return {};
+                }
+                const dimension = CHART_DIMENSIONS[source];
+                const click = triggered[0].value;
+                if (!dimension || !click || !click.points || !click.points.length) {
+                    return window.dash_clientside.no_update;
+                }
+                const value = pointValue(dimension, click.points[0]);
+                const filter = Object.assign({}, current || {});
+                if (filter[dimension] === value) {
+                    delete filter[dimension];
+                } else {
+                    filter[dimension] = value;
+                }
+                return filter;
+            },
+
+            // 由彙總資料與交叉篩選繪製四張圖表
+            render_charts: function (aggregates, crossFilter) {
+                if (!aggregates) {
+                    return [emptyFigure('月度營收趨勢'), emptyFigure('產品類別營收分布'),
+                            emptyFigure('產品營收排行'), emptyFigure('折扣與營收關係')];
+                }
+                const filter = crossFilter || {};
+                return [
+                    monthlyFigure(totalsBy(aggregates, 'month', filter), filter.month),
+                    categoryFigure(totalsBy(aggregates, 'category', filter), filter.category),
+                    productFigure(totalsBy(aggregates, 'product_name', filter), filter.product_name),
+                    discountFigure(totalsBy(aggregates, 'discount', filter), filter.discount)
+                ];
+            }
+        }
+    });
+})();
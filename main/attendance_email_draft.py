@@ -1,5 +1,6 @@
-import pandas as pd
 from datetime import datetime
+from data_loader import load_sheet
+from attendance_tables import LATE_TABLE
 
 def generate_text_email_draft(late_attendees):
     """生成純文本格式的 Email 草稿"""
@@ -19,11 +20,7 @@ def generate_text_email_draft(late_attendees):
         return email_content
     
     # 生成純文本表格
-    table_text = "員工編號\t姓名\t\t日期\t\t\t簽到時間\t簽退時間\t狀態\t工作時數\n"
-    table_text += "-" * 80 + "\n"
-    
-    for _, row in late_attendees.iterrows():
-        table_text += f"{row['emp_id']}\t\t{row['name']:<8}\t{row['date']}\t{row['check_in']}\t\t{row['check_out']}\t\t{row['status']}\t\t{row['work_hours']}\n"
+    table_text = LATE_TABLE.render_text(late_attendees)
     
     # 生成 Email 內容
     today = datetime.now().strftime("%Y年%m月%d日")
@@ -49,7 +46,7 @@ def generate_text_email_draft(late_attendees):
 def main():
     """主函數"""
     # 讀取數據
-    df = pd.read_excel("../clean/attendance_clean.xlsx")
+    df = load_sheet("../clean/attendance_clean.xlsx", copy=False)
     
     # 找出遲到人員
     late_attendees = df[df['status'] == 'Late'].copy()
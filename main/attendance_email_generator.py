@@ -1,13 +1,13 @@
-import pandas as pd
 from datetime import datetime
 import os
+from data_loader import load_sheet
 
 def read_attendance_data():
     """讀取考勤數據"""
     try:
         # 讀取 Excel 文件
         file_path = "../clean/attendance_clean.xlsx"
-        df = pd.read_excel(file_path)
+        df = load_sheet(file_path, copy=False)
         print("成功讀取考勤數據")
         print(f"數據形狀: {df.shape}")
         print(f"列名: {list(df.columns)}")
@@ -0,0 +1,19 @@
+from table_renderer import TableColumn, TableRenderer
+
+# 遲到人員表格（gmail_attendance_email 與 attendance_email_draft 的 HTML、純文字草稿共用同一組欄位設定）
+LATE_TABLE = TableRenderer(
+    [
+        TableColumn('emp_id', '員工編號'),
+        TableColumn('name', '姓名', style='font-weight: bold;'),
+        TableColumn('date', '日期'),
+        TableColumn('check_in', '簽到時間'),
+        TableColumn('check_out', '簽退時間'),
+        # 遲到狀態以紅色標示
+        TableColumn('status', '狀態', highlight=lambda status: status == 'Late'),
+        TableColumn('work_hours', '工作時數')
+    ],
+    cell_padding='12px',
+    text_align='left',
+    text_header="員工編號\t姓名\t\t日期\t\t\t簽到時間\t簽退時間\t狀態\t工作時數",
+    text_row_template="{emp_id}\t\t{name:<8}\t{date}\t{check_in}\t\t{check_out}\t\t{status}\t\t{work_hours}"
+)
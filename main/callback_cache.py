@@ -0,0 +1,187 @@
+import os
+import pickle
+import hashlib
+import functools
+import threading
+from collections import OrderedDict
+from flask import jsonify
+
+# 預設保留的結果數量（記憶體 LRU）與共用磁碟快取的檔案數上限
+DEFAULT_MAX_ENTRIES = 128
+DEFAULT_MAX_DISK_ENTRIES = 1000
+
+# 共用磁碟快取目錄（選用）；多個伺服器 worker 指向同一目錄即可共用結果
+CALLBACK_CACHE_DIR = os.environ.get('CALLBACK_CACHE_DIR') or None
+
+class CallbackCache:
+    """
+    Dash 回調結果的 LRU 快取
+
+    - 鍵值為正規化後的篩選條件加上資料版本，資料更新後舊結果自動失效
+    - 記憶體層以 OrderedDict 實作 LRU，超過 max_entries 時淘汰最久未使用的結果
+    - 可選的磁碟層（pickle 檔）讓多個 worker 共用結果，檔案數超過上限時
+      依最後使用時間刪除
+    """
+
+    def __init__(self, name, max_entries=DEFAULT_MAX_ENTRIES, disk_dir=CALLBACK_CACHE_DIR,
+                 max_disk_entries=DEFAULT_MAX_DISK_ENTRIES):
+        """
+        Args:
+            name (str): 快取名稱（用於指標與磁碟檔名）
+            max_entries (int): 記憶體中最多保留的結果數
+            disk_dir (str 或 None): 共用磁碟快取目錄，None 表示不使用
+            max_disk_entries (int): 磁碟快取最多保留的檔案數
+        """
+        if max_entries < 1:
+            raise ValueError(f"max_entries 必須大於 0: {max_entries}")
+        self.name = name
+        self.max_entries = max_entries
+        self.disk_dir = disk_dir
+        self.max_disk_entries = max_disk_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'disk_hits': 0, 'evictions': 0}
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    def _disk_path(self, key):
+        digest = hashlib.sha1(repr(key).encode('utf-8')).hexdigest()
+        return os.path.join(self.disk_dir, f"{self.name}.{digest}.pkl")
+
+    def _load_from_disk(self, key):
+        cache_file = self._disk_path(key)
+        try:
+            with open(cache_file, 'rb') as f:
+                cached_key, value = pickle.load(f)
+        except Exception:
+            return None
+        if cached_key != key:
+            return None
+        # 更新修改時間，作為磁碟層的 LRU 依據
+        try:
+            os.utime(cache_file)
+        except OSError:
+            pass
+        return (value,)
+
+    def _save_to_disk(self, key, value):
+        cache_file = self._disk_path(key)
+        tmp_file = f"{cache_file}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_file, 'wb') as f:
+                pickle.dump((key, value), f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_file, cache_file)
+            self._trim_disk()
+        except Exception as e:
+            print(f"寫入回調快取失敗: {e}")
+            if os.path.exists(tmp_file):
+                os.remove(tmp_file)
+
+    def _trim_disk(self):
+        prefix = f"{self.name}."
+        files = [os.path.join(self.disk_dir, f) for f in os.listdir(self.disk_dir)
+                 if f.startswith(prefix) and f.endswith('.pkl')]
+        if len(files) <= self.max_disk_entries:
+            return
+        files.sort(key=lambda path: os.path.getmtime(path) if os.path.exists(path) else 0)
+        for path in files[:len(files) - self.max_disk_entries]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def _remember(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats['evictions'] += 1
+
+    def get_or_compute(self, key, compute):
+        """
+        取得快取結果，沒有時呼叫 compute() 計算並保存
+
+        Args:
+            key (tuple): 可 hash 的鍵值
+            compute (callable): 計算結果的函數
+        """
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self._stats['hits'] += 1
+                return self._entries[key]
+
+        if self.disk_dir:
+            cached = self._load_from_disk(key)
+            if cached is not None:
+                with self._lock:
+                    self._stats['disk_hits'] += 1
+                self._remember(key, cached[0])
+                return cached[0]
+
+        value = compute()
+        with self._lock:
+            self._stats['misses'] += 1
+        self._remember(key, value)
+        if self.disk_dir:
+            self._save_to_disk(key, value)
+        return value
+
+    def memoize(self, key_func):
+        """
+        回調函數的裝飾器
+
+        Args:
+            key_func (callable): 以回調參數產生鍵值的函數（負責正規化與資料版本）
+        """
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args):
+                key = (func.__name__,) + tuple(key_func(*args))
+                return self.get_or_compute(key, lambda: func(*args))
+            return wrapper
+        return decorator
+
+    def clear(self):
+        """
+        清空記憶體層（磁碟檔案保留，資料版本改變後不會再被使用）
+        """
+        with self._lock:
+            self._entries.clear()
+
+    def info(self):
+        """
+        回傳快取統計資訊
+        """
+        with self._lock:
+            lookups = self._stats['hits'] + self._stats['disk_hits'] + self._stats['misses']
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                **self._stats,
+                'hit_rate': round((self._stats['hits'] + self._stats['disk_hits']) / lookups, 4) if lookups else None,
+                'disk_dir': self.disk_dir
+            }
+
+def register_metrics_endpoint(app, caches, path='/metrics', extra=None):
+    """
+    在 Dash 應用的 Flask 伺服器註冊快取指標端點（JSON）
+
+    Args:
+        app (dash.Dash): Dash 應用
+        caches (list): CallbackCache 清單
+        path (str): 端點路徑
+        extra (dict): 其他指標 {名稱: 回傳 dict 的函數}，例如 data_loader.cache_info
+
+    註冊的快取也記錄在 app.metrics_caches，多頁面中心可彙整各頁面的快取指標
+    """
+    app.metrics_caches = list(caches)
+
+    def metrics():
+        result = {cache.name: cache.info() for cache in caches}
+        for name, func in (extra or {}).items():
+            result[name] = func()
+        return jsonify(result)
+
+    app.server.add_url_rule(path, endpoint=f"metrics{path.replace('/', '_')}", view_func=metrics)
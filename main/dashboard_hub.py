@@ -0,0 +1,181 @@
+import os
+import time
+import threading
+import importlib
+import flask
+import dash
+from dash import html
+import dash_bootstrap_components as dbc
+from data_loader import cache_info, evict_cache
+from data_watcher import LazyWatcher, DEFAULT_IDLE_SECONDS
+from callback_cache import register_metrics_endpoint
+
+# 中心的頁面：每個資料集一個頁面，共用同一個行程與 Flask 伺服器
+# module 需提供 create（建立儀表板）、build（建立資料狀態）與 WATCH_FILES
+PAGES = [
+    {'name': 'sales', 'path': '/sales/', 'title': '銷售資料分析',
+     'module': 'sales_analysis_dashboard', 'create': 'create_dashboard', 'build': 'build_dashboard_state'},
+    {'name': 'student_case', 'path': '/student-case/', 'title': 'Student Case Orders 分析',
+     'module': 'student_case_analysis_dashboard', 'create': 'create_dashboard', 'build': 'build_dashboard_state'},
+    {'name': 'orders', 'path': '/orders/', 'title': 'Student Case Orders（簡化版）',
+     'module': 'test_dashboard', 'create': 'create_simple_dashboard', 'build': 'load_dashboard_state'}
+]
+
+# 閒置資料集釋放的等待時間（秒），可由環境變數調整
+IDLE_SECONDS = float(os.environ.get('DASHBOARD_IDLE_SECONDS') or DEFAULT_IDLE_SECONDS)
+
+# 檢查閒置資料集的間隔上限（秒）
+EVICT_CHECK_SECONDS = 60.0
+
+def navbar(active_path=None):
+    """
+    各頁面共用的導覽列
+
+    各頁面是掛在同一個伺服器上的獨立 Dash 應用，頁面間以完整的連結切換
+    """
+    return dbc.NavbarSimple(
+        children=[
+            dbc.NavItem(dbc.NavLink(page['title'], href=page['path'], external_link=True,
+                                    active=page['path'] == active_path))
+            for page in PAGES
+        ],
+        brand="資料分析儀表板",
+        brand_href='/',
+        brand_external_link=True,
+        color='primary',
+        dark=True,
+        fluid=True,
+        className="mb-3"
+    )
+
+def page_layout(serve_layout, path):
+    """
+    包裝頁面版面：加上導覽列；資料載入失敗時顯示錯誤訊息而不是空白頁面
+    """
+    def layout():
+        # 共用伺服器的第一個請求會讓每個 Dash 應用都驗證一次版面；
+        # 不是這個頁面的請求只回傳導覽列，不載入資料
+        if flask.has_request_context() and not flask.request.path.startswith(path):
+            return html.Div([navbar(path)])
+        try:
+            content = serve_layout() if callable(serve_layout) else serve_layout
+        except Exception as e:
+            print(f"載入頁面 {path} 失敗: {e}")
+            content = dbc.Container(dbc.Alert(f"無法載入資料: {e}", color='danger'), fluid=True)
+        return html.Div([navbar(path), content])
+    return layout
+
+def evict_idle(watchers, now=None):
+    """
+    釋放閒置的資料集，並移除不再被任何已載入資料集使用的檔案快取
+
+    Returns:
+        list: 釋放的資料集名稱
+    """
+    evicted = [watcher for watcher in watchers if watcher.evict_if_idle(now)]
+    if evicted:
+        in_use = {path for watcher in watchers if watcher.loaded for path in watcher.paths}
+        evict_cache([path for watcher in evicted for path in watcher.paths if path not in in_use])
+    return [watcher.name for watcher in evicted]
+
+def start_evictor(watchers, idle_seconds=IDLE_SECONDS):
+    """
+    啟動背景執行緒定期釋放閒置的資料集
+    """
+    interval = min(EVICT_CHECK_SECONDS, max(idle_seconds / 4, 1.0))
+
+    def run():
+        while True:
+            time.sleep(interval)
+            try:
+                evict_idle(watchers)
+            except Exception as e:
+                print(f"釋放閒置資料集失敗: {e}")
+
+    thread = threading.Thread(target=run, name='dashboard-hub-evictor', daemon=True)
+    thread.start()
+    return thread
+
+def create_dashboard(idle_seconds=IDLE_SECONDS):
+    """
+    創建多頁面儀表板中心
+
+    每個資料集的儀表板以各自的路徑掛在同一個 Flask 伺服器上（元件 id 與
+    回調互不衝突），共用檔案快取與導覽列；首頁的 /metrics 彙整各資料集
+    的載入狀態與各頁面的回調快取指標。資料與索引在頁面第一次被開啟時
+    才載入，閒置超過 idle_seconds 後釋放。
+
+    Args:
+        idle_seconds (float): 閒置資料集釋放的等待時間（秒）
+
+    Returns:
+        dash.Dash: 首頁應用（app.server 為所有頁面共用的 Flask 伺服器）
+    """
+    app = dash.Dash(__name__, external_stylesheets=[dbc.themes.BOOTSTRAP])
+    watchers = {}
+    page_caches = []
+
+    for page in PAGES:
+        module = importlib.import_module(page['module'])
+        watcher = LazyWatcher(page['name'], module.WATCH_FILES, getattr(module, page['build']), idle_seconds)
+        page_app = getattr(module, page['create'])(server=app.server, url_base_pathname=page['path'],
+                                                   watcher=watcher)
+        page_app.layout = page_layout(page_app.layout, page['path'])
+        watchers[page['name']] = watcher
+        page_caches.extend(getattr(page_app, 'metrics_caches', []))
+
+    # 首頁：各資料集的連結與載入狀態（不觸發載入）
+    def serve_index():
+        cards = []
+        for page in PAGES:
+            info = watchers[page['name']].info()
+            status = (f"已載入（閒置 {info['idle_seconds'] or 0:.0f} 秒）" if info['loaded'] else "未載入")
+            cards.append(dbc.Col(dbc.Card([
+                dbc.CardBody([
+                    html.H4(page['title'], className="card-title"),
+                    html.P(status, className="card-text text-muted"),
+                    dbc.Button("開啟", href=page['path'], external_link=True, color='primary')
+                ])
+            ], className="text-center mb-3"), width=4))
+        return html.Div([
+            navbar('/'),
+            dbc.Container([
+                html.H1("資料分析儀表板", className="text-center mb-4"),
+                dbc.Row(cards)
+            ], fluid=True)
+        ])
+
+    app.layout = serve_index
+    register_metrics_endpoint(app, page_caches, extra={
+        'datasets': lambda: {name: watcher.info() for name, watcher in watchers.items()},
+        'data_loader': cache_info
+    })
+    start_evictor(list(watchers.values()), idle_seconds)
+
+    return app
+
+def prepare_snapshot():
+    """
+    預先寫入各資料集的啟動快照（多 worker 服務啟動前由主行程執行一次）
+    """
+    for page in PAGES:
+        module = importlib.import_module(page['module'])
+        if hasattr(module, 'prepare_snapshot'):
+            module.prepare_snapshot()
+
+def main():
+    """
+    主函數
+    """
+    print("開始創建多頁面儀表板中心...")
+    app = create_dashboard()
+
+    print("儀表板中心已創建完成！各資料集在第一次開啟頁面時才載入")
+    for page in PAGES:
+        print(f"  {page['title']}: http://127.0.0.1:8050{page['path']}")
+    print(f"閒置超過 {IDLE_SECONDS:.0f} 秒的資料集會自動釋放")
+
+    app.run(debug=False, host='127.0.0.1', port=8050)
+
+if __name__ == "__main__":
+    main()
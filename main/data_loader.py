@@ -0,0 +1,172 @@
+import os
+import pickle
+import hashlib
+import threading
+import pandas as pd
+
+# 行程內快取：(絕對路徑, 工作表) → (mtime_ns, 檔案大小, DataFrame)
+_memory_cache = {}
+_cache_lock = threading.Lock()
+_cache_stats = {'hits': 0, 'misses': 0, 'disk_hits': 0}
+
+# 磁碟快取目錄（選用）；也可用環境變數 DATA_CACHE_DIR 開啟
+_disk_cache_dir = os.environ.get('DATA_CACHE_DIR') or None
+
+def configure_disk_cache(directory):
+    """
+    開啟（或以 None 關閉）磁碟快取層
+
+    Args:
+        directory (str 或 None): 快取目錄
+    """
+    global _disk_cache_dir
+    _disk_cache_dir = directory
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+def _file_signature(path):
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+def file_version(path):
+    """
+    檔案版本識別（修改時間與大小），資料檔重新產生後即改變
+
+    Returns:
+        str: 例如 "1700000000000000000-12345"
+    """
+    mtime_ns, size = _file_signature(os.path.abspath(path))
+    return f"{mtime_ns}-{size}"
+
+def _disk_cache_path(path, sheet_name):
+    digest = hashlib.sha1(f"{path}|{sheet_name}".encode('utf-8')).hexdigest()[:16]
+    return os.path.join(_disk_cache_dir, f"{os.path.basename(path)}.{digest}.pkl")
+
+def _load_from_disk(path, sheet_name, signature):
+    cache_file = _disk_cache_path(path, sheet_name)
+    if not os.path.exists(cache_file):
+        return None
+    try:
+        with open(cache_file, 'rb') as f:
+            cached_signature, df = pickle.load(f)
+    except Exception:
+        return None
+    return df if cached_signature == signature else None
+
+def _save_to_disk(path, sheet_name, signature, df):
+    cache_file = _disk_cache_path(path, sheet_name)
+    tmp_file = f"{cache_file}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(_disk_cache_dir, exist_ok=True)
+        with open(tmp_file, 'wb') as f:
+            pickle.dump((signature, df), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_file, cache_file)
+    except Exception as e:
+        print(f"寫入磁碟快取失敗: {e}")
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+
+def _cached_load(path, cache_key, reader, copy, disk_enabled):
+    abs_path = os.path.abspath(path)
+    signature = _file_signature(abs_path)
+    key = (abs_path, cache_key)
+
+    with _cache_lock:
+        cached = _memory_cache.get(key)
+        if cached is not None and cached[:2] == signature:
+            _cache_stats['hits'] += 1
+            df = cached[2]
+            return df.copy() if copy else df
+
+    df = _load_from_disk(abs_path, cache_key, signature) if disk_enabled else None
+    if df is not None:
+        with _cache_lock:
+            _cache_stats['disk_hits'] += 1
+    else:
+        df = reader(abs_path)
+        with _cache_lock:
+            _cache_stats['misses'] += 1
+        if disk_enabled:
+            _save_to_disk(abs_path, cache_key, signature, df)
+
+    with _cache_lock:
+        _memory_cache[key] = (signature[0], signature[1], df)
+
+    return df.copy() if copy else df
+
+def load_sheet(path, sheet_name=0, copy=True, use_disk_cache=None):
+    """
+    讀取 Excel 工作表，同一執行期間重複讀取直接使用快取
+
+    快取鍵為 (檔案路徑, 工作表, 修改時間)；檔案被重新產生（修改時間或
+    大小改變）時自動失效並重新讀取。
+
+    Args:
+        path (str): Excel 檔案路徑
+        sheet_name (str 或 int): 工作表名稱或位置
+        copy (bool): 回傳副本，呼叫端修改資料不會影響快取；唯讀使用可設為 False
+        use_disk_cache (bool 或 None): 是否使用磁碟快取，None 表示依 configure_disk_cache 設定
+
+    Returns:
+        pd.DataFrame: 工作表資料
+    """
+    disk_enabled = _disk_cache_dir is not None if use_disk_cache is None else use_disk_cache
+    disk_enabled = disk_enabled and _disk_cache_dir is not None
+
+    return _cached_load(
+        path, sheet_name,
+        lambda abs_path: pd.read_excel(abs_path, sheet_name=sheet_name),
+        copy, disk_enabled
+    )
+
+def load_parquet(path, copy=True):
+    """
+    讀取 Parquet 檔（如物化的 OLAP cube），與 load_sheet 共用行程內快取
+
+    Parquet 本身讀取已很快，不使用磁碟快取層。
+
+    Args:
+        path (str): Parquet 檔案路徑
+        copy (bool): 回傳副本；唯讀使用可設為 False
+
+    Returns:
+        pd.DataFrame: 資料
+    """
+    return _cached_load(path, '__parquet__', pd.read_parquet, copy, False)
+
+def clear_cache():
+    """
+    清空行程內快取（磁碟快取檔案保留，會依修改時間自動失效）
+    """
+    with _cache_lock:
+        _memory_cache.clear()
+
+def evict_cache(paths):
+    """
+    從行程內快取移除指定檔案的所有工作表（資料集閒置釋放時使用）
+
+    Args:
+        paths (list): 檔案路徑
+
+    Returns:
+        int: 移除的項目數
+    """
+    abs_paths = {os.path.abspath(path) for path in paths}
+    with _cache_lock:
+        keys = [key for key in _memory_cache if key[0] in abs_paths]
+        for key in keys:
+            del _memory_cache[key]
+    return len(keys)
+
+def cache_info():
+    """
+    回傳快取統計資訊
+    """
+    with _cache_lock:
+        return {
+            'entries': len(_memory_cache),
+            'hits': _cache_stats['hits'],
+            'misses': _cache_stats['misses'],
+            'disk_hits': _cache_stats['disk_hits'],
+            'disk_cache_dir': _disk_cache_dir
+        }
@@ -0,0 +1,279 @@
+import os
+import hashlib
+import threading
+import time
+from dash import dcc, Input, Output, State, no_update
+from data_loader import file_version
+
+# 伺服器端檢查資料檔的間隔（秒）與瀏覽器端詢問資料版本的間隔（毫秒）
+DEFAULT_POLL_SECONDS = 5.0
+DEFAULT_PUSH_INTERVAL_MS = 10_000
+
+# 延遲載入的資料集閒置多久（秒）後釋放記憶體
+DEFAULT_IDLE_SECONDS = 15 * 60
+
+# 儀表板版面中保存資料版本的元件
+DATA_VERSION_STORE = 'data-version'
+DATA_VERSION_POLL = 'data-version-poll'
+
+def files_version(paths):
+    """
+    多個檔案的合併版本；不存在的檔案不列入（例如尚未物化的 cube）
+
+    Returns:
+        str: 版本識別字串
+    """
+    signatures = [(path, file_version(path)) for path in paths if os.path.exists(path)]
+    return hashlib.sha1(repr(signatures).encode('utf-8')).hexdigest()[:12]
+
+class DataWatcher:
+    """
+    監看清洗結果檔（clean/*.xlsx 與其 cube 檔），資料更新時在背景重新載入
+
+    - build(version) 產生完整的資料狀態（資料框、索引、圖表等）
+    - 新狀態建立完成後才以單一指派替換 (版本, 狀態)，替換是原子操作
+    - 回調開始時取得一次 current()，整個回調都使用同一份狀態，
+      重新載入期間進行中的請求不受影響也不需等待
+    - 載入失敗時保留舊狀態，下一次檢查再重試
+    """
+
+    def __init__(self, name, paths, build, poll_seconds=DEFAULT_POLL_SECONDS):
+        """
+        Args:
+            name (str): 資料集名稱（用於訊息輸出）
+            paths (list): 監看的檔案
+            build (callable): build(version) → 資料狀態；失敗時拋出例外
+            poll_seconds (float): 檢查檔案版本的間隔（秒）
+        """
+        self.name = name
+        self.paths = list(paths)
+        self.build = build
+        self.poll_seconds = poll_seconds
+        self._lock = threading.Lock()
+        self._reloading = False
+        self._stop = threading.Event()
+        self._thread = None
+
+        version = files_version(self.paths)
+        self._snapshot = (version, build(version))
+
+    @property
+    def snapshot(self):
+        """(版本, 狀態)"""
+        return self._snapshot
+
+    @property
+    def version(self):
+        return self._snapshot[0]
+
+    def current(self):
+        """
+        目前的資料狀態
+        """
+        return self._snapshot[1]
+
+    def check(self, wait=False):
+        """
+        檢查檔案版本，有變化時在背景執行緒重新載入
+
+        Args:
+            wait (bool): 是否等待重新載入完成
+
+        Returns:
+            bool: 是否開始重新載入
+        """
+        version = files_version(self.paths)
+        with self._lock:
+            if version == self._snapshot[0] or self._reloading:
+                return False
+            self._reloading = True
+
+        thread = threading.Thread(target=self._reload, args=(version,), name=f"{self.name}-reload", daemon=True)
+        thread.start()
+        if wait:
+            thread.join()
+        return True
+
+    def _reload(self, version):
+        started = time.perf_counter()
+        try:
+            state = self.build(version)
+        except Exception as e:
+            print(f"重新載入 {self.name} 失敗，繼續使用版本 {self._snapshot[0]}: {e}")
+        else:
+            # 檔案在載入期間再次變更時，下一次檢查會看到新的版本並再重新載入
+            self._snapshot = (version, state)
+            print(f"已重新載入 {self.name}（版本 {version}，{time.perf_counter() - started:.2f} 秒）")
+        finally:
+            with self._lock:
+                self._reloading = False
+
+    def start(self):
+        """
+        啟動背景監看執行緒
+        """
+        if self._thread is not None and self._thread.is_alive():
+            return self
+        self._stop.clear()
+
+        def watch():
+            while not self._stop.wait(self.poll_seconds):
+                try:
+                    self.check()
+                except Exception as e:
+                    print(f"檢查 {self.name} 資料版本失敗: {e}")
+
+        self._thread = threading.Thread(target=watch, name=f"{self.name}-watcher", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """
+        停止背景監看
+        """
+        self._stop.set()
+
+class LazyWatcher:
+    """
+    第一次使用時才載入的 DataWatcher，閒置超過 idle_seconds 後釋放
+
+    介面與 DataWatcher 相同（current、version、check、start、stop），
+    儀表板不需區分兩者；多頁面的儀表板中心以它讓每個資料集只在頁面
+    被開啟時才載入並佔用記憶體。
+
+    - current() 第一次呼叫時載入資料並啟動背景監看，每次呼叫都更新使用時間
+    - version 只回報已載入的版本（未載入時為 None），瀏覽器定期詢問版本
+      不會觸發載入，也不算使用
+    - evict_if_idle() 停止監看並釋放資料狀態，之後的 current() 重新載入
+    """
+
+    def __init__(self, name, paths, build, idle_seconds=DEFAULT_IDLE_SECONDS,
+                 poll_seconds=DEFAULT_POLL_SECONDS):
+        """
+        Args:
+            name (str): 資料集名稱（用於訊息輸出）
+            paths (list): 監看的檔案
+            build (callable): build(version) → 資料狀態；失敗時拋出例外
+            idle_seconds (float): 閒置多久後釋放
+            poll_seconds (float): 載入後檢查檔案版本的間隔（秒）
+        """
+        self.name = name
+        self.paths = list(paths)
+        self.build = build
+        self.idle_seconds = idle_seconds
+        self.poll_seconds = poll_seconds
+        self._lock = threading.Lock()
+        self._watcher = None
+        self._last_used = None
+        self._stats = {'loads': 0, 'evictions': 0}
+
+    def _loaded(self):
+        # 同時開啟頁面的請求等待同一次載入
+        with self._lock:
+            if self._watcher is None:
+                started = time.perf_counter()
+                watcher = DataWatcher(self.name, self.paths, self.build, self.poll_seconds).start()
+                # 先設定使用時間再公開 watcher，不取得鎖的 info() 不會讀到未設定的使用時間
+                self._last_used = time.monotonic()
+                self._watcher = watcher
+                self._stats['loads'] += 1
+                print(f"已載入 {self.name}（{time.perf_counter() - started:.2f} 秒）")
+            self._last_used = time.monotonic()
+            return self._watcher
+
+    @property
+    def loaded(self):
+        return self._watcher is not None
+
+    @property
+    def snapshot(self):
+        """(版本, 狀態)"""
+        return self._loaded().snapshot
+
+    @property
+    def version(self):
+        watcher = self._watcher
+        return None if watcher is None else watcher.version
+
+    def current(self):
+        """
+        目前的資料狀態（尚未載入或已釋放時先載入）
+        """
+        return self._loaded().current()
+
+    def check(self, wait=False):
+        """
+        已載入時檢查檔案版本（同 DataWatcher.check）
+        """
+        watcher = self._watcher
+        return False if watcher is None else watcher.check(wait)
+
+    def start(self):
+        """
+        背景監看在載入時才啟動
+        """
+        return self
+
+    def stop(self):
+        """
+        停止背景監看並釋放資料狀態
+        """
+        with self._lock:
+            if self._watcher is not None:
+                self._watcher.stop()
+                self._watcher = None
+
+    def evict_if_idle(self, now=None):
+        """
+        閒置超過 idle_seconds 時釋放資料狀態
+
+        Returns:
+            bool: 是否釋放
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            if self._watcher is None or now - self._last_used < self.idle_seconds:
+                return False
+            self._watcher.stop()
+            self._watcher = None
+            self._stats['evictions'] += 1
+        print(f"{self.name} 閒置超過 {self.idle_seconds:.0f} 秒，已釋放資料")
+        return True
+
+    def info(self):
+        """
+        回傳載入狀態與統計資訊
+        """
+        # 不取得鎖，載入期間也能立即回報
+        watcher, last_used = self._watcher, self._last_used
+        return {
+            'loaded': watcher is not None,
+            'version': None if watcher is None else watcher.version,
+            'idle_seconds': None if watcher is None or last_used is None else round(time.monotonic() - last_used, 1),
+            **self._stats
+        }
+
+def version_components(watcher, interval_ms=DEFAULT_PUSH_INTERVAL_MS):
+    """
+    版面中保存資料版本的元件（放入 layout）
+    """
+    return [
+        dcc.Store(id=DATA_VERSION_STORE, data=watcher.version),
+        dcc.Interval(id=DATA_VERSION_POLL, interval=interval_ms)
+    ]
+
+def register_version_push(app, watcher):
+    """
+    瀏覽器定期詢問資料版本，版本改變時才更新 DATA_VERSION_STORE；
+    以它為 Input 的回調會以新資料重新計算（LazyWatcher 尚未載入時不回應）
+    """
+    @app.callback(
+        Output(DATA_VERSION_STORE, 'data'),
+        Input(DATA_VERSION_POLL, 'n_intervals'),
+        State(DATA_VERSION_STORE, 'data')
+    )
+    def push_data_version(n_intervals, client_version):
+        version = watcher.version
+        return no_update if version is None or version == client_version else version
+
+    return push_data_version
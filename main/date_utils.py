@@ -0,0 +1,38 @@
+import pandas as pd
+
+# Excel 中日期欄位的顯示格式（儲存格仍為日期型別）
+EXCEL_DATE_FORMAT = 'YYYY-MM-DD'
+
+def to_date_column(series):
+    """
+    將日期欄位轉為 datetime64
+
+    - 已經是 datetime64 的欄位直接回傳，不重複解析
+    - 舊版清洗輸出的 YYYY-MM-DD 字串以固定格式一次解析
+    - 無法解析的值 → NaT
+    """
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return series
+    return pd.to_datetime(series, format='%Y-%m-%d', errors='coerce')
+
+def format_date(value):
+    """
+    將單一日期值格式化為 YYYY-MM-DD 字串，缺失值回傳空字串
+    """
+    if pd.isna(value):
+        return ''
+    return pd.Timestamp(value).strftime('%Y-%m-%d')
+
+def excel_writer(output_file):
+    """
+    建立保留日期型別的 ExcelWriter
+
+    日期欄位以 datetime 儲存格寫入並顯示為 YYYY-MM-DD，
+    讀回時 pd.read_excel 會直接得到 datetime64 欄位。
+    """
+    return pd.ExcelWriter(
+        output_file,
+        engine='openpyxl',
+        date_format=EXCEL_DATE_FORMAT,
+        datetime_format=EXCEL_DATE_FORMAT
+    )
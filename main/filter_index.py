@@ -0,0 +1,339 @@
+import numpy as np
+import pandas as pd
+
+# 預先彙總的分組欄位；'month' 為訂單日期所在月份
+DEFAULT_GROUP_COLUMNS = ['month', 'category', 'product_name', 'discount']
+
+# 金額區段的候選列少於日期區段的此比例時，才改以金額區段篩選
+# （金額區段的列位置是隨機存取，較少時才划算）
+AMOUNT_FIRST_RATIO = 0.125
+
+# to_arrays / from_arrays 直接保存的索引陣列（其餘由這些陣列推得）
+_INDEX_ARRAYS = ['order', 'sorted_dates', 'date_rank', 'category_by_date', 'amount_by_date',
+                 'amount_order', 'sorted_amount', 'month_bounds', '_slot_by_date', '_amount_values',
+                 '_row_combination', '_combination_sums', '_combination_counts',
+                 '_combination_category', '_combination_month']
+
+class OrderFilterIndex:
+    """
+    儀表板篩選器（類別、日期範圍、最小金額）的預建索引
+
+    - 訂單依日期排序一次，日期範圍以二分搜尋取得連續區段
+    - 類別轉成整數代碼，多選類別以查表一次判斷
+    - 金額另外排序，最小金額條件較嚴格時改以金額區段為候選列
+    - 篩選結果只是列位置陣列，不複製資料
+    - 預先計算每個 (類別, 月份, 各分組值) 組合的營收部分和；沒有金額條件時，
+      完整涵蓋的月份直接加總組合的部分和，只有日期範圍邊界的月份需要掃描明細
+    - 分組欄位的值條件（圖表交叉篩選）同樣以查表判斷
+    """
+
+    def __init__(self, df, date_column='order_date', category_column='category',
+                 amount_column='total_with_tax', group_columns=None):
+        """
+        Args:
+            df (pd.DataFrame): 訂單資料（不複製，建立後請勿修改）
+            date_column (str): 日期欄位（datetime）
+            category_column (str): 類別欄位
+            amount_column (str): 金額欄位
+            group_columns (list): 需要彙總的分組欄位，預設 DEFAULT_GROUP_COLUMNS
+        """
+        self.df = df
+        self.amount_column = amount_column
+        n_rows = len(df)
+
+        # 日期排序（NaT 排在最後）
+        dates = df[date_column].to_numpy(dtype='datetime64[ns]')
+        self.order = np.argsort(dates)
+        self.sorted_dates = dates[self.order]
+        self.n_dated = int((~np.isnat(self.sorted_dates)).sum())
+        self.date_rank = np.empty(n_rows, dtype=np.int64)
+        self.date_rank[self.order] = np.arange(n_rows)
+
+        # 類別代碼；缺失值使用最後一個位置
+        codes, self.categories = pd.factorize(df[category_column], sort=True)
+        codes = np.where(codes < 0, len(self.categories), codes)
+        self.category_by_date = codes[self.order]
+
+        # 金額（依日期排序的副本，以及另外排序的金額區段）
+        self.amount = df[amount_column].to_numpy(dtype=float)
+        self.amount_by_date = self.amount[self.order]
+        self.amount_order = np.argsort(self.amount)
+        self.sorted_amount = self.amount[self.amount_order]
+        self.n_amount = int((~np.isnan(self.amount)).sum())
+        self.amount_min = self.sorted_amount[0] if self.n_amount else np.nan
+
+        # 月份：依日期排序後每個月份是一段連續的列；NaT 為最後一段
+        month_ids = self.sorted_dates[:self.n_dated].astype('datetime64[M]').astype(np.int64)
+        boundaries = np.flatnonzero(np.diff(month_ids)) + 1
+        month_starts = np.concatenate([[0], boundaries]) if self.n_dated else np.array([], dtype=np.int64)
+        unique_ids = month_ids[month_starts]
+        self.months = pd.DatetimeIndex(unique_ids.astype('datetime64[M]').astype('datetime64[ns]'))
+        month_code = np.full(n_rows, len(unique_ids), dtype=np.int64)
+        month_code[:self.n_dated] = np.repeat(np.arange(len(unique_ids)), np.diff(np.append(month_starts, self.n_dated)))
+        self.month_bounds = np.append(month_starts, [self.n_dated, n_rows])
+
+        self.n_category_slots = len(self.categories) + 1
+        self.n_month_slots = len(unique_ids) + 1
+        self._slot_by_date = self.category_by_date * self.n_month_slots + month_code
+        self._amount_values = np.nan_to_num(self.amount_by_date)
+
+        self.groups = {}
+        for column in (group_columns or DEFAULT_GROUP_COLUMNS):
+            if column == 'month':
+                group_codes = np.where(month_code < len(unique_ids), month_code, -1)
+                labels = self.months
+            else:
+                group_codes, labels = pd.factorize(df[column], sort=True)
+                group_codes = group_codes[self.order]
+            self.groups[column] = {'codes': group_codes, 'labels': labels}
+        self._build_combinations()
+
+    def _build_combinations(self):
+        """
+        每個 (類別, 月份, 各分組值) 組合的營收和與筆數（每個資料版本建立一次）
+
+        組合數通常遠少於訂單數；分組值缺失時使用各欄位最後一個位置
+        """
+        keys = self._slot_by_date.astype(np.int64)
+        sizes = []
+        for column, group in self.groups.items():
+            n_slots = len(group['labels']) + 1
+            keys = keys * n_slots + np.where(group['codes'] < 0, n_slots - 1, group['codes'])
+            sizes.append(n_slots)
+
+        combination_keys, row_combination = np.unique(keys, return_inverse=True)
+        n_combinations = len(combination_keys)
+        code_dtype = np.int32 if n_combinations < np.iinfo(np.int32).max else np.int64
+        self._row_combination = row_combination.astype(code_dtype)
+        self._combination_sums = np.bincount(row_combination, weights=self._amount_values, minlength=n_combinations)
+        self._combination_counts = np.bincount(row_combination, minlength=n_combinations)
+
+        # 由組合鍵值還原各欄位的代碼
+        self._combination_codes = {}
+        remaining = combination_keys
+        for column, n_slots in zip(list(self.groups)[::-1], sizes[::-1]):
+            remaining, codes = np.divmod(remaining, n_slots)
+            self._combination_codes[column] = codes
+        self._combination_category, self._combination_month = np.divmod(remaining, self.n_month_slots)
+
+    def to_arrays(self, prefix=''):
+        """
+        匯出索引陣列（寫入啟動快照，供其他 worker 記憶體映射）
+
+        Args:
+            prefix (str): 陣列名稱前綴
+
+        Returns:
+            dict: {名稱: np.ndarray}
+        """
+        arrays = {name: getattr(self, name) for name in _INDEX_ARRAYS}
+        arrays['categories'] = np.asarray(self.categories)
+        arrays['months'] = self.months.to_numpy()
+        arrays['group_columns'] = np.array(list(self.groups), dtype=object)
+        for i, (column, group) in enumerate(self.groups.items()):
+            arrays[f'group{i}.codes'] = group['codes']
+            arrays[f'group{i}.labels'] = np.asarray(group['labels'])
+            arrays[f'group{i}.combination_codes'] = self._combination_codes[column]
+        return {prefix + name: array for name, array in arrays.items()}
+
+    @classmethod
+    def from_arrays(cls, df, arrays, prefix='', amount_column='total_with_tax'):
+        """
+        由 to_arrays 匯出的陣列還原索引（不重新排序或彙總）
+
+        Args:
+            df (pd.DataFrame): 建立索引時的訂單資料（可為快照映射的資料）
+            arrays (dict): load_snapshot_arrays 讀取的陣列
+            prefix (str): 陣列名稱前綴
+            amount_column (str): 金額欄位
+
+        Returns:
+            OrderFilterIndex: 還原的索引
+        """
+        index = cls.__new__(cls)
+        index.df = df
+        index.amount_column = amount_column
+        for name in _INDEX_ARRAYS:
+            setattr(index, name, arrays[prefix + name])
+        index.categories = pd.Index(arrays[prefix + 'categories'])
+        index.months = pd.DatetimeIndex(arrays[prefix + 'months'])
+        index.n_dated = int(index.month_bounds[-2])
+        index.n_amount = int((~np.isnan(index.sorted_amount)).sum())
+        index.amount_min = index.sorted_amount[0] if index.n_amount else np.nan
+        index.n_category_slots = len(index.categories) + 1
+        index.n_month_slots = len(index.months) + 1
+        index.groups = {}
+        index._combination_codes = {}
+        for i, column in enumerate(arrays[prefix + 'group_columns']):
+            labels = index.months if column == 'month' else pd.Index(arrays[f'{prefix}group{i}.labels'])
+            index.groups[column] = {'codes': arrays[f'{prefix}group{i}.codes'], 'labels': labels}
+            index._combination_codes[column] = arrays[f'{prefix}group{i}.combination_codes']
+        return index
+
+    def select(self, categories=None, start_date=None, end_date=None, min_amount=None, groups=None):
+        """
+        建立篩選條件（與儀表板原本的篩選邏輯相同）
+
+        Args:
+            categories (list): 選取的類別，空值表示不篩選
+            start_date, end_date: 日期範圍（含兩端），兩者都有值才篩選
+            min_amount (float): 最小金額，None 表示不篩選
+            groups (dict): 分組欄位的值條件 {欄位: 允許的值}（如圖表點選的交叉篩選），
+                'month' 的值為月初日期
+
+        Returns:
+            dict: 日期區段、類別查表、金額條件與分組查表
+        """
+        lo, hi = 0, len(self.df)
+        if start_date and end_date:
+            lo = int(np.searchsorted(self.sorted_dates[:self.n_dated], np.datetime64(pd.Timestamp(start_date)), side='left'))
+            hi = int(np.searchsorted(self.sorted_dates[:self.n_dated], np.datetime64(pd.Timestamp(end_date)), side='right'))
+            hi = max(hi, lo)
+
+        if categories:
+            category_lut = np.append(self.categories.isin(categories), False)
+        else:
+            category_lut = np.ones(self.n_category_slots, dtype=bool)
+
+        # 所有金額都不低於門檻時，金額條件不會排除任何列
+        if min_amount is not None and self.n_amount == len(self.df) and min_amount <= self.amount_min:
+            min_amount = None
+
+        # 分組條件：各分組值是否允許的查表，缺失值（代碼 -1）使用最後一個位置
+        group_luts = {}
+        for column, values in (groups or {}).items():
+            if column not in self.groups:
+                raise ValueError(f"未預先彙總的分組欄位: {column}（可用: {list(self.groups)}）")
+            labels = pd.Index(self.groups[column]['labels'])
+            group_luts[column] = np.append(labels.isin(list(values)), False)
+
+        return {'lo': lo, 'hi': hi, 'category_lut': category_lut, 'min_amount': min_amount,
+                'group_luts': group_luts, 'positions': None}
+
+    def _scan(self, selection, lo, hi):
+        # 在日期排序的區段內判斷類別與金額條件，回傳日期排序位置
+        mask = selection['category_lut'][self.category_by_date[lo:hi]]
+        if selection['min_amount'] is not None:
+            mask &= self.amount_by_date[lo:hi] >= selection['min_amount']
+        for column, lut in selection['group_luts'].items():
+            mask &= lut[self.groups[column]['codes'][lo:hi]]
+        return lo + np.flatnonzero(mask)
+
+    def positions(self, selection):
+        """
+        符合條件的列（日期排序位置）；同一個篩選條件只計算一次
+        """
+        if selection['positions'] is not None:
+            return selection['positions']
+        lo, hi, min_amount = selection['lo'], selection['hi'], selection['min_amount']
+        positions = None
+        if min_amount is not None:
+            start = int(np.searchsorted(self.sorted_amount[:self.n_amount], min_amount, side='left'))
+            if self.n_amount - start < (hi - lo) * AMOUNT_FIRST_RATIO:
+                # 金額條件較嚴格：以金額區段為候選列，再檢查日期與類別
+                candidates = np.sort(self.date_rank[self.amount_order[start:self.n_amount]])
+                candidates = candidates[np.searchsorted(candidates, lo):np.searchsorted(candidates, hi)]
+                positions = candidates[selection['category_lut'][self.category_by_date[candidates]]]
+                for column, lut in selection['group_luts'].items():
+                    positions = positions[lut[self.groups[column]['codes'][positions]]]
+        if positions is None:
+            positions = self._scan(selection, lo, hi)
+        selection['positions'] = positions
+        return positions
+
+    def rows(self, selection):
+        """
+        符合條件的列位置（原始資料框的位置，依日期排序）
+        """
+        return self.order[self.positions(selection)]
+
+    def mask(self, selection):
+        """
+        符合條件的布林遮罩（原始資料框順序）
+        """
+        mask = np.zeros(len(self.df), dtype=bool)
+        mask[self.rows(selection)] = True
+        return mask
+
+    def _combination_totals(self, selection):
+        """
+        篩選後每個組合的營收和與筆數
+
+        沒有金額條件時，完整落在日期區段內的月份直接使用組合的部分和，
+        只掃描日期區段頭尾的明細；有金額條件時掃描符合條件的明細
+        """
+        n_combinations = len(self._combination_sums)
+        lo, hi = selection['lo'], selection['hi']
+
+        if selection['min_amount'] is not None:
+            sums = np.zeros(n_combinations)
+            counts = np.zeros(n_combinations, dtype=np.int64)
+            boundary = [self.positions(selection)]
+        else:
+            # 完整落在日期區段內的月份（含 NaT 段）
+            starts, ends = self.month_bounds[:-1], self.month_bounds[1:]
+            covered = (starts >= lo) & (ends <= hi) & (ends > starts)
+            included = covered[self._combination_month] & selection['category_lut'][self._combination_category]
+            for column, lut in selection['group_luts'].items():
+                included &= lut[self._combination_codes[column]]
+            sums = np.where(included, self._combination_sums, 0.0)
+            counts = np.where(included, self._combination_counts, 0)
+
+            # 日期區段的頭尾（未完整涵蓋的月份）掃描明細
+            if covered.any():
+                first, last = np.flatnonzero(covered)[[0, -1]]
+                boundary = [self._scan(selection, lo, self.month_bounds[first]),
+                            self._scan(selection, self.month_bounds[last + 1], hi)]
+            else:
+                boundary = [self._scan(selection, lo, hi)]
+
+        positions = np.concatenate(boundary)
+        combinations = self._row_combination[positions]
+        sums = sums + np.bincount(combinations, weights=self._amount_values[positions], minlength=n_combinations)
+        counts = counts + np.bincount(combinations, minlength=n_combinations)
+        return sums, counts
+
+    def sum_by_groups(self, columns, selection, dropna=True):
+        """
+        依多個分組欄位加總金額，等同
+        filtered_df.groupby(columns, dropna=dropna)[金額].sum().reset_index()
+
+        Args:
+            columns (list): 分組欄位
+            selection (dict): select() 的篩選條件
+            dropna (bool): 是否排除分組值缺失的列；False 時缺失值的分組值為 None
+
+        Returns:
+            pd.DataFrame: 欄位 columns + [金額欄位]，依分組值排序（缺失值在最後）
+        """
+        for column in columns:
+            if column not in self.groups:
+                raise ValueError(f"未預先彙總的分組欄位: {column}（可用: {list(self.groups)}）")
+        combination_sums, combination_counts = self._combination_totals(selection)
+
+        # 只需合併有資料的組合（組合數遠少於明細列數）；缺失值為各欄位最後一個位置
+        valid = combination_counts > 0
+        keys = np.zeros(len(combination_sums), dtype=np.int64)
+        sizes = []
+        for column in columns:
+            codes = self._combination_codes[column]
+            n_slots = len(self.groups[column]['labels']) + 1
+            if dropna:
+                valid &= codes < n_slots - 1
+            keys = keys * n_slots + codes
+            sizes.append(n_slots)
+
+        unique_keys, inverse = np.unique(keys[valid], return_inverse=True)
+        sums = np.bincount(inverse, weights=combination_sums[valid], minlength=len(unique_keys))
+
+        result = {}
+        remaining = unique_keys
+        for column, n_slots in zip(columns[::-1], sizes[::-1]):
+            remaining, codes = np.divmod(remaining, n_slots)
+            labels = self.groups[column]['labels']
+            if dropna:
+                labels = np.asarray(labels)
+            else:
+                labels = np.append(pd.Index(labels).astype(object).to_numpy(), None)
+            result[column] = labels[codes]
+        return pd.DataFrame({**{column: result[column] for column in columns}, self.amount_column: sums})
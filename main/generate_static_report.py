@@ -5,15 +5,24 @@ from plotly.subplots import make_subplots
 import plotly.io as pio
 from datetime import datetime
 import os
+from date_utils import to_date_column
+from data_loader import load_sheet
+from heavy_hitters import top_items
+from olap_cube import get_cube
+from scatter_density import scatter_or_density
+
+# Same rows as load_and_analyze_data(): orders without a valid date are excluded
+VALID_DATES = {'date': pd.Series.notna}
 
 def load_and_analyze_data():
     """Load and analyze the orders_clean data"""
     try:
         # Load the data
-        df = pd.read_excel('clean/student_case_clean.xlsx', sheet_name='orders_clean')
+        df = load_sheet('clean/student_case_clean.xlsx', sheet_name='orders_clean')
         
-        # Convert date columns to datetime with error handling
-        df['order_date'] = pd.to_datetime(df['order_date'], errors='coerce')
+        # Cleaned files store order_date as a real date column; only legacy
+        # string columns are parsed here
+        df['order_date'] = to_date_column(df['order_date'])
         
         # Remove rows with invalid dates
         df = df.dropna(subset=['order_date'])
@@ -41,9 +50,10 @@ def load_and_analyze_data():
         print(f"Error loading data: {e}")
         return None, None
 
-def create_monthly_revenue_chart(df):
+def create_monthly_revenue_chart(cube):
     """Create monthly revenue chart"""
-    monthly_revenue = df.groupby('order_month')['total_with_tax'].sum().reset_index()
+    monthly_revenue = cube.query(by=['date'], filters=VALID_DATES, measures=['amount'], date_grain='M')
+    monthly_revenue = monthly_revenue.rename(columns={'date': 'order_month', 'amount': 'total_with_tax'})
     monthly_revenue['order_month'] = monthly_revenue['order_month'].astype(str)
     
     fig = px.line(monthly_revenue, x='order_month', y='total_with_tax',
@@ -53,9 +63,10 @@ def create_monthly_revenue_chart(df):
     
     return fig
 
-def create_category_revenue_chart(df):
+def create_category_revenue_chart(cube):
     """Create category revenue chart"""
-    category_revenue = df.groupby('category')['total_with_tax'].sum().sort_values(ascending=True)
+    category_revenue = cube.query(by=['category'], filters=VALID_DATES, measures=['amount'])
+    category_revenue = category_revenue.set_index('category')['amount'].sort_values(ascending=True)
     
     fig = px.bar(x=category_revenue.values, y=category_revenue.index, orientation='h',
                   title='Revenue by Category',
@@ -64,9 +75,10 @@ def create_category_revenue_chart(df):
     
     return fig
 
-def create_product_revenue_chart(df):
+def create_product_revenue_chart(cube):
     """Create top product revenue chart"""
-    product_revenue = df.groupby('product_name')['total_with_tax'].sum().sort_values(ascending=False).head(15)
+    product_totals = cube.query(by=['product'], filters=VALID_DATES, measures=['amount'])
+    product_revenue = top_items(product_totals, 'product', 'amount', 15)
     
     fig = px.bar(x=product_revenue.values, y=product_revenue.index, orientation='h',
                   title='Top 15 Products by Revenue',
@@ -77,11 +89,12 @@ def create_product_revenue_chart(df):
 
 def create_discount_analysis_chart(df):
     """Create discount analysis chart"""
-    # Create scatter plot of discount vs revenue
-    fig = px.scatter(df, x='discount', y='total_with_tax', 
-                      title='Discount vs Revenue Analysis',
-                      labels={'discount': 'Discount (%)', 'total_with_tax': 'Revenue ($)'})
-    fig.update_layout(height=500)
+    # One point per order while the report is small; above the point threshold
+    # the orders are binned into a discount x revenue grid on the server
+    fig = scatter_or_density(df, x='discount', y='total_with_tax',
+                             title='Discount vs Revenue Analysis',
+                             labels={'discount': 'Discount (%)', 'total_with_tax': 'Revenue ($)'},
+                             count_label='Orders', height=500)
     
     return fig
 
@@ -123,11 +136,15 @@ def generate_static_report():
     
     print("Generating charts...")
     
+    # Aggregate charts are answered from the materialized cube; only the
+    # discount scatter plot needs row-level orders
+    cube = get_cube('student_case', 'clean/student_case_clean.xlsx', df)
+    
     # Generate individual chart HTML files
     charts = {
-        'monthly_revenue': create_monthly_revenue_chart(df),
-        'category_revenue': create_category_revenue_chart(df),
-        'product_revenue': create_product_revenue_chart(df),
+        'monthly_revenue': create_monthly_revenue_chart(cube),
+        'category_revenue': create_category_revenue_chart(cube),
+        'product_revenue': create_product_revenue_chart(cube),
         'discount_analysis': create_discount_analysis_chart(df)
     }
     
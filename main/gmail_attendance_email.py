@@ -1,5 +1,6 @@
-import pandas as pd
 from datetime import datetime
+from data_loader import load_sheet
+from attendance_tables import LATE_TABLE
 
 def generate_gmail_email_draft(late_attendees):
     """生成適合 Gmail 的 HTML Email 草稿"""
@@ -19,42 +20,7 @@ def generate_gmail_email_draft(late_attendees):
         return email_content
     
     # 生成 Gmail 友好的 HTML 表格
-    table_html = """
-    <table style="width: 100%; border-collapse: collapse; margin: 20px 0; font-family: Arial, sans-serif;">
-        <thead>
-            <tr style="background-color: #f8f9fa; border: 1px solid #dee2e6;">
-                <th style="padding: 12px; text-align: left; border: 1px solid #dee2e6; font-weight: bold; color: #495057;">員工編號</th>
-                <th style="padding: 12px; text-align: left; border: 1px solid #dee2e6; font-weight: bold; color: #495057;">姓名</th>
-                <th style="padding: 12px; text-align: left; border: 1px solid #dee2e6; font-weight: bold; color: #495057;">日期</th>
-                <th style="padding: 12px; text-align: left; border: 1px solid #dee2e6; font-weight: bold; color: #495057;">簽到時間</th>
-                <th style="padding: 12px; text-align: left; border: 1px solid #dee2e6; font-weight: bold; color: #495057;">簽退時間</th>
-                <th style="padding: 12px; text-align: left; border: 1px solid #dee2e6; font-weight: bold; color: #495057;">狀態</th>
-                <th style="padding: 12px; text-align: left; border: 1px solid #dee2e6; font-weight: bold; color: #495057;">工作時數</th>
-            </tr>
-        </thead>
-        <tbody>
-    """
-    
-    for _, row in late_attendees.iterrows():
-        # 為遲到狀態添加特殊樣式
-        status_style = "color: #dc3545; font-weight: bold;" if row['status'] == 'Late' else ""
-        
-        table_html += f"""
-            <tr style="border: 1px solid #dee2e6;">
-                <td style="padding: 12px; border: 1px solid #dee2e6;">{row['emp_id']}</td>
-                <td style="padding: 12px; border: 1px solid #dee2e6; font-weight: bold;">{row['name']}</td>
-                <td style="padding: 12px; border: 1px solid #dee2e6;">{row['date']}</td>
-                <td style="padding: 12px; border: 1px solid #dee2e6;">{row['check_in']}</td>
-                <td style="padding: 12px; border: 1px solid #dee2e6;">{row['check_out']}</td>
-                <td style="padding: 12px; border: 1px solid #dee2e6; {status_style}">{row['status']}</td>
-                <td style="padding: 12px; border: 1px solid #dee2e6;">{row['work_hours']}</td>
-            </tr>
-        """
-    
-    table_html += """
-        </tbody>
-    </table>
-    """
+    table_html = LATE_TABLE.render_html(late_attendees)
     
     # 生成完整的 Gmail Email 內容
     today = datetime.now().strftime("%Y年%m月%d日")
@@ -87,20 +53,14 @@ def generate_gmail_plain_text(late_attendees):
         return "今日考勤報告：所有員工均準時到班，無遲到記錄。"
     
     # 生成純文本表格
-    table_text = "員工編號\t姓名\t\t日期\t\t\t簽到時間\t簽退時間\t狀態\t工作時數\n"
-    table_text += "-" * 80 + "\n"
-    
-    for _, row in late_attendees.iterrows():
-        table_text += f"{row['emp_id']}\t\t{row['name']:<8}\t{row['date']}\t{row['check_in']}\t\t{row['check_out']}\t\t{row['status']}\t\t{row['work_hours']}\n"
-    
-    return table_text
+    return LATE_TABLE.render_text(late_attendees)
 
 def main():
     """主函數"""
     print("=== Gmail 考勤 Email 生成器 ===\n")
     
     # 讀取數據
-    df = pd.read_excel("../clean/attendance_clean.xlsx")
+    df = load_sheet("../clean/attendance_clean.xlsx", copy=False)
     
     # 找出遲到人員
     late_attendees = df[df['status'] == 'Late'].copy()
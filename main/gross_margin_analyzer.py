@@ -2,17 +2,191 @@ import pandas as pd
 import numpy as np
 from datetime import datetime
 import os
+from data_loader import load_sheet
+from table_renderer import TableColumn, TableRenderer
+from key_join import KeyIndex
+from realized_margin import RealizedMarginEngine, summarize_sources
+from margin_alerts import ALERT_LABELS, DEFAULT_WORSENED_POINTS, load_snapshot, save_snapshot, diff_margins, summarize_changes
+
+# 建議售價的取整規則（皆為整欄向量運算）
+# cent: 四捨五入到小數兩位；integer: 無條件進位到整數；
+# x9: 進位到個位數為 9（如 NT$169）；nearest5: 四捨五入到 5 的倍數
+ROUNDING_RULES = {
+    'cent': lambda prices: np.round(prices, 2),
+    'integer': np.ceil,
+    'x9': lambda prices: np.ceil((prices + 1) / 10) * 10 - 1,
+    'nearest5': lambda prices: np.round(prices / 5) * 5
+}
+
+ROUNDING_NAMES = list(ROUNDING_RULES)
+
+# 實際毛利分析使用的銷售明細（來源名稱 → (檔案, 工作表)）
+REALIZED_SALES_FILES = {
+    'sales': ("../clean/sales_clean.xlsx", 0),
+    'student_case': ("../clean/student_case_clean.xlsx", 'orders_clean'),
+    'instructor_case': ("../clean/instructor_case_clean.xlsx", 'orders_clean')
+}
+
+# 毛利規則表的適用範圍：sku 規則優先於 category 規則，兩者都沒有時使用全域設定
+RULE_SCOPES = ['category', 'sku']
+
+def apply_price_rounding(prices, codes):
+    """
+    依每個產品的取整規則調整價格
+
+    Args:
+        prices (np.ndarray): 價格
+        codes (np.ndarray): 每個產品的規則代碼（ROUNDING_NAMES 的位置）
+
+    Returns:
+        np.ndarray: 取整後的價格；每種規則只做一次向量運算
+    """
+    result = np.array(prices, dtype=float)
+    for code, rule in enumerate(ROUNDING_RULES.values()):
+        mask = codes == code
+        if mask.any():
+            result[mask] = rule(result[mask])
+    return result
+
+def validate_margin_rules(rules):
+    """
+    檢查毛利規則表
+
+    規則表欄位：scope（category / sku）、key（類別或 SKU）、
+    target_margin（可留空，沿用上一層）、rounding（可留空，沿用上一層）
+
+    Returns:
+        pd.DataFrame: 整理後的規則表
+    """
+    rules = rules.copy()
+    for col in ['target_margin', 'rounding']:
+        if col not in rules.columns:
+            rules[col] = np.nan
+    missing = [col for col in ['scope', 'key'] if col not in rules.columns]
+    if missing:
+        raise ValueError(f"毛利規則表缺少欄位: {missing}")
+
+    rules['scope'] = rules['scope'].astype(str).str.strip().str.lower()
+    invalid_scope = sorted(set(rules['scope']) - set(RULE_SCOPES))
+    if invalid_scope:
+        raise ValueError(f"不支援的規則範圍: {invalid_scope}（可用: {RULE_SCOPES}）")
+
+    rules['target_margin'] = pd.to_numeric(rules['target_margin'], errors='coerce')
+    out_of_range = rules['target_margin'].notna() & ~rules['target_margin'].between(0, 1, inclusive='left')
+    if out_of_range.any():
+        raise ValueError(f"目標毛利率需介於 0 與 1 之間: {rules.loc[out_of_range, 'key'].tolist()}")
+
+    rounding = rules['rounding'].dropna().astype(str)
+    unknown = sorted(set(rounding) - set(ROUNDING_RULES))
+    if unknown:
+        raise ValueError(f"不支援的取整規則: {unknown}（可用: {ROUNDING_NAMES}）")
+    # 規則名稱轉為代碼，留空為 -1（沿用上一層）
+    rules['rounding_code'] = pd.Index(ROUNDING_NAMES).get_indexer(rules['rounding'])
+
+    duplicated = rules.duplicated(subset=['scope', 'key'], keep=False)
+    if duplicated.any():
+        keys = sorted(set(zip(rules.loc[duplicated, 'scope'], rules.loc[duplicated, 'key'].astype(str))))
+        raise ValueError(f"毛利規則重複: {keys}")
+
+    return rules
+
+# 低毛利產品表格：欄位依序顯示，資料中沒有的欄位自動略過
+LOW_MARGIN_TABLE = TableRenderer([
+    TableColumn('sku', 'SKU'),
+    TableColumn('name', '產品名稱'),
+    TableColumn('category', '類別'),
+    TableColumn('cost', '成本', kind='currency'),
+    TableColumn('price', '現行售價', kind='currency'),
+    # 低毛利用紅色標示
+    TableColumn('gross_margin_pct', '毛利率(%)', kind='percent', highlight=True),
+    TableColumn('target_margin_pct', '目標毛利率(%)', kind='percent'),
+    TableColumn('suggested_price', '建議售價', kind='currency')
+], font_size='12px')
+
+# 毛利變化警示表格：只列出與前次快照相比有變化的產品
+MARGIN_CHANGE_TABLE = TableRenderer([
+    # 新增低毛利與惡化用紅色標示，已恢復不標示
+    TableColumn('alert_label', '狀態', highlight=lambda values: values != ALERT_LABELS['recovered']),
+    TableColumn('sku', 'SKU'),
+    TableColumn('name', '產品名稱'),
+    TableColumn('category', '類別'),
+    TableColumn('previous_margin_pct', '前次毛利率(%)', kind='percent'),
+    TableColumn('gross_margin_pct', '毛利率(%)', kind='percent'),
+    TableColumn('margin_change', '變化(百分點)', kind='number'),
+    TableColumn('target_margin_pct', '目標毛利率(%)', kind='percent'),
+    TableColumn('suggested_price', '建議售價', kind='currency')
+], font_size='12px')
 
 class GrossMarginAnalyzer:
-    def __init__(self, target_margin=0.40):
+    def __init__(self, target_margin=0.40, price_rounding='cent', margin_rules=None):
         """
         初始化毛利分析器
         
         Args:
             target_margin (float): 目標毛利率，預設為 40%
+            price_rounding (str): 建議售價的預設取整規則（ROUNDING_RULES）
+            margin_rules (pd.DataFrame): 分類／SKU 毛利規則表，見 set_margin_rules
         """
+        if price_rounding not in ROUNDING_RULES:
+            raise ValueError(f"不支援的取整規則: {price_rounding}（可用: {ROUNDING_NAMES}）")
         self.target_margin = target_margin
+        self.price_rounding = price_rounding
+        self.margin_rules = None
         self.df = None
+        if margin_rules is not None:
+            self.set_margin_rules(margin_rules)
+    
+    def set_margin_rules(self, rules):
+        """
+        設定分類／SKU 毛利規則
+        
+        Args:
+            rules (pd.DataFrame): 欄位 scope、key、target_margin、rounding；
+                例如 (category, cables, 0.35, x9)、(sku, P001, 0.30, nearest5)
+        """
+        self.margin_rules = validate_margin_rules(rules)
+        counts = self.margin_rules['scope'].value_counts()
+        print(f"已載入毛利規則: 類別 {counts.get('category', 0)} 條，SKU {counts.get('sku', 0)} 條")
+    
+    def load_margin_rules(self, file_path):
+        """
+        從 Excel 載入毛利規則表
+        """
+        try:
+            self.set_margin_rules(load_sheet(file_path))
+            return True
+        except Exception as e:
+            print(f"載入毛利規則失敗: {e}")
+            return False
+    
+    def _product_rules(self, df):
+        """
+        以鍵值索引把規則表對應到每個產品，回傳 (目標毛利率, 取整規則代碼) 陣列
+        
+        每一層只做一次鍵值查詢（get_indexer），以 np.where 由全域 → 類別 → SKU 逐層覆寫。
+        """
+        targets = np.full(len(df), float(self.target_margin))
+        rounding = np.full(len(df), ROUNDING_NAMES.index(self.price_rounding), dtype=np.int8)
+        if self.margin_rules is None:
+            return targets, rounding
+        
+        for scope in RULE_SCOPES:
+            scope_rules = self.margin_rules[self.margin_rules['scope'] == scope]
+            if len(scope_rules) == 0 or scope not in df.columns:
+                continue
+            index = KeyIndex(scope_rules, 'key', name=f'毛利規則({scope})')
+            positions = index.positions(df[scope])
+            matched = positions >= 0
+            
+            rule_targets = index.dimension['target_margin'].to_numpy(dtype=float)[positions]
+            use_target = matched & ~np.isnan(rule_targets)
+            targets = np.where(use_target, rule_targets, targets)
+            
+            rule_rounding = index.dimension['rounding_code'].to_numpy(dtype=np.int8)[positions]
+            use_rounding = matched & (rule_rounding >= 0)
+            rounding = np.where(use_rounding, rule_rounding, rounding)
+        
+        return targets, rounding
         
     def load_products_data(self, file_path):
         """
@@ -22,7 +196,7 @@ class GrossMarginAnalyzer:
             file_path (str): 產品數據文件路徑
         """
         try:
-            self.df = pd.read_excel(file_path)
+            self.df = load_sheet(file_path)
             print(f"成功載入產品數據，共 {len(self.df)} 筆記錄")
             print(f"欄位: {list(self.df.columns)}")
             return True
@@ -54,10 +228,15 @@ class GrossMarginAnalyzer:
         # 轉換為百分比
         df_analysis['gross_margin_pct'] = df_analysis['gross_margin'] * 100
         
+        # 每個產品的目標毛利率與取整規則（全域 → 類別 → SKU）
+        targets, rounding = self._product_rules(df_analysis)
+        df_analysis['target_margin_pct'] = targets * 100
+        df_analysis['price_rounding'] = pd.Categorical.from_codes(rounding, categories=ROUNDING_NAMES)
+        
         # 計算建議售價
         df_analysis['suggested_price'] = np.where(
             (df_analysis['cost'].notna()) & (df_analysis['cost'] > 0),
-            np.round(df_analysis['cost'] / (1 - self.target_margin), 2),
+            apply_price_rounding(df_analysis['cost'].to_numpy(dtype=float) / (1 - targets), rounding),
             np.nan
         )
         
@@ -71,11 +250,113 @@ class GrossMarginAnalyzer:
         # 轉換為百分比
         df_analysis['suggested_margin_pct'] = df_analysis['suggested_margin'] * 100
         
-        # 標記低毛利產品
-        df_analysis['low_margin_flag'] = df_analysis['gross_margin_pct'] < (self.target_margin * 100)
+        # 標記低毛利產品（依各產品自己的目標毛利率）
+        df_analysis['low_margin_flag'] = df_analysis['gross_margin_pct'] < df_analysis['target_margin_pct']
         
         return df_analysis
     
+    def sweep(self, targets):
+        """
+        一次評估多個目標毛利率情境（情境目標套用於所有產品，取代類別／SKU 目標）
+        
+        產品依現行毛利率排序一次後，低於目標 t 的產品恰為排序後的前綴，
+        各情境只需 searchsorted 找出前綴長度並讀取累積和，
+        不需為每個情境複製數據框或重跑 calculate_gross_margin。
+        
+        Args:
+            targets (list): 目標毛利率清單，例如 [0.30, 0.35, 0.40]
+            
+        Returns:
+            pd.DataFrame: 每個情境一列，欄位：
+                target_margin、low_margin_count（低於目標的產品數）、
+                current_revenue（低毛利產品現行售價合計）、
+                suggested_revenue（調整至建議售價後合計）、revenue_uplift
+                
+        Note:
+            suggested_revenue 以未四捨五入的建議售價（成本 / (1 - 目標)）加總，
+            與逐項四捨五入到小數兩位的合計相差不超過 0.005 × 產品數。
+        """
+        arrays = self._sweep_arrays(targets)
+        if arrays is None:
+            return None
+        targets, counts, order, cost, price, _ = arrays
+        
+        # 前綴累積和：cumulative[k] 為毛利率最低的 k 個產品合計
+        cumulative_price = np.concatenate([[0.0], np.cumsum(price[order])])
+        cumulative_cost = np.concatenate([[0.0], np.cumsum(cost[order])])
+        
+        current_revenue = cumulative_price[counts]
+        suggested_revenue = cumulative_cost[counts] / (1 - targets)
+        
+        return pd.DataFrame({
+            'target_margin': targets,
+            'target_margin_pct': targets * 100,
+            'low_margin_count': counts,
+            'current_revenue': current_revenue,
+            'suggested_revenue': suggested_revenue,
+            'revenue_uplift': suggested_revenue - current_revenue
+        })
+    
+    def sweep_details(self, targets):
+        """
+        各情境低於目標毛利率的產品明細（長表，情境內依毛利率由低到高）
+        
+        情境目標套用於所有產品（取代類別／SKU 目標），建議售價仍依各產品的取整規則。
+        
+        Args:
+            targets (list): 目標毛利率清單
+            
+        Returns:
+            pd.DataFrame: 每個 (情境, 低毛利產品) 一列，含建議售價與售價提升金額
+        """
+        arrays = self._sweep_arrays(targets)
+        if arrays is None:
+            return None
+        targets, counts, order, cost, price, margin = arrays
+        
+        # 每個情境取排序後的前 counts[i] 個產品
+        product_pos = np.concatenate([order[:count] for count in counts]) if len(counts) else np.array([], dtype=np.int64)
+        scenario_targets = np.repeat(targets, counts)
+        
+        id_columns = [col for col in ['sku', 'name', 'category', 'cost', 'price'] if col in self.df.columns]
+        details = self.df[id_columns].iloc[product_pos].reset_index(drop=True)
+        details.insert(0, 'target_margin', scenario_targets)
+        details['gross_margin_pct'] = margin[product_pos] * 100
+        _, rounding = self._product_rules(self.df)
+        details['suggested_price'] = apply_price_rounding(cost[product_pos] / (1 - scenario_targets), rounding[product_pos])
+        details['price_uplift'] = details['suggested_price'] - price[product_pos]
+        return details
+    
+    def _sweep_arrays(self, targets):
+        """
+        計算現行毛利率的排序與各情境的低毛利產品數
+        
+        Returns:
+            tuple: (targets, 各情境低毛利產品數, 依毛利率排序的產品位置, 成本, 售價, 毛利率)
+        """
+        if self.df is None:
+            print("請先載入產品數據")
+            return None
+        
+        targets = np.asarray(targets, dtype=float).ravel()
+        if ((targets < 0) | (targets >= 1)).any():
+            raise ValueError(f"目標毛利率需介於 0 與 1 之間: {targets.tolist()}")
+        
+        cost = self.df['cost'].to_numpy(dtype=float)
+        price = self.df['price'].to_numpy(dtype=float)
+        
+        # 與 calculate_gross_margin 相同的有效條件；毛利率缺失的產品不會被標為低毛利
+        with np.errstate(divide='ignore', invalid='ignore'):
+            margin = np.where(~np.isnan(price) & ~np.isnan(cost) & (price > 0), (price - cost) / price, np.nan)
+        
+        valid_pos = np.flatnonzero(~np.isnan(margin))
+        order = valid_pos[np.argsort(margin[valid_pos], kind='stable')]
+        
+        # 毛利率 < 目標 的產品數（嚴格小於，與 low_margin_flag 一致）
+        counts = np.searchsorted(margin[order], targets, side='left')
+        
+        return targets, counts, order, cost, price, margin
+    
     def generate_margin_report(self, output_file=None):
         """
         生成毛利報表
@@ -93,7 +374,7 @@ class GrossMarginAnalyzer:
         # 生成報表摘要
         print("\n=== 毛利分析報表 ===")
         print(f"分析日期: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-        print(f"目標毛利率: {self.target_margin * 100:.1f}%")
+        print(f"目標毛利率: {self._target_description()}")
         print(f"總產品數: {len(df_analysis)}")
         
         # 統計有效數據
@@ -120,11 +401,14 @@ class GrossMarginAnalyzer:
         
         # 低毛利產品明細
         if low_margin_count > 0:
-            print(f"\n=== 低毛利產品明細 (毛利率 < {self.target_margin * 100:.1f}%) ===")
+            target_text = "各產品目標毛利率" if self.margin_rules is not None else self._target_description()
+            print(f"\n=== 低毛利產品明細 (毛利率 < {target_text}) ===")
             low_margin_products = df_analysis[df_analysis['low_margin_flag']].copy()
             low_margin_products = low_margin_products.sort_values('gross_margin_pct')
             
             display_columns = ['sku', 'name', 'category', 'cost', 'price', 'gross_margin_pct', 'suggested_price']
+            if self.margin_rules is not None:
+                display_columns[6:6] = ['target_margin_pct', 'price_rounding']
             available_columns = [col for col in display_columns if col in low_margin_products.columns]
             
             print(low_margin_products[available_columns].to_string(index=False))
@@ -139,6 +423,22 @@ class GrossMarginAnalyzer:
         
         return df_analysis
     
+    def save_realized_margin(self, realized_summary, output_file, sheet_name="Realized_Margin"):
+        """
+        將實際毛利摘要寫入毛利報表的獨立工作表（取代同名的舊工作表）
+        
+        Args:
+            realized_summary (pd.DataFrame): summarize_sources() 的結果
+            output_file (str): 毛利報表路徑（generate_margin_report 已寫入）
+            sheet_name (str): 工作表名稱
+        """
+        try:
+            with pd.ExcelWriter(output_file, engine='openpyxl', mode='a', if_sheet_exists='replace') as writer:
+                realized_summary.to_excel(writer, sheet_name=sheet_name, index=False)
+            print(f"實際毛利已寫入: {output_file}（{sheet_name}）")
+        except Exception as e:
+            print(f"寫入實際毛利失敗: {e}")
+    
     def generate_low_margin_email(self, df_analysis=None):
         """
         生成低毛利警示Email
@@ -165,7 +465,7 @@ class GrossMarginAnalyzer:
 各位好，
 
 今日毛利分析報告：
-✅ 所有產品毛利率均達到目標標準 ({self.target_margin * 100:.1f}%)
+✅ 所有產品毛利率均達到目標標準 ({self._target_description()})
 ✅ 無需調整售價的產品
 
 如有任何問題，請隨時聯繫。
@@ -174,8 +474,8 @@ class GrossMarginAnalyzer:
             """
             return email_content
         
-        # 生成低毛利產品表格
-        table_html = self._generate_email_table(low_margin_products)
+        # 生成低毛利產品表格（純文字版本）
+        table_text = self._generate_text_table(low_margin_products)
         
         # 生成Email內容
         today = datetime.now().strftime("%Y年%m月%d日")
@@ -188,10 +488,10 @@ class GrossMarginAnalyzer:
 以下是 {today} 毛利分析報告：
 
 ⚠️ **低毛利產品警示**
-目標毛利率：{self.target_margin * 100:.1f}%
+目標毛利率：{self._target_description()}
 發現 {len(low_margin_products)} 個產品毛利率過低，需要關注：
 
-{table_html}
+{table_text}
 
 📊 **建議行動：**
 1. 檢視低毛利產品的成本結構
@@ -216,78 +516,36 @@ class GrossMarginAnalyzer:
         Returns:
             str: HTML表格
         """
-        # 選擇要顯示的欄位
-        display_columns = ['sku', 'name', 'category', 'cost', 'price', 'gross_margin_pct', 'suggested_price']
-        available_columns = [col for col in display_columns if col in low_margin_products.columns]
-        
-        # 重新命名欄位為中文
-        column_mapping = {
-            'sku': 'SKU',
-            'name': '產品名稱',
-            'category': '類別',
-            'cost': '成本',
-            'price': '現行售價',
-            'gross_margin_pct': '毛利率(%)',
-            'suggested_price': '建議售價'
-        }
-        
-        # 生成表格HTML
-        table_html = """
-        <table style="width: 100%; border-collapse: collapse; margin: 20px 0; font-family: Arial, sans-serif; font-size: 12px;">
-            <thead>
-                <tr style="background-color: #f8f9fa; border: 1px solid #dee2e6;">
-        """
-        
-        # 表頭
-        for col in available_columns:
-            col_name = column_mapping.get(col, col)
-            table_html += f'<th style="padding: 8px; text-align: center; border: 1px solid #dee2e6; font-weight: bold; color: #495057;">{col_name}</th>'
-        
-        table_html += """
-                </tr>
-            </thead>
-            <tbody>
-        """
-        
-        # 表格內容
-        for _, row in low_margin_products.iterrows():
-            table_html += '<tr style="border: 1px solid #dee2e6;">'
-            
-            for col in available_columns:
-                value = row[col]
-                
-                # 格式化數值
-                if col in ['cost', 'price', 'suggested_price']:
-                    if pd.notna(value):
-                        formatted_value = f"${value:,.2f}"
-                    else:
-                        formatted_value = "N/A"
-                elif col == 'gross_margin_pct':
-                    if pd.notna(value):
-                        formatted_value = f"{value:.2f}%"
-                        # 低毛利用紅色標示
-                        cell_style = "color: #dc3545; font-weight: bold;"
-                    else:
-                        formatted_value = "N/A"
-                        cell_style = ""
-                else:
-                    formatted_value = str(value) if pd.notna(value) else "N/A"
-                    cell_style = ""
-                
-                # 應用樣式
-                if 'cell_style' in locals():
-                    table_html += f'<td style="padding: 8px; text-align: center; border: 1px solid #dee2e6; {cell_style}">{formatted_value}</td>'
-                else:
-                    table_html += f'<td style="padding: 8px; text-align: center; border: 1px solid #dee2e6;">{formatted_value}</td>'
-            
-            table_html += '</tr>'
-        
-        table_html += """
-            </tbody>
-        </table>
+        return LOW_MARGIN_TABLE.render_html(self._email_table_data(low_margin_products))
+    
+    def _generate_text_table(self, low_margin_products):
         """
+        生成純文字表格
         
-        return table_html
+        Args:
+            low_margin_products (pd.DataFrame): 低毛利產品數據
+            
+        Returns:
+            str: 純文字表格
+        """
+        return LOW_MARGIN_TABLE.render_text(self._email_table_data(low_margin_products))
+    
+    def _email_table_data(self, low_margin_products):
+        """
+        沒有設定毛利規則時所有產品目標相同，表格不顯示目標毛利率欄位
+        """
+        if self.margin_rules is None:
+            return low_margin_products.drop(columns=['target_margin_pct'], errors='ignore')
+        return low_margin_products
+    
+    def _target_description(self):
+        """
+        目標毛利率說明文字
+        """
+        description = f"{self.target_margin * 100:.1f}%"
+        if self.margin_rules is not None:
+            description += f"（另有 {len(self.margin_rules)} 條類別／SKU 規則）"
+        return description
     
     def generate_gmail_email(self, df_analysis=None):
         """
@@ -319,7 +577,7 @@ class GrossMarginAnalyzer:
     <div style="background-color: #d4edda; border: 1px solid #c3e6cb; border-radius: 5px; padding: 15px; margin: 20px 0;">
         <h3 style="color: #155724; margin: 0;">今日毛利分析報告</h3>
         <p style="margin: 10px 0 0 0; color: #155724;">
-            ✅ 所有產品毛利率均達到目標標準 ({self.target_margin * 100:.1f}%)<br>
+            ✅ 所有產品毛利率均達到目標標準 ({self._target_description()})<br>
             ✅ 無需調整售價的產品
         </p>
     </div>
@@ -349,7 +607,7 @@ class GrossMarginAnalyzer:
     <div style="background-color: #fff3cd; border: 1px solid #ffeaa7; border-radius: 5px; padding: 15px; margin: 20px 0;">
         <h3 style="color: #856404; margin: 0;">⚠️ 低毛利產品警示</h3>
         <p style="margin: 10px 0 0 0; color: #856404;">
-            <strong>目標毛利率：{self.target_margin * 100:.1f}%</strong><br>
+            <strong>目標毛利率：{self._target_description()}</strong><br>
             發現 <strong>{len(low_margin_products)}</strong> 個產品毛利率過低，需要關注
         </p>
     </div>
@@ -374,6 +632,147 @@ class GrossMarginAnalyzer:
         
         return email_content
 
+    def detect_margin_changes(self, df_analysis, snapshot_file, worsened_points=DEFAULT_WORSENED_POINTS):
+        """
+        與前次毛利快照比對，找出需要警示的變化
+        
+        Args:
+            df_analysis (pd.DataFrame): 本次分析結果
+            snapshot_file (str): 快照檔路徑；不存在時視為第一次執行
+            worsened_points (float): 仍為低毛利時，毛利率下降超過此百分點視為惡化
+            
+        Returns:
+            pd.DataFrame: 有變化的產品（alert_type: newly_low / worsened / recovered）
+        """
+        previous = load_snapshot(snapshot_file)
+        if previous is None:
+            print(f"找不到毛利快照 {snapshot_file}，本次所有低毛利產品視為新增")
+        changes = diff_margins(previous, df_analysis, worsened_points)
+        
+        counts = summarize_changes(changes)
+        print("毛利變化: " + "、".join(f"{ALERT_LABELS[alert]} {count} 個" for alert, count in counts.items()))
+        return changes
+    
+    def save_margin_snapshot(self, df_analysis, snapshot_file):
+        """
+        保存本次毛利快照，供下次執行比對
+        """
+        snapshot = save_snapshot(df_analysis, snapshot_file)
+        print(f"毛利快照已保存至: {snapshot_file}（{len(snapshot)} 個 SKU）")
+    
+    def _change_table_data(self, changes):
+        data = self._email_table_data(changes)
+        return data.assign(alert_label=changes['alert_type'].astype(object).map(ALERT_LABELS))
+    
+    def _change_summary(self, changes):
+        counts = summarize_changes(changes)
+        return "、".join(f"{ALERT_LABELS[alert]} {count} 個" for alert, count in counts.items() if count)
+    
+    def generate_change_alert_email(self, changes):
+        """
+        生成毛利變化警示Email（純文字），只包含有變化的產品
+        
+        Args:
+            changes (pd.DataFrame): detect_margin_changes() 結果
+            
+        Returns:
+            str: Email內容；沒有變化時為「毛利狀態無變化」的通知
+        """
+        today = datetime.now().strftime("%Y年%m月%d日")
+        if len(changes) == 0:
+            return f"""
+主旨：毛利狀態無變化 ({today})
+
+內容：
+各位好，
+
+{today} 的分析與前次相比，所有產品的毛利狀態都沒有變化，本次沒有需要警示的產品。
+目標毛利率：{self._target_description()}
+
+如有任何問題，請隨時聯繫。
+
+謝謝！
+"""
+        
+        table_text = MARGIN_CHANGE_TABLE.render_text(self._change_table_data(changes))
+        email_content = f"""
+主旨：毛利變化警示 ({today})
+
+內容：
+各位好，
+
+以下是 {today} 與前次分析相比毛利狀態有變化的產品：
+目標毛利率：{self._target_description()}
+{self._change_summary(changes)}
+
+{table_text}
+未列出的產品毛利狀態與前次相同。
+
+如有任何問題，請隨時聯繫。
+
+謝謝！
+        """
+        return email_content
+    
+    def generate_change_alert_gmail(self, changes):
+        """
+        生成毛利變化警示的Gmail HTML Email，只包含有變化的產品
+        
+        Args:
+            changes (pd.DataFrame): detect_margin_changes() 結果
+            
+        Returns:
+            str: Gmail格式的Email內容；沒有變化時為「毛利狀態無變化」的通知
+        """
+        today = datetime.now().strftime("%Y年%m月%d日")
+        if len(changes) == 0:
+            return f"""
+<div style="font-family: Arial, sans-serif; line-height: 1.6; color: #333; max-width: 800px; margin: 0 auto;">
+    <h2 style="color: #28a745; border-bottom: 2px solid #28a745; padding-bottom: 10px;">
+        ✅ 毛利狀態無變化
+    </h2>
+    
+    <p>各位好，</p>
+    
+    <p><strong>{today}</strong> 的分析與前次相比，所有產品的毛利狀態都沒有變化，本次沒有需要警示的產品。</p>
+    
+    <p>目標毛利率：{self._target_description()}</p>
+    
+    <p>如有任何問題，請隨時聯繫。</p>
+    
+    <p>謝謝！</p>
+</div>
+        """
+        
+        table_html = MARGIN_CHANGE_TABLE.render_html(self._change_table_data(changes))
+        email_content = f"""
+<div style="font-family: Arial, sans-serif; line-height: 1.6; color: #333; max-width: 800px; margin: 0 auto;">
+    <h2 style="color: #dc3545; border-bottom: 2px solid #dc3545; padding-bottom: 10px;">
+        ⚠️ 毛利變化警示
+    </h2>
+    
+    <p>各位好，</p>
+    
+    <p>以下是 <strong>{today}</strong> 與前次分析相比毛利狀態有變化的產品：</p>
+    
+    <div style="background-color: #fff3cd; border: 1px solid #ffeaa7; border-radius: 5px; padding: 15px; margin: 20px 0;">
+        <p style="margin: 0; color: #856404;">
+            <strong>目標毛利率：{self._target_description()}</strong><br>
+            {self._change_summary(changes)}
+        </p>
+    </div>
+    
+    {table_html}
+    
+    <p>未列出的產品毛利狀態與前次相同。</p>
+    
+    <p>如有任何問題，請隨時聯繫。</p>
+    
+    <p>謝謝！</p>
+</div>
+        """
+        return email_content
+
 def main():
     """主程式"""
     print("=== 毛利分析器 ===\n")
@@ -397,29 +796,65 @@ def main():
         print("生成報表失敗")
         return
     
-    # 生成Email草稿
+    # 目標毛利率情境分析
+    print("\n=== 目標毛利率情境分析 ===")
+    scenarios = analyzer.sweep([0.30, 0.35, 0.40, 0.45, 0.50])
+    print(scenarios.round(2).to_string(index=False))
+    
+    # 實際毛利（銷售明細 × 產品成本），各來源分開計算；對應率過低的來源只輸出警告
+    realized_engines = {}
+    for source, (sales_file, sheet_name) in REALIZED_SALES_FILES.items():
+        try:
+            lines = load_sheet(sales_file, sheet_name=sheet_name, copy=False)
+        except Exception as e:
+            print(f"讀取銷售明細失敗（{sales_file}）: {e}")
+            continue
+        realized = RealizedMarginEngine(df_analysis)
+        realized.add_lines_chunked(lines, source)
+        realized.report(source)
+        realized_engines[source] = realized
+    
+    realized_summary = summarize_sources(realized_engines)
+    if len(realized_summary) > 0:
+        analyzer.save_realized_margin(realized_summary, "gross_margin_report.xlsx")
+    else:
+        print("沒有可對應到產品成本的銷售明細，不寫入實際毛利工作表")
+    
+    # 與前次快照比對，只針對有變化的產品生成Email草稿
+    # （沒有變化時草稿改寫為「無變化」通知，不保留前次的警示以免誤寄）
+    print("\n=== 毛利變化比對 ===")
+    snapshot_file = "gross_margin_snapshot.parquet"
+    changes = analyzer.detect_margin_changes(df_analysis, snapshot_file)
+    
+    if len(changes) == 0:
+        print("毛利狀態與前次相同，Email草稿改為無變化通知")
     print("\n正在生成Email草稿...")
     
     # 純文本版本
-    email_draft = analyzer.generate_low_margin_email(df_analysis)
+    email_draft = analyzer.generate_change_alert_email(changes)
     with open("gross_margin_email_draft.txt", "w", encoding="utf-8") as f:
         f.write(email_draft)
     
     # Gmail HTML版本
-    gmail_email = analyzer.generate_gmail_email(df_analysis)
+    gmail_email = analyzer.generate_change_alert_gmail(changes)
     with open("gross_margin_gmail_email.html", "w", encoding="utf-8") as f:
         f.write(gmail_email)
     
+    analyzer.save_margin_snapshot(df_analysis, snapshot_file)
+    
     print("\n=== 完成！ ===")
     print("✅ 毛利報表：gross_margin_report.xlsx")
+    if len(realized_summary) > 0:
+        print(f"✅ 實際毛利：gross_margin_report.xlsx（Realized_Margin，來源: {', '.join(realized_summary['source'].unique())}）")
     print("✅ Email草稿：gross_margin_email_draft.txt")
     print("✅ Gmail Email：gross_margin_gmail_email.html")
+    print(f"✅ 毛利快照：{snapshot_file}")
     
     print("\n=== 使用說明 ===")
     print("1. 毛利報表包含所有產品的毛利率分析和建議售價")
     print("2. 低毛利產品會特別標記")
-    print("3. Email草稿可直接複製到Gmail使用")
-    print("4. HTML版本提供更好的視覺效果")
+    print("3. Email草稿只列出與前次相比新增低毛利、毛利惡化或已恢復的產品")
+    print("4. Email草稿可直接複製到Gmail使用，HTML版本提供更好的視覺效果")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,246 @@
+import heapq
+import itertools
+import numpy as np
+import pandas as pd
+
+# 預設追蹤的項目數上限；品項數不超過此值時結果為精確值
+DEFAULT_CAPACITY = 1000
+
+class SpaceSaving:
+    """
+    加權 Space-Saving 串流 top-K 計數器
+
+    - 最多保留 capacity 個項目，狀態大小與品項總數無關
+    - 新項目在計數器已滿時取代目前最小的項目，並繼承其計數作為誤差
+    - 每個項目的估計值 count 滿足 count - error <= 真實值 <= count，
+      且 error 不超過 總權重 / capacity
+    - 追蹤中的品項數未超過 capacity 時 error 皆為 0（精確值）
+    """
+
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        """
+        Args:
+            capacity (int): 最多追蹤的項目數
+        """
+        if capacity < 1:
+            raise ValueError(f"capacity 必須大於 0: {capacity}")
+        self.capacity = capacity
+        self.counters = {}
+        self.total_weight = 0.0
+        self._heap = []
+        self._sequence = itertools.count()
+
+    def __len__(self):
+        return len(self.counters)
+
+    def _pop_min(self):
+        # heap 中可能有過期紀錄（計數已增加），取出時略過
+        while True:
+            count, _, item = heapq.heappop(self._heap)
+            current = self.counters.get(item)
+            if current is not None and current[0] == count:
+                return item, count
+
+    def _push(self, item, count):
+        # 加入序號，計數相同時不需比較項目本身（項目型別可能無法互相比較）
+        heapq.heappush(self._heap, (count, next(self._sequence), item))
+        if len(self._heap) > 4 * self.capacity:
+            self._rebuild_heap()
+
+    def _rebuild_heap(self):
+        self._heap = [(count, next(self._sequence), item) for item, (count, _) in self.counters.items()]
+        heapq.heapify(self._heap)
+
+    def update(self, items, weights=None):
+        """
+        加入一批資料
+
+        同一批內相同項目先合併權重再更新計數器；與 groupby().sum() 相同，
+        缺失的權重視為 0，負的權重不計入。
+
+        Args:
+            items (array-like): 項目（如產品名稱）
+            weights (array-like): 權重（如金額、數量），省略時每筆計 1
+        """
+        items = pd.Series(np.asarray(items, dtype=object))
+        if weights is None:
+            weights = pd.Series(1.0, index=items.index)
+        else:
+            weights = pd.Series(np.asarray(weights, dtype=float), index=items.index)
+
+        weights = weights.fillna(0)
+        valid = items.notna() & (weights >= 0)
+        batch = weights[valid].groupby(items[valid], sort=False).sum()
+
+        # 先處理權重大的項目，讓真正的大項目優先佔住計數器
+        batch = batch.sort_values(ascending=False, kind='stable')
+        self.total_weight += float(batch.sum())
+
+        for item, weight in batch.items():
+            current = self.counters.get(item)
+            if current is not None:
+                current[0] += weight
+                self._push(item, current[0])
+            elif len(self.counters) < self.capacity:
+                self.counters[item] = [weight, 0.0]
+                self._push(item, weight)
+            elif weight > 0:
+                evicted, min_count = self._pop_min()
+                del self.counters[evicted]
+                self.counters[item] = [min_count + weight, min_count]
+                self._push(item, min_count + weight)
+
+    def merge(self, other):
+        """
+        合併另一個計數器（例如各分區各自串流後彙整）
+
+        只出現在其中一方的項目，在另一方的真實值最多為該方的最小計數，
+        因此估計值與誤差都加上該最小計數，誤差界限仍然成立。
+        """
+        self_floor = self.max_error
+        other_floor = other.max_error
+        merged = {}
+        for item in set(self.counters) | set(other.counters):
+            count_a, error_a = self.counters.get(item, (self_floor, self_floor))
+            count_b, error_b = other.counters.get(item, (other_floor, other_floor))
+            merged[item] = [count_a + count_b, error_a + error_b]
+
+        ranked = sorted(merged.items(), key=lambda kv: (-kv[1][0], str(kv[0])))
+        self.counters = dict(ranked[:self.capacity])
+        self.total_weight += other.total_weight
+        self._rebuild_heap()
+
+    @property
+    def max_error(self):
+        """任一項目估計值的誤差上限"""
+        if len(self.counters) < self.capacity:
+            return 0.0
+        return min(count for count, _ in self.counters.values())
+
+    def top(self, n):
+        """
+        取得估計值最大的前 n 個項目
+
+        Returns:
+            pd.DataFrame: 欄位 [item, estimate, error, lower_bound, guaranteed]；
+                guaranteed 表示該項目保證位於真實的前 n 名
+        """
+        ranked = sorted(self.counters.items(), key=lambda kv: (-kv[1][0], str(kv[0])))
+        items = [item for item, _ in ranked]
+        estimates = np.array([counter[0] for _, counter in ranked], dtype=float)
+        errors = np.array([counter[1] for _, counter in ranked], dtype=float)
+
+        # 第 n+1 名的估計值（或未追蹤項目的上限）為其他項目可能達到的最大值
+        if len(ranked) > n:
+            threshold = estimates[n]
+        else:
+            threshold = self.max_error
+
+        head = slice(0, n)
+        lower_bound = estimates[head] - errors[head]
+        return pd.DataFrame({
+            'item': items[head],
+            'estimate': estimates[head],
+            'error': errors[head],
+            'lower_bound': lower_bound,
+            'guaranteed': lower_bound >= threshold
+        })
+
+class HeavyHitters:
+    """
+    同時依多個量值（如營收、數量）追蹤前幾名項目的串流累積器
+
+    可逐批（chunk）從清洗程式餵入資料，每個量值各自一個 SpaceSaving，
+    狀態大小固定為 capacity 個項目。品項數超過 capacity 時結果為估計值，
+    top() 回傳的 error、lower_bound 與 guaranteed 說明其可信程度；
+    資料已在記憶體中時請改用 top_items 取得精確值。
+    """
+
+    def __init__(self, key, measures, capacity=DEFAULT_CAPACITY):
+        """
+        Args:
+            key (str): 項目欄位（如 Product、region）
+            measures (dict): {量值名稱: 資料欄位}，例如 {'revenue': 'line_amount', 'quantity': 'Qty'}；
+                資料欄位為 None 時以筆數計算
+            capacity (int): 每個量值最多追蹤的項目數
+        """
+        self.key = key
+        self.measures = dict(measures)
+        self.capacity = capacity
+        self.counters = {name: SpaceSaving(capacity) for name in self.measures}
+        self.rows_seen = 0
+
+    def update(self, chunk):
+        """
+        加入一批資料
+        """
+        self.rows_seen += len(chunk)
+        items = chunk[self.key]
+        for name, column in self.measures.items():
+            weights = None if column is None else chunk[column]
+            self.counters[name].update(items, weights)
+
+    def top(self, n, by):
+        """
+        依指定量值取得前 n 名（含誤差界限）
+
+        Args:
+            n (int): 名次數
+            by (str): 量值名稱（measures 的鍵）
+
+        Returns:
+            pd.DataFrame: 欄位 [key, estimate, error, lower_bound, guaranteed]
+        """
+        if by not in self.counters:
+            raise ValueError(f"未追蹤的量值: {by}（可用: {list(self.counters)}）")
+        return self.counters[by].top(n).rename(columns={'item': self.key})
+
+    def candidates(self, by=None):
+        """
+        目前追蹤中的項目（可作為精確重算的候選名單）
+        """
+        names = [by] if by else list(self.counters)
+        items = set()
+        for name in names:
+            items.update(self.counters[name].counters)
+        return items
+
+def exact_totals(chunks, key, value_column, candidates):
+    """
+    第二次掃描：只為候選項目累計精確總和（狀態大小 = 候選數量）
+
+    Args:
+        chunks (iterable): 逐批的 DataFrame
+        key (str): 項目欄位
+        value_column (str 或 None): 數值欄位，None 表示計算筆數
+        candidates (iterable): 候選項目
+
+    Returns:
+        pd.Series: index 為項目的精確總和，依總和遞減排序
+    """
+    candidates = pd.Index(list(candidates), dtype=object)
+    totals = np.zeros(len(candidates))
+    for chunk in chunks:
+        positions = candidates.get_indexer(chunk[key])
+        matched = positions >= 0
+        if value_column is None:
+            weights = np.ones(len(chunk))
+        else:
+            weights = np.nan_to_num(chunk[value_column].to_numpy(dtype=float))
+        totals += np.bincount(positions[matched], weights=weights[matched], minlength=len(candidates))
+    return pd.Series(totals, index=candidates, name=value_column).sort_values(ascending=False, kind='stable')
+
+def top_items(df, key, value_column, n):
+    """
+    取得依數值加總的前 n 名項目（精確值）
+
+    記憶體中的資料表與 cube 查詢結果直接以 groupby 精確加總；Space-Saving
+    只用於無法一次載入的逐批串流（HeavyHitters），並附上誤差界限。
+    缺失的數值視為 0，負數（如退貨、折讓）照常計入。
+
+    Returns:
+        pd.Series: index 為項目、值為總和，依總和遞減排序
+    """
+    totals = pd.to_numeric(df[value_column], errors='coerce').groupby(df[key]).sum()
+    totals.name = value_column
+    return totals.nlargest(n)
@@ -3,6 +3,10 @@ import numpy as np
 import re
 from datetime import datetime
 import warnings
+from date_utils import to_date_column, excel_writer
+from wide_to_long import detect_month_columns, clean_month_values
+from key_join import KeyIndex
+from olap_cube import materialize_cube, default_cube_path
 warnings.filterwarnings('ignore')
 
 def clean_orders_data(df, products_master_df):
@@ -14,7 +18,7 @@ def clean_orders_data(df, products_master_df):
     # 複製資料避免修改原始資料
     df_clean = df.copy()
     
-    # 1. 清洗日期欄位 - 統一為 YYYY-MM-DD 格式
+    # 1. 清洗日期欄位 - 統一格式後轉為日期型別
     def standardize_date(date_str):
         if pd.isna(date_str):
             return np.nan
@@ -49,10 +53,10 @@ def clean_orders_data(df, products_master_df):
         except:
             return np.nan
     
-    # 清洗所有日期欄位
+    # 清洗所有日期欄位，標準化後直接存為 datetime64（不再以字串輸出）
     date_columns = ['order_date', 'ship_date', 'due_date']
     for col in date_columns:
-        df_clean[col] = df_clean[col].apply(standardize_date)
+        df_clean[col] = to_date_column(df_clean[col].apply(standardize_date))
         print(f"  已清洗 {col} 欄位")
     
     # 2. 清洗 region - 首字大寫
@@ -146,12 +150,14 @@ def clean_orders_data(df, products_master_df):
     # 增加計算欄位
     print("開始增加計算欄位...")
     
+    # 日期欄位已是 datetime64，直接用於後續欄位計算
+    order_dates = df_clean['order_date']
+    ship_dates = df_clean['ship_date']
+    due_dates = df_clean['due_date']
+    
     # 7. 計算 subtotal = qty * unit_price * (1 - discount/100)
-    df_clean['subtotal'] = df_clean.apply(
-        lambda row: row['qty'] * row['unit_price'] * (1 - row['discount(%)'] / 100) 
-        if pd.notna(row['qty']) and pd.notna(row['unit_price']) else np.nan, 
-        axis=1
-    )
+    # qty 或 unit_price 為 NaN 時，乘法本身就會傳遞 NaN
+    df_clean['subtotal'] = df_clean['qty'] * df_clean['unit_price'] * (1 - df_clean['discount(%)'] / 100)
     print("  已計算 subtotal 欄位")
     
     # 8. 計算 total_with_tax = subtotal * 1.05
@@ -159,39 +165,23 @@ def clean_orders_data(df, products_master_df):
     print("  已計算 total_with_tax 欄位")
     
     # 9. 計算 lead_time_days = ship_date - order_date（天）
-    def calculate_lead_time(row):
-        if pd.isna(row['ship_date']) or pd.isna(row['order_date']):
-            return np.nan
-        try:
-            ship_date = pd.to_datetime(row['ship_date'])
-            order_date = pd.to_datetime(row['order_date'])
-            return (ship_date - order_date).days
-        except:
-            return np.nan
-    
-    df_clean['lead_time_days'] = df_clean.apply(calculate_lead_time, axis=1)
+    # 任一日期缺失時為 NaT，.dt.days 會得到 NaN
+    df_clean['lead_time_days'] = (ship_dates - order_dates).dt.days
     print("  已計算 lead_time_days 欄位")
     
     # 10. 計算 overdue = ship_date > due_date（True/False）
-    def calculate_overdue(row):
-        if pd.isna(row['ship_date']) or pd.isna(row['due_date']):
-            return np.nan
-        try:
-            ship_date = pd.to_datetime(row['ship_date'])
-            due_date = pd.to_datetime(row['due_date'])
-            return ship_date > due_date
-        except:
-            return np.nan
-    
-    df_clean['overdue'] = df_clean.apply(calculate_overdue, axis=1)
+    # 任一日期缺失時維持 NaN，而不是 False
+    overdue = ship_dates > due_dates
+    has_both_dates = ship_dates.notna() & due_dates.notna()
+    if not has_both_dates.all():
+        overdue = overdue.astype(object).where(has_both_dates, np.nan)
+    df_clean['overdue'] = overdue
     print("  已計算 overdue 欄位")
     
     # 11. 參考 products_master 資料，並以 product 資料做比對，並補上對應 category
-    # 建立 product 到 category 的對應字典
-    product_category_map = dict(zip(products_master_df['product'], products_master_df['category']))
-    
-    # 新增 category 欄位
-    df_clean['category'] = df_clean['product'].map(product_category_map)
+    # 建立 product 鍵值索引（會檢查 product 是否唯一），並回報未匹配的產品
+    product_index = KeyIndex(products_master_df, key='product', name='products_master')
+    df_clean, _ = product_index.enrich(df_clean, ['category'], copy=False)
     print("  已新增 category 欄位")
     
     print("計算欄位新增完成！")
@@ -203,17 +193,10 @@ def clean_monthly_sales_wide(df):
     """
     print("開始清洗 monthly_sales_wide 資料...")
     
-    # 複製資料避免修改原始資料
-    df_clean = df.copy()
-    
-    # 清洗數值欄位（Jan, Feb, Mar, Apr）
-    numeric_columns = ['Jan', 'Feb', 'Mar', 'Apr']
-    
-    for col in numeric_columns:
-        df_clean[col] = df_clean[col].apply(lambda x: 
-            float(str(x).replace(',', '').strip()) if pd.notna(x) else np.nan
-        )
-        print(f"  已清洗 {col} 欄位")
+    # 自動偵測月份欄位（Jan ~ Dec、2025-01、一月 ...），整塊一次轉為數值
+    month_columns = detect_month_columns(df)
+    df_clean = clean_month_values(df, month_columns)
+    print(f"  已清洗月份欄位: {month_columns}")
     
     print("monthly_sales_wide 資料清洗完成！")
     return df_clean
@@ -266,7 +249,7 @@ def main():
         print(f"樞紐分析表形狀: {pivot_table.shape}")
         
         # 儲存清洗後的資料和樞紐分析表
-        with pd.ExcelWriter(output_file, engine='openpyxl') as writer:
+        with excel_writer(output_file) as writer:
             orders_clean.to_excel(writer, sheet_name='orders_clean', index=False)
             monthly_sales_clean.to_excel(writer, sheet_name='monthly_sales_wide_clean', index=False)
             products_df.to_excel(writer, sheet_name='products_master', index=False)
@@ -277,6 +260,9 @@ def main():
         print(f"monthly_sales_wide_clean: {monthly_sales_clean.shape}")
         print(f"products_master: {products_df.shape}")
         
+        # 物化 OLAP cube（date × region × product × category）供報表與儀表板查詢
+        materialize_cube(orders_clean, 'instructor_case', default_cube_path(output_file))
+        
         # 顯示清洗前後的對比
         print("\n=== 清洗前後對比 ===")
         print("\norders_dirty 清洗前（前5筆）:")
@@ -1,6 +1,10 @@
-import pandas as pd
 import numpy as np
 import warnings
+from date_utils import excel_writer
+from pivot_engine import create_pivot_report, ranking_table, display_pivot_summary
+from wide_to_long import detect_month_columns, melt_month_columns
+from sla_analytics import compute_sla_summary
+from data_loader import load_sheet
 warnings.filterwarnings('ignore')
 
 def create_instructor_case_pivot(input_file, output_file):
@@ -15,7 +19,7 @@ def create_instructor_case_pivot(input_file, output_file):
     
     try:
         # 讀取 orders_clean 工作表
-        df = pd.read_excel(input_file, sheet_name='orders_clean')
+        df = load_sheet(input_file, sheet_name='orders_clean', copy=False)
         print(f"成功讀取資料，共 {len(df)} 筆記錄")
     except Exception as e:
         print(f"讀取檔案時發生錯誤: {e}")
@@ -49,54 +53,35 @@ def create_instructor_case_pivot(input_file, output_file):
     print("- values: total_with_tax")
     print("- aggfunc: sum")
     
-    pivot_table = df_clean.pivot_table(
-        values='total_with_tax',
+    # 樞紐表、地區排名、產品排名與地區-產品組合都來自同一次分組結果
+    pivot, region_ranking, product_ranking, region_product_analysis = create_pivot_report(
+        df_clean,
         index='region',
         columns='product',
-        aggfunc='sum',
-        fill_value=0
+        values='total_with_tax',
+        index_label='Region',
+        column_label='Product',
+        row_total_label='Total_By_Region',
+        column_total_label='Total_By_Product'
     )
     
-    # 新增總計欄位 (產品總計)
-    pivot_table['Total_By_Product'] = pivot_table.sum(axis=1)
-    
-    # 新增總計列 (地區總計)
-    total_row = pivot_table.sum()
-    pivot_table.loc['Total_By_Region'] = total_row
-    
     print("\n樞紐表完成！")
-    print(f"地區數量: {len(pivot_table) - 1}")  # 減1是因為有總計列
-    print(f"產品數量: {len(pivot_table.columns) - 1}")  # 減1是因為有總計欄
+    region_count, product_count = pivot.shape
+    print(f"地區數量: {region_count}")
+    print(f"產品數量: {product_count}")
+    if pivot.sparse:
+        print(f"地區 × 產品組合過多，改用稀疏模式 (密度 {pivot.density:.2%})，以長表輸出")
     
     # 創建額外的分析工作表
     print("\n創建額外分析工作表...")
     
-    # 1. 地區排名 (按總金額)
-    region_ranking = df_clean.groupby('region')['total_with_tax'].sum().sort_values(ascending=False)
-    region_ranking = region_ranking.reset_index()
-    region_ranking.columns = ['Region', 'Total_Amount']
-    region_ranking['Percentage'] = (region_ranking['Total_Amount'] / region_ranking['Total_Amount'].sum() * 100).round(2)
-    
-    # 2. 產品排名 (按總金額)
-    product_ranking = df_clean.groupby('product')['total_with_tax'].sum().sort_values(ascending=False)
-    product_ranking = product_ranking.reset_index()
-    product_ranking.columns = ['Product', 'Total_Amount']
-    product_ranking['Percentage'] = (product_ranking['Total_Amount'] / product_ranking['Total_Amount'].sum() * 100).round(2)
-    
-    # 3. 地區-產品組合分析
-    region_product_analysis = df_clean.groupby(['region', 'product'])['total_with_tax'].sum().reset_index()
-    region_product_analysis = region_product_analysis.sort_values(['region', 'total_with_tax'], ascending=[True, False])
-    
-    # 4. 按類別分析
+    # 1. 按類別分析 (地區、產品排名與組合分析已由樞紐引擎產生)
     if 'category' in df_clean.columns:
-        category_analysis = df_clean.groupby('category')['total_with_tax'].sum().sort_values(ascending=False)
-        category_analysis = category_analysis.reset_index()
-        category_analysis.columns = ['Category', 'Total_Amount']
-        category_analysis['Percentage'] = (category_analysis['Total_Amount'] / category_analysis['Total_Amount'].sum() * 100).round(2)
+        category_analysis = ranking_table(df_clean.groupby('category')['total_with_tax'].sum(), 'Category')
     else:
         category_analysis = None
     
-    # 5. 按訂單日期分析
+    # 2. 按訂單日期分析
     if 'order_date' in df_clean.columns:
         date_analysis = df_clean.groupby('order_date')['total_with_tax'].sum().sort_index()
         date_analysis = date_analysis.reset_index()
@@ -104,47 +89,46 @@ def create_instructor_case_pivot(input_file, output_file):
     else:
         date_analysis = None
     
-    return pivot_table, region_ranking, product_ranking, region_product_analysis, category_analysis, date_analysis
+    return pivot, region_ranking, product_ranking, region_product_analysis, category_analysis, date_analysis
 
 def transform_monthly_sales_wide(input_file):
     """
     轉置 monthly_sales_wide 資料，將寬表轉換為長表
-    從: product | Jan | Feb | Mar | Apr
+    從: product | Jan | Feb | ...（自動偵測月份欄位）
     到: product | month | revenue
     """
     print("\n開始處理 monthly_sales_wide 資料轉置...")
     
     try:
         # 讀取 monthly_sales_wide_clean 工作表
-        df = pd.read_excel(input_file, sheet_name='monthly_sales_wide_clean')
+        df = load_sheet(input_file, sheet_name='monthly_sales_wide_clean', copy=False)
         print(f"成功讀取 monthly_sales_wide_clean 資料，共 {len(df)} 筆記錄")
         
         print("\n原始資料結構:")
         print(df.head())
         print(f"\n資料欄位: {df.columns.tolist()}")
         
-        # 檢查是否有月份欄位
-        month_columns = [col for col in df.columns if col in ['Jan', 'Feb', 'Mar', 'Apr']]
+        # 檢查是否有月份欄位（Jan ~ Dec、2025-01、一月 ...）
+        month_columns = detect_month_columns(df)
         if not month_columns:
-            print("警告: 未找到月份欄位 (Jan, Feb, Mar, Apr)")
+            print("警告: 未找到月份欄位 (Jan ~ Dec、YYYY-MM、一月 ~ 十二月)")
             return None
         
         print(f"\n找到月份欄位: {month_columns}")
         
-        # 使用 melt 函數進行轉置
         # 將月份欄位轉換為長表格式
-        df_melted = df.melt(
-            id_vars=['product'],  # 保持 product 欄位不變
-            value_vars=month_columns,  # 要轉置的月份欄位
-            var_name='month',  # 新的月份欄位名稱
-            value_name='revenue'  # 新的營收欄位名稱
+        # month 為依月份先後排序的有序類別，結果已按 product、month 排序
+        df_melted = melt_month_columns(
+            df,
+            id_column='product',
+            month_columns=month_columns,
+            var_name='month',
+            value_name='revenue'
         )
         
-        # 排序資料：按照 product, month, revenue 的順序
-        # 首先按照 product 排序，然後按照月份順序，最後按照 revenue 降序
-        month_order = ['Jan', 'Feb', 'Mar', 'Apr']  # 定義月份順序
-        df_melted['month'] = pd.Categorical(df_melted['month'], categories=month_order, ordered=True)
-        df_melted = df_melted.sort_values(['product', 'month', 'revenue'], ascending=[True, True, False])
+        # 同一產品同一月份有多筆時，依 revenue 降序排列
+        df_melted = df_melted.sort_values(['product', 'month', 'revenue'], ascending=[True, True, False],
+                                          kind='stable').reset_index(drop=True)
         
         print("\n轉置後的資料結構:")
         print(df_melted.head(10))
@@ -173,6 +157,36 @@ def transform_monthly_sales_wide(input_file):
         print(f"處理 monthly_sales_wide 資料時發生錯誤: {e}")
         return None
 
+def create_sla_analysis(input_file):
+    """
+    計算訂單交期與 SLA 指標
+    - lead_time_days 百分位數 (p50/p90/p99)
+    - 逾期率 (overdue)
+    - 未出貨訂單積壓天數 (backlog aging)
+    依 region、product、category 分組，另有 All 總覽列
+    """
+    print("\n開始計算交期與 SLA 指標...")
+    
+    try:
+        df = load_sheet(input_file, sheet_name='orders_clean', copy=False)
+        
+        required_columns = ['order_date', 'ship_date', 'lead_time_days', 'overdue']
+        missing_columns = [col for col in required_columns if col not in df.columns]
+        if missing_columns:
+            print(f"缺少必要欄位: {missing_columns}")
+            return None
+        
+        sla_summary = compute_sla_summary(df)
+        
+        print(f"SLA 分析完成，共 {len(sla_summary)} 組")
+        print(sla_summary[sla_summary['dimension'] == 'All'].to_string(index=False))
+        
+        return sla_summary
+        
+    except Exception as e:
+        print(f"計算 SLA 指標時發生錯誤: {e}")
+        return None
+
 def main():
     """
     主函數：執行樞紐分析和資料轉置
@@ -189,17 +203,23 @@ def main():
         print("樞紐分析失敗，無法繼續執行")
         return
     
-    pivot_table, region_ranking, product_ranking, region_product_analysis, category_analysis, date_analysis = pivot_result
+    pivot, region_ranking, product_ranking, region_product_analysis, category_analysis, date_analysis = pivot_result
     
     # 執行 monthly_sales_wide 轉置
     print("\n=== 執行 monthly_sales_wide 轉置 ===")
     monthly_sales_transformed = transform_monthly_sales_wide(input_file)
     
+    # 交期與 SLA 分析
+    print("\n=== 執行交期與 SLA 分析 ===")
+    sla_analysis = create_sla_analysis(input_file)
+    
     # 儲存到 Excel
     print(f"\n儲存分析結果到: {output_file}")
-    with pd.ExcelWriter(output_file, engine='openpyxl') as writer:
+    with excel_writer(output_file) as writer:
         # 主要樞紐表
-        pivot_table.to_excel(writer, sheet_name='Pivot_Table', index=True)
+        # 稀疏模式時為長表 (region, product, total_with_tax)
+        for sheet_name, sheet_df in pivot.to_sheets('Pivot_Table').items():
+            sheet_df.to_excel(writer, sheet_name=sheet_name, index=True)
         
         # 地區排名
         region_ranking.to_excel(writer, sheet_name='Region_Ranking', index=False)
@@ -232,8 +252,13 @@ def main():
             )
             monthly_pivot.to_excel(writer, sheet_name='Monthly_Sales_Pivot', index=True)
         
+        # 交期與 SLA 分析
+        if sla_analysis is not None:
+            sla_analysis.to_excel(writer, sheet_name='SLA_Analysis', index=False)
+        
         # 來源資料 (用於參考)
-        df_clean = pd.read_excel(input_file, sheet_name='orders_clean')
+        # 與樞紐分析讀取同一份 orders_clean，直接使用快取
+        df_clean = load_sheet(input_file, sheet_name='orders_clean', copy=False)
         df_clean = df_clean.dropna(subset=['region', 'product', 'total_with_tax'])
         df_clean.to_excel(writer, sheet_name='Source_Data', index=False)
     
@@ -250,36 +275,12 @@ def main():
     if monthly_sales_transformed is not None:
         print("- Monthly_Sales_Transformed: 轉置後的月度銷售資料 (product, month, revenue)")
         print("- Monthly_Sales_Pivot: 月度銷售樞紐表")
+    if sla_analysis is not None:
+        print("- SLA_Analysis: 交期百分位數、逾期率與積壓天數 (依地區/產品/類別)")
     print("- Source_Data: 來源資料")
     
     # 顯示樞紐表摘要
-    display_pivot_summary(pivot_table)
-
-def display_pivot_summary(pivot_table):
-    """
-    顯示樞紐表摘要資訊
-    """
-    print("\n=== 樞紐表摘要 ===")
-    print(f"總地區數: {len(pivot_table) - 1}")
-    print(f"總產品數: {len(pivot_table.columns) - 1}")
-    
-    # 顯示各地區總計
-    print("\n各地區總計:")
-    region_totals = pivot_table['Total_By_Product'].sort_values(ascending=False)
-    for region, total in region_totals.items():
-        if region != 'Total_By_Region':
-            print(f"  {region}: {total:,.2f}")
-    
-    # 顯示各產品總計
-    print("\n各產品總計:")
-    product_totals = pivot_table.loc['Total_By_Region'].sort_values(ascending=False)
-    for product, total in product_totals.items():
-        if product != 'Total_By_Product':
-            print(f"  {product}: {total:,.2f}")
-    
-    # 總計
-    grand_total = pivot_table.loc['Total_By_Region', 'Total_By_Product']
-    print(f"\n總計: {grand_total:,.2f}")
+    display_pivot_summary(pivot)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,112 @@
+import numpy as np
+import pandas as pd
+from pandas.api.extensions import take
+
+class KeyIndex:
+    """
+    以主檔（如 products_master）鍵值建立的可重複使用雜湊索引
+
+    - 建立時檢查鍵值唯一性（many-to-one），重複鍵值直接拋出 ValueError
+    - 事實表（如 orders）只需查一次鍵值位置，多個屬性欄位共用同一組位置
+    - 每次補值都回報未匹配的鍵值，方便追查主檔缺漏
+    """
+
+    def __init__(self, dimension_df, key, name='products_master'):
+        """
+        建立鍵值索引
+
+        Args:
+            dimension_df (pd.DataFrame): 主檔資料
+            key (str): 主檔鍵值欄位
+            name (str): 主檔名稱（用於訊息輸出）
+        """
+        self.key = key
+        self.name = name
+
+        # 鍵值為空的列無法被匹配，不納入索引
+        dimension = dimension_df[dimension_df[key].notna()].reset_index(drop=True)
+
+        duplicated = dimension[key].duplicated(keep=False)
+        if duplicated.any():
+            duplicate_keys = sorted(dimension.loc[duplicated, key].astype(str).unique())
+            raise ValueError(f"{name} 的 {key} 欄位有重複鍵值，無法做 many-to-one 對應: {duplicate_keys}")
+
+        self.dimension = dimension
+        self.index = pd.Index(dimension[key])
+
+    def __len__(self):
+        return len(self.index)
+
+    def positions(self, keys):
+        """
+        查詢鍵值在主檔中的整數位置
+
+        Args:
+            keys (array-like): 事實表的鍵值
+
+        Returns:
+            np.ndarray: 主檔列位置，未匹配為 -1
+        """
+        return self.index.get_indexer(keys)
+
+    def enrich(self, facts_df, columns, fact_key=None, copy=True, verbose=True):
+        """
+        將主檔屬性欄位補到事實表（等同 left join，但只查一次鍵值）
+
+        Args:
+            facts_df (pd.DataFrame): 事實表資料
+            columns (list 或 dict): 要補上的主檔欄位；dict 形式為 {主檔欄位: 輸出欄位}
+            fact_key (str): 事實表鍵值欄位，預設與主檔相同
+            copy (bool): 是否複製事實表；呼叫端自己持有的資料可設為 False 直接加欄位
+            verbose (bool): 是否輸出未匹配診斷訊息
+
+        Returns:
+            tuple: (補值後的資料框, 未匹配鍵值統計 DataFrame[key, row_count])
+        """
+        fact_key = fact_key or self.key
+        if not isinstance(columns, dict):
+            columns = {col: col for col in columns}
+
+        positions = self.positions(facts_df[fact_key])
+
+        enriched = facts_df.copy() if copy else facts_df
+        for source_col, target_col in columns.items():
+            values = self.dimension[source_col].to_numpy()
+            # allow_fill 讓 -1 位置自動填入對應型別的缺失值
+            enriched[target_col] = take(values, positions, allow_fill=True)
+
+        unmatched = self.unmatched_keys(facts_df[fact_key], positions)
+        if verbose:
+            self.report(unmatched, len(facts_df))
+
+        return enriched, unmatched
+
+    def unmatched_keys(self, keys, positions=None):
+        """
+        統計未匹配的鍵值與筆數
+
+        Args:
+            keys (pd.Series): 事實表鍵值
+            positions (np.ndarray): 已查好的位置，省略時重新查詢
+
+        Returns:
+            pd.DataFrame: 欄位 [key, row_count]，依筆數遞減排序
+        """
+        if positions is None:
+            positions = self.positions(keys)
+
+        missing = pd.Series(np.asarray(keys)[positions == -1])
+        counts = missing.value_counts(dropna=False)
+        return pd.DataFrame({self.key: counts.index, 'row_count': counts.to_numpy()})
+
+    def report(self, unmatched, total_rows):
+        """
+        輸出匹配診斷訊息
+        """
+        unmatched_rows = int(unmatched['row_count'].sum()) if len(unmatched) else 0
+        print(f"  {self.name} 對應: {total_rows - unmatched_rows}/{total_rows} 筆匹配")
+        if unmatched_rows:
+            print(f"  未匹配的 {self.key}（共 {len(unmatched)} 個鍵值，{unmatched_rows} 筆）:")
+            top = unmatched.head(10)
+            for key, count in zip(top[self.key], top['row_count']):
+                print(f"    {key}: {count} 筆")
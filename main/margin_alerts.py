@@ -0,0 +1,120 @@
+import os
+import numpy as np
+import pandas as pd
+from pandas.api.extensions import take
+from key_join import KeyIndex
+
+# 毛利快照只保存比對需要的欄位
+SNAPSHOT_COLUMNS = ['sku', 'gross_margin_pct', 'low_margin_flag']
+
+# 仍為低毛利、但毛利率比前次下降超過此百分點時視為惡化
+DEFAULT_WORSENED_POINTS = 5.0
+
+# 警示類型（依此順序排列與呈現）
+ALERT_LABELS = {
+    'newly_low': '新增低毛利',
+    'worsened': '毛利惡化',
+    'recovered': '已恢復'
+}
+
+def _unique_skus(snapshot):
+    # 同一 SKU 出現多次時只保留第一筆，快照才能以 SKU 建立索引
+    duplicated = snapshot['sku'].duplicated()
+    if duplicated.any():
+        duplicate_skus = sorted(snapshot.loc[duplicated, 'sku'].astype(str).unique())
+        print(f"毛利快照有重複的 SKU，只保留第一筆: {duplicate_skus}")
+        snapshot = snapshot[~duplicated].reset_index(drop=True)
+    return snapshot
+
+def snapshot_margins(df_analysis):
+    """
+    由毛利分析結果產生精簡快照（每個 SKU 一列，重複的 SKU 只保留第一筆）
+    """
+    snapshot = df_analysis.loc[df_analysis['sku'].notna(), SNAPSHOT_COLUMNS].reset_index(drop=True)
+    snapshot['sku'] = snapshot['sku'].astype(str)
+    snapshot['low_margin_flag'] = snapshot['low_margin_flag'].fillna(False).astype(bool)
+    return _unique_skus(snapshot)
+
+def save_snapshot(df_analysis, path):
+    """
+    寫入毛利快照（Parquet），先寫暫存檔再取代，避免中斷時留下不完整的快照
+    """
+    snapshot = snapshot_margins(df_analysis)
+    tmp_file = f"{path}.{os.getpid()}.tmp"
+    snapshot.to_parquet(tmp_file, index=False)
+    os.replace(tmp_file, path)
+    return snapshot
+
+def load_snapshot(path):
+    """
+    讀取前次毛利快照
+
+    Returns:
+        pd.DataFrame 或 None: 檔案不存在時回傳 None（第一次執行）
+    """
+    if not os.path.exists(path):
+        return None
+    return pd.read_parquet(path)
+
+def diff_margins(previous, current, worsened_points=DEFAULT_WORSENED_POINTS):
+    """
+    比對前次快照與本次分析結果，只回傳有變化的產品
+
+    - newly_low: 本次低毛利、前次不是（含新上架的 SKU）
+    - worsened: 兩次皆為低毛利，且毛利率下降超過 worsened_points 個百分點
+    - recovered: 前次低毛利、本次已達標
+
+    本次毛利率無法計算（缺售價或成本）的產品不參與比對，
+    避免被誤判為已恢復。
+
+    Args:
+        previous (pd.DataFrame 或 None): 前次快照；None 表示沒有快照，所有低毛利產品都視為新增
+        current (pd.DataFrame): 本次 calculate_gross_margin() 結果
+        worsened_points (float): 惡化門檻（百分點）
+
+    Returns:
+        pd.DataFrame: 有變化的產品列，另加 alert_type、previous_margin_pct、margin_change
+    """
+    current = current[current['sku'].notna()].reset_index(drop=True)
+    if previous is None:
+        previous = pd.DataFrame({col: pd.Series(dtype=dtype) for col, dtype in
+                                 zip(SNAPSHOT_COLUMNS, [object, float, bool])})
+    else:
+        previous = _unique_skus(previous.assign(sku=previous['sku'].astype(str)))
+
+    # 以 SKU 索引一次查出每個產品在前次快照的位置
+    positions = KeyIndex(previous, 'sku', name='毛利快照').positions(current['sku'].astype(str))
+    previous_margin = take(previous['gross_margin_pct'].to_numpy(dtype=float), positions, allow_fill=True)
+    previous_flag = take(previous['low_margin_flag'].to_numpy(dtype=bool), positions, allow_fill=True, fill_value=False)
+
+    current_margin = current['gross_margin_pct'].to_numpy(dtype=float)
+    current_flag = current['low_margin_flag'].fillna(False).to_numpy(dtype=bool)
+    known = ~np.isnan(current_margin)
+    change = current_margin - previous_margin
+
+    alert_type = np.select(
+        [
+            known & current_flag & ~previous_flag,
+            known & current_flag & previous_flag & (change < -worsened_points),
+            known & ~current_flag & previous_flag
+        ],
+        list(ALERT_LABELS),
+        default=''
+    )
+
+    changed = alert_type != ''
+    changes = current[changed].copy()
+    changes.insert(0, 'alert_type', pd.Categorical(alert_type[changed], categories=list(ALERT_LABELS)))
+    changes['previous_margin_pct'] = previous_margin[changed]
+    changes['margin_change'] = change[changed]
+    return changes.sort_values(['alert_type', 'margin_change'], kind='stable').reset_index(drop=True)
+
+def summarize_changes(changes):
+    """
+    各警示類型的產品數
+
+    Returns:
+        dict: {警示類型: 產品數}，依 ALERT_LABELS 順序
+    """
+    counts = changes['alert_type'].value_counts()
+    return {alert: int(counts.get(alert, 0)) for alert in ALERT_LABELS}
@@ -0,0 +1,256 @@
+import os
+import numpy as np
+import pandas as pd
+from date_utils import to_date_column
+from data_loader import load_parquet
+
+# 各清洗結果對應的 cube 維度與量值
+# dimensions: {cube 維度: 來源欄位}；measures: {cube 量值: 來源欄位或由資料計算的函數}
+CUBE_SOURCES = {
+    'sales': {
+        'dimensions': {'date': 'Order Date', 'region': 'Region', 'product': 'Product'},
+        'measures': {'qty': 'Qty', 'amount': 'line_amount'}
+    },
+    'student_case': {
+        'dimensions': {'date': 'order_date', 'product': 'product_name', 'category': 'category'},
+        'measures': {
+            'qty': 'qty',
+            'amount': 'total_with_tax',
+            'tax': lambda df: df['total_with_tax'] - df['subtotal']
+        }
+    },
+    'instructor_case': {
+        'dimensions': {'date': 'order_date', 'region': 'region', 'product': 'product', 'category': 'category'},
+        'measures': {
+            'qty': 'qty',
+            'amount': 'total_with_tax',
+            'tax': lambda df: df['total_with_tax'] - df['subtotal']
+        }
+    }
+}
+
+DATE_DIMENSION = 'date'
+COUNT_COLUMN = 'order_count'
+
+def default_cube_path(workbook_path):
+    """
+    清洗結果檔對應的 cube 檔路徑，例如 clean/sales_clean.xlsx → clean/sales_clean_cube.parquet
+    """
+    return f"{os.path.splitext(workbook_path)[0]}_cube.parquet"
+
+class Cube:
+    """
+    預先彙總的 OLAP cube
+
+    每列為一個維度組合（date × region × product × category ...），保存：
+    - order_count: 訂單明細筆數
+    - 各量值的總和（qty、amount、tax ...）與非缺失筆數（qty_count ...）
+
+    總和與筆數都可再相加，因此任意粒度的切片與上捲（roll-up）
+    都只需彙總 cube 本身，不必回頭掃描明細資料。
+    """
+
+    def __init__(self, data, dimensions, measures):
+        """
+        Args:
+            data (pd.DataFrame): cube 資料
+            dimensions (list): 維度欄位
+            measures (list): 量值名稱（不含 _count）
+        """
+        self.data = data
+        self.dimensions = list(dimensions)
+        self.measures = list(measures)
+
+    def __len__(self):
+        return len(self.data)
+
+    def _filter_mask(self, filters):
+        mask = np.ones(len(self.data), dtype=bool)
+        for dim, condition in (filters or {}).items():
+            if dim not in self.dimensions:
+                raise ValueError(f"cube 沒有維度: {dim}（可用: {self.dimensions}）")
+            column = self.data[dim]
+            if callable(condition):
+                mask &= np.asarray(condition(column), dtype=bool)
+            elif isinstance(condition, slice):
+                # 範圍條件（含兩端），日期維度可直接使用字串
+                convert = pd.Timestamp if dim == DATE_DIMENSION else (lambda value: value)
+                if condition.start is not None:
+                    mask &= (column >= convert(condition.start)).to_numpy()
+                if condition.stop is not None:
+                    mask &= (column <= convert(condition.stop)).to_numpy()
+            elif isinstance(condition, (list, tuple, set, pd.Index, np.ndarray, pd.Series)):
+                mask &= column.isin(list(condition)).to_numpy()
+            else:
+                mask &= (column == condition).to_numpy()
+        return mask
+
+    def slice(self, filters=None):
+        """
+        切片：只保留符合條件的維度組合，回傳新的 Cube
+
+        同一組條件要做多次上捲時（如儀表板的多張圖表），先切片一次，
+        之後的 query 只需彙總切片後的組合。
+
+        Args:
+            filters (dict): 同 query 的 filters
+
+        Returns:
+            Cube: 沒有條件時回傳自己
+        """
+        if not filters:
+            return self
+        return Cube(self.data[self._filter_mask(filters)], self.dimensions, self.measures)
+
+    def query(self, by=None, filters=None, measures=None, date_grain=None, require_measure=None):
+        """
+        切片並上捲到指定粒度
+
+        Args:
+            by (list): 分組維度，例如 ['region', 'product']；省略時回傳單列總計
+            filters (dict): {維度: 條件}，條件可為單一值、list（任一符合）、
+                slice(start, stop)（含兩端的範圍）或回傳布林遮罩的函數
+            measures (list): 要回傳的量值，預設全部
+            date_grain (str): 日期維度的粒度，'D'、'M'、'Q'、'Y'（回傳 Period）
+            require_measure (str): 只保留該量值有非缺失資料的組合，
+                等同在明細資料先 dropna(subset=[該量值]) 再彙總
+
+        Returns:
+            pd.DataFrame: 欄位為分組維度、order_count、各量值與其 _count；
+                分組維度缺失的組合與 groupby 相同被排除
+        """
+        measures = list(measures or self.measures)
+        value_columns = [COUNT_COLUMN] + [col for m in measures for col in (m, f"{m}_count")]
+
+        mask = self._filter_mask(filters)
+        if require_measure:
+            mask &= (self.data[f"{require_measure}_count"] > 0).to_numpy()
+        selected = self.data[mask]
+
+        by = list(by or [])
+        if not by:
+            return selected[value_columns].sum().to_frame().T
+
+        keys = []
+        for dim in by:
+            if dim not in self.dimensions:
+                raise ValueError(f"cube 沒有維度: {dim}（可用: {self.dimensions}）")
+            if dim == DATE_DIMENSION and date_grain:
+                keys.append(selected[dim].dt.to_period(date_grain))
+            else:
+                keys.append(selected[dim])
+
+        result = selected.groupby(keys, observed=True, sort=True)[value_columns].sum().reset_index()
+        for dim in by:
+            if isinstance(result[dim].dtype, pd.CategoricalDtype):
+                result[dim] = result[dim].astype(object)
+        return result
+
+    def total(self, measure, filters=None):
+        """
+        回傳單一量值的總和
+        """
+        return self.query(filters=filters, measures=[measure])[measure].iloc[0]
+
+    def save(self, path):
+        """
+        寫入 Parquet（欄式儲存，維度以字典編碼壓縮）
+        """
+        data = self.data.copy()
+        for dim in self.dimensions:
+            if dim != DATE_DIMENSION:
+                data[dim] = data[dim].astype('category')
+        data.to_parquet(path, index=False)
+
+def build_cube(df, dimensions, measures):
+    """
+    由明細資料建立 cube
+
+    Args:
+        df (pd.DataFrame): 明細資料
+        dimensions (dict): {cube 維度: 來源欄位}，不存在的來源欄位會略過
+        measures (dict): {cube 量值: 來源欄位或函數(df) → Series}
+
+    Returns:
+        Cube: 維度缺失值也保留為獨立組合，總計與明細一致
+    """
+    frame = pd.DataFrame(index=df.index)
+    dims = []
+    for dim, source in dimensions.items():
+        if source not in df.columns:
+            continue
+        values = df[source]
+        if dim == DATE_DIMENSION:
+            values = to_date_column(values).dt.normalize()
+        else:
+            values = values.astype(object)
+        frame[dim] = values
+        dims.append(dim)
+
+    for measure, source in measures.items():
+        values = source(df) if callable(source) else df[source]
+        frame[measure] = pd.to_numeric(values, errors='coerce')
+
+    grouped = frame.groupby(dims, dropna=False, sort=True)
+    counts = grouped.size().rename(COUNT_COLUMN)
+    sums = grouped[list(measures)].sum()
+    non_null = grouped[list(measures)].count().add_suffix('_count')
+
+    data = pd.concat([counts, sums, non_null], axis=1)
+    ordered = [COUNT_COLUMN] + [col for m in measures for col in (m, f"{m}_count")]
+    data = data[ordered].reset_index()
+    return Cube(data, dims, list(measures))
+
+def build_source_cube(df, source):
+    """
+    依 CUBE_SOURCES 的設定建立 cube
+    """
+    if source not in CUBE_SOURCES:
+        raise ValueError(f"未定義的 cube 來源: {source}（可用: {list(CUBE_SOURCES)}）")
+    spec = CUBE_SOURCES[source]
+    return build_cube(df, spec['dimensions'], spec['measures'])
+
+def materialize_cube(df, source, cube_file):
+    """
+    清洗完成後建立 cube 並寫入檔案
+    """
+    cube = build_source_cube(df, source)
+    cube.save(cube_file)
+    print(f"已物化 cube: {cube_file}（{len(df)} 筆明細 → {len(cube)} 個維度組合）")
+    return cube
+
+def load_cube(cube_file):
+    """
+    讀取已物化的 cube 檔（同一執行期間重複讀取使用快取）
+    """
+    data = load_parquet(cube_file, copy=False)
+    count_columns = [col for col in data.columns if col.endswith('_count') and col != COUNT_COLUMN]
+    measures = [col[:-len('_count')] for col in count_columns]
+    dimensions = [col for col in data.columns if col not in measures + count_columns + [COUNT_COLUMN]]
+    return Cube(data, dimensions, measures)
+
+def get_cube(source, workbook_path, facts=None):
+    """
+    取得清洗結果的 cube：優先讀取物化檔，檔案不存在或比清洗結果舊時
+    改由明細資料即時建立
+
+    Args:
+        source (str): CUBE_SOURCES 的來源名稱
+        workbook_path (str): 清洗結果 Excel 路徑
+        facts (pd.DataFrame 或 callable): 明細資料，或回傳明細資料的函數
+
+    Returns:
+        Cube 或 None: 沒有 cube 檔也沒有明細資料時回傳 None
+    """
+    cube_file = default_cube_path(workbook_path)
+    if os.path.exists(cube_file):
+        stale = os.path.exists(workbook_path) and os.path.getmtime(cube_file) < os.path.getmtime(workbook_path)
+        if not stale:
+            return load_cube(cube_file)
+        print(f"cube 檔比 {workbook_path} 舊，改由明細資料建立")
+
+    if callable(facts):
+        facts = facts()
+    if facts is None:
+        return None
+    return build_source_cube(facts, source)
@@ -0,0 +1,20 @@
+import pandas as pd
+
+def merge_counts(state, new, keys, count_columns):
+    """
+    將新一批的部分彙總（次數、總和）併入累積狀態（同鍵值相加）
+
+    逐批（chunk）處理的累積器共用，例如 SLATracker 與 RealizedMarginEngine
+
+    Args:
+        state (pd.DataFrame 或 None): 目前的累積狀態，None 表示尚未加入資料
+        new (pd.DataFrame): 新一批的部分彙總
+        keys (list): 鍵值欄位
+        count_columns (list): 要相加的欄位
+
+    Returns:
+        pd.DataFrame: 合併後的狀態，依鍵值排序
+    """
+    if state is None or len(state) == 0:
+        return new
+    return pd.concat([state, new], ignore_index=True).groupby(keys, sort=True)[count_columns].sum().reset_index()
@@ -1,6 +1,9 @@
-import pandas as pd
 import numpy as np
 import warnings
+from date_utils import excel_writer
+from pivot_engine import create_pivot_report, display_pivot_summary
+from data_loader import load_sheet
+from olap_cube import get_cube
 warnings.filterwarnings('ignore')
 
 def create_pivot_analysis(input_file, output_file):
@@ -15,7 +18,7 @@ def create_pivot_analysis(input_file, output_file):
     
     try:
         # 讀取清洗後的資料
-        df = pd.read_excel(input_file, sheet_name='Cleaned_Data')
+        df = load_sheet(input_file, sheet_name='Cleaned_Data', copy=False)
         print(f"成功讀取資料，共 {len(df)} 筆記錄")
     except Exception as e:
         print(f"讀取檔案時發生錯誤: {e}")
@@ -49,49 +52,39 @@ def create_pivot_analysis(input_file, output_file):
     print("- values: line_amount")
     print("- aggfunc: sum")
     
-    pivot_table = df_clean.pivot_table(
-        values='line_amount',
+    # 從物化的 cube 取 (地區, 產品) 彙總，不再掃描明細；
+    # require_measure 等同上面的 dropna(subset=['line_amount'])
+    cube = get_cube('sales', input_file, df)
+    region_product = cube.query(
+        by=['region', 'product'], measures=['amount'], require_measure='amount'
+    ).rename(columns={'region': 'Region', 'product': 'Product', 'amount': 'line_amount'})
+    
+    # 樞紐表、地區排名、產品排名與地區-產品組合都來自同一次分組結果
+    pivot, region_ranking, product_ranking, region_product_analysis = create_pivot_report(
+        region_product,
         index='Region',
         columns='Product',
-        aggfunc='sum',
-        fill_value=0
+        values='line_amount',
+        index_label='Region',
+        column_label='Product',
+        row_total_label='Total_By_Region',
+        column_total_label='Total_By_Product'
     )
     
-    # 新增總計欄位 (產品總計)
-    pivot_table['Total_By_Product'] = pivot_table.sum(axis=1)
-    
-    # 新增總計列 (地區總計)
-    total_row = pivot_table.sum()
-    pivot_table.loc['Total_By_Region'] = total_row
-    
     print("\n樞紐表完成！")
-    print(f"地區數量: {len(pivot_table) - 1}")  # 減1是因為有總計列
-    print(f"產品數量: {len(pivot_table.columns) - 1}")  # 減1是因為有總計欄
-    
-    # 創建額外的分析工作表
-    print("\n創建額外分析工作表...")
-    
-    # 1. 地區排名 (按總金額)
-    region_ranking = df_clean.groupby('Region')['line_amount'].sum().sort_values(ascending=False)
-    region_ranking = region_ranking.reset_index()
-    region_ranking.columns = ['Region', 'Total_Amount']
-    region_ranking['Percentage'] = (region_ranking['Total_Amount'] / region_ranking['Total_Amount'].sum() * 100).round(2)
-    
-    # 2. 產品排名 (按總金額)
-    product_ranking = df_clean.groupby('Product')['line_amount'].sum().sort_values(ascending=False)
-    product_ranking = product_ranking.reset_index()
-    product_ranking.columns = ['Product', 'Total_Amount']
-    product_ranking['Percentage'] = (product_ranking['Total_Amount'] / product_ranking['Total_Amount'].sum() * 100).round(2)
-    
-    # 3. 地區-產品組合分析
-    region_product_analysis = df_clean.groupby(['Region', 'Product'])['line_amount'].sum().reset_index()
-    region_product_analysis = region_product_analysis.sort_values(['Region', 'line_amount'], ascending=[True, False])
+    region_count, product_count = pivot.shape
+    print(f"地區數量: {region_count}")
+    print(f"產品數量: {product_count}")
+    if pivot.sparse:
+        print(f"地區 × 產品組合過多，改用稀疏模式 (密度 {pivot.density:.2%})，以長表輸出")
     
     # 儲存到 Excel
     print(f"\n儲存樞紐分析結果到: {output_file}")
-    with pd.ExcelWriter(output_file, engine='openpyxl') as writer:
+    with excel_writer(output_file) as writer:
         # 主要樞紐表
-        pivot_table.to_excel(writer, sheet_name='Pivot_Table', index=True)
+        # 稀疏模式時為長表 (Region, Product, line_amount)
+        for sheet_name, sheet_df in pivot.to_sheets('Pivot_Table').items():
+            sheet_df.to_excel(writer, sheet_name=sheet_name, index=True)
         
         # 地區排名
         region_ranking.to_excel(writer, sheet_name='Region_Ranking', index=False)
@@ -113,33 +106,7 @@ def create_pivot_analysis(input_file, output_file):
     print("- Region_Product_Analysis: 地區-產品組合分析")
     print("- Source_Data: 來源資料")
     
-    return pivot_table
-
-def display_pivot_summary(pivot_table):
-    """
-    顯示樞紐表摘要資訊
-    """
-    print("\n=== 樞紐表摘要 ===")
-    print(f"總地區數: {len(pivot_table) - 1}")
-    print(f"總產品數: {len(pivot_table.columns) - 1}")
-    
-    # 顯示各地區總計
-    print("\n各地區總計:")
-    region_totals = pivot_table['Total_By_Product'].sort_values(ascending=False)
-    for region, total in region_totals.items():
-        if region != 'Total_By_Region':
-            print(f"  {region}: {total:,.2f}")
-    
-    # 顯示各產品總計
-    print("\n各產品總計:")
-    product_totals = pivot_table.loc['Total_By_Region'].sort_values(ascending=False)
-    for product, total in product_totals.items():
-        if product != 'Total_By_Product':
-            print(f"  {product}: {total:,.2f}")
-    
-    # 總計
-    grand_total = pivot_table.loc['Total_By_Region', 'Total_By_Product']
-    print(f"\n總計: {grand_total:,.2f}")
+    return pivot
 
 if __name__ == "__main__":
     # 設定檔案路徑
@@ -0,0 +1,300 @@
+import numpy as np
+import pandas as pd
+
+# 各彙總方式需要的基礎統計量；總計（margins）都由這些統計量再彙總推出
+AGGREGATIONS = {
+    'sum': ['sum'],
+    'count': ['count'],
+    'mean': ['sum', 'count'],
+    'min': ['min'],
+    'max': ['max']
+}
+
+# 稀疏模式自動切換門檻（列數 × 欄數）
+SPARSE_CELL_THRESHOLD = 1_000_000
+
+# 切分輸出時每個工作表的最大欄數（Excel 上限為 16384 欄）
+SHEET_MAX_COLUMNS = 1000
+
+# 長表每個工作表的最大資料列數（Excel 上限為 1048576 列，需保留一列標題）
+SHEET_MAX_ROWS = 1_048_575
+
+def group_measure(df, dimensions, values, aggfunc='sum'):
+    """
+    對維度組合做一次 groupby，取得彙總所需的基礎統計量
+
+    Args:
+        df (pd.DataFrame): 資料
+        dimensions (list): 分組維度，例如 ['region', 'product']
+        values (str): 數值欄位
+        aggfunc (str): sum / count / mean / min / max
+
+    Returns:
+        pd.DataFrame: index 為維度組合，欄位為基礎統計量（sum、count ...）
+    """
+    if aggfunc not in AGGREGATIONS:
+        raise ValueError(f"不支援的彙總方式: {aggfunc}（可用: {list(AGGREGATIONS)}）")
+    return df.groupby(dimensions, sort=True)[values].agg(AGGREGATIONS[aggfunc])
+
+def combine_stats(stats, aggfunc, level=None):
+    """
+    由基礎統計量推出彙總值；指定 level 時先在該層級再彙總一次
+
+    總計（margins）都由已分組的基礎統計量相加／取極值得到，
+    不需要回頭掃描原始資料。
+
+    Args:
+        stats (pd.DataFrame): group_measure() 的結果
+        aggfunc (str): 彙總方式
+        level (str 或 None): 要保留的層級；None 表示整體總計
+
+    Returns:
+        pd.Series 或純量
+    """
+    if level is None:
+        reduced = pd.DataFrame([{
+            'sum': stats['sum'].sum() if 'sum' in stats else np.nan,
+            'count': stats['count'].sum() if 'count' in stats else np.nan,
+            'min': stats['min'].min() if 'min' in stats else np.nan,
+            'max': stats['max'].max() if 'max' in stats else np.nan
+        }])
+    else:
+        grouped = stats.groupby(level=level, sort=True)
+        reduced = pd.DataFrame({
+            name: getattr(grouped[name], 'sum' if name in ('sum', 'count') else name)()
+            for name in stats.columns
+        })
+
+    if aggfunc == 'mean':
+        result = reduced['sum'] / reduced['count']
+    else:
+        result = reduced[aggfunc]
+
+    return result.iloc[0] if level is None else result
+
+class PivotResult:
+    """
+    樞紐分析結果
+
+    以座標形式（coordinate / COO）保存實際存在的 (index, columns) 組合，
+    總計直接由座標資料彙總而來。密集模式另外展開 pivot_table；
+    稀疏模式不建立完整矩陣，輸出時改用長表或依欄數切分的多個工作表。
+    """
+
+    def __init__(self, index, columns, values, cell_values, index_totals, column_totals,
+                 grand_total, row_total_label, column_total_label, sparse):
+        self.index = index
+        self.columns = columns
+        self.values = values
+        self.cell_values = cell_values
+        self.index_totals = index_totals
+        self.column_totals = column_totals
+        self.grand_total = grand_total
+        self.row_total_label = row_total_label
+        self.column_total_label = column_total_label
+        self.sparse = sparse
+        self.pivot_table = None if sparse else self.to_dense()
+
+    @property
+    def shape(self):
+        """(列維度數量, 欄維度數量)，不含總計"""
+        return len(self.index_totals), len(self.column_totals)
+
+    @property
+    def density(self):
+        """實際有值的格子比例"""
+        n_index, n_columns = self.shape
+        total_cells = n_index * n_columns
+        return len(self.cell_values) / total_cells if total_cells else 0.0
+
+    def to_dense(self, column_labels=None):
+        """
+        展開為含總計的矩陣；指定 column_labels 時只展開那些欄
+
+        總計欄為整列（全部欄位）的總計，總計列為所選欄位的欄總計。
+        """
+        cells = self.cell_values
+        column_totals = self.column_totals
+        if column_labels is not None:
+            cells = cells[cells.index.get_level_values(self.columns).isin(column_labels)]
+            column_totals = column_totals.reindex(column_labels)
+
+        # 只對實際存在的 (index, columns) 組合展開成數值矩陣，缺少的組合補 0
+        pivot_table = cells.unstack(self.columns, fill_value=0)
+        pivot_table = pivot_table.reindex(index=self.index_totals.index, columns=column_totals.index, fill_value=0)
+        pivot_table[self.column_total_label] = self.index_totals
+        pivot_table.loc[self.row_total_label] = pd.concat([
+            column_totals,
+            pd.Series({self.column_total_label: self.grand_total})
+        ])
+        return pivot_table
+
+    def to_long(self):
+        """
+        轉為長表：每個有值的格子一列，並附上列總計、欄總計與總計
+
+        Returns:
+            pd.DataFrame: index 為列維度，欄位 [columns, values]
+        """
+        cells = self.cell_values.reset_index(level=self.columns)
+        index_totals = pd.DataFrame({self.columns: self.column_total_label, self.values: self.index_totals})
+        column_totals = pd.DataFrame(
+            {self.columns: self.column_totals.index, self.values: self.column_totals.to_numpy()},
+            index=pd.Index([self.row_total_label] * len(self.column_totals), name=self.index)
+        )
+        grand_total = pd.DataFrame(
+            {self.columns: [self.column_total_label], self.values: [self.grand_total]},
+            index=pd.Index([self.row_total_label], name=self.index)
+        )
+        long_table = pd.concat([cells, index_totals, column_totals, grand_total])
+        long_table.index.name = self.index
+        return long_table
+
+    def to_sheets(self, sheet_name, layout='long', max_columns=SHEET_MAX_COLUMNS, max_rows=SHEET_MAX_ROWS):
+        """
+        產生要寫入 Excel 的工作表（皆以 index=True 寫入）
+
+        Args:
+            sheet_name (str): 工作表名稱；切分時加上 _1、_2 ...
+            layout (str): 稀疏模式的輸出方式：'long' 長表（超過 max_rows 時依列數切分），
+                或 'split' 依欄數切分
+            max_columns (int): 'split' 時每個工作表最多的欄數
+            max_rows (int): 'long' 時每個工作表最多的資料列數
+
+        Returns:
+            dict: {工作表名稱: DataFrame}
+        """
+        if not self.sparse:
+            return {sheet_name: self.pivot_table}
+
+        if layout == 'long':
+            long_table = self.to_long()
+            if len(long_table) <= max_rows:
+                return {sheet_name: long_table}
+            sheets = {}
+            for start in range(0, len(long_table), max_rows):
+                part = start // max_rows + 1
+                sheets[f"{sheet_name}_{part}"[:31]] = long_table.iloc[start:start + max_rows]
+            print(f"長表共 {len(long_table)} 列，超過每個工作表 {max_rows} 列的上限，已切分為 {len(sheets)} 個工作表")
+            return sheets
+
+        if layout != 'split':
+            raise ValueError(f"不支援的輸出方式: {layout}（可用: long、split）")
+
+        column_labels = self.column_totals.index
+        sheets = {}
+        for start in range(0, len(column_labels), max_columns):
+            part = start // max_columns + 1
+            sheets[f"{sheet_name}_{part}"[:31]] = self.to_dense(column_labels[start:start + max_columns])
+        return sheets
+
+def build_pivot(df, index, columns, values, aggfunc='sum',
+                row_total_label='Total', column_total_label='Total', dropna=True, sparse=None):
+    """
+    建立含總計的樞紐表，並回傳同一次分組結果推出的各項彙總
+
+    Args:
+        df (pd.DataFrame): 資料
+        index (str): 列維度（如 region）
+        columns (str): 欄維度（如 product）
+        values (str): 數值欄位（如 total_with_tax）
+        aggfunc (str): sum / count / mean / min / max
+        row_total_label (str): 總計列名稱
+        column_total_label (str): 總計欄名稱
+        dropna (bool): 是否先排除維度缺失的列（與 pd.pivot_table 相同，
+            數值缺失的列仍保留，sum 時視為 0）
+        sparse (bool 或 None): 是否使用稀疏模式；None 時格子數超過
+            SPARSE_CELL_THRESHOLD 自動切換
+
+    Returns:
+        PivotResult: 樞紐分析結果
+    """
+    if dropna:
+        df = df.dropna(subset=[index, columns])
+
+    stats = group_measure(df, [index, columns], values, aggfunc)
+
+    if aggfunc == 'mean':
+        cell_values = stats['sum'] / stats['count']
+    else:
+        cell_values = stats[aggfunc]
+    cell_values = cell_values.rename(values)
+
+    index_totals = combine_stats(stats, aggfunc, level=index)
+    column_totals = combine_stats(stats, aggfunc, level=columns)
+    grand_total = combine_stats(stats, aggfunc)
+
+    if sparse is None:
+        sparse = len(index_totals) * len(column_totals) > SPARSE_CELL_THRESHOLD
+
+    return PivotResult(
+        index, columns, values, cell_values, index_totals, column_totals,
+        grand_total, row_total_label, column_total_label, sparse
+    )
+
+def ranking_table(totals, label, value_label='Total_Amount'):
+    """
+    由彙總值建立排名表（依金額遞減，附百分比）
+
+    Args:
+        totals (pd.Series): index 為維度值的彙總結果
+        label (str): 維度欄位顯示名稱（如 Region）
+        value_label (str): 數值欄位顯示名稱
+
+    Returns:
+        pd.DataFrame: 欄位 [label, value_label, Percentage]
+    """
+    ranking = totals.sort_values(ascending=False).reset_index()
+    ranking.columns = [label, value_label]
+    ranking['Percentage'] = (ranking[value_label] / ranking[value_label].sum() * 100).round(2)
+    return ranking
+
+def breakdown_table(cell_values, index, values):
+    """
+    建立維度組合明細（依 index 排序，組內依數值遞減）
+    """
+    breakdown = cell_values.reset_index()
+    return breakdown.sort_values([index, values], ascending=[True, False])
+
+def create_pivot_report(df, index, columns, values, index_label, column_label, aggfunc='sum',
+                        row_total_label='Total', column_total_label='Total', sparse=None):
+    """
+    產生樞紐表與排名分析（樞紐結果、列維度排名、欄維度排名、組合明細）
+
+    所有結果都來自同一次 (index, columns) 分組，不再對原始資料分別 groupby。
+
+    Returns:
+        tuple: (PivotResult, index_ranking, column_ranking, breakdown)
+    """
+    result = build_pivot(
+        df, index, columns, values, aggfunc=aggfunc,
+        row_total_label=row_total_label, column_total_label=column_total_label, sparse=sparse
+    )
+    index_ranking = ranking_table(result.index_totals, index_label)
+    column_ranking = ranking_table(result.column_totals, column_label)
+    breakdown = breakdown_table(result.cell_values, index, values)
+    return result, index_ranking, column_ranking, breakdown
+
+def display_pivot_summary(result):
+    """
+    顯示樞紐表摘要資訊（直接使用總計，稀疏模式也適用）
+    """
+    n_index, n_columns = result.shape
+    print("\n=== 樞紐表摘要 ===")
+    print(f"總地區數: {n_index}")
+    print(f"總產品數: {n_columns}")
+    if result.sparse:
+        print(f"稀疏模式: {len(result.cell_values)} 個有值格子 (密度 {result.density:.2%})")
+
+    # 顯示各地區總計
+    print("\n各地區總計:")
+    for region, total in result.index_totals.sort_values(ascending=False).items():
+        print(f"  {region}: {total:,.2f}")
+
+    # 顯示各產品總計
+    print("\n各產品總計:")
+    for product, total in result.column_totals.sort_values(ascending=False).items():
+        print(f"  {product}: {total:,.2f}")
+
+    # 總計
+    print(f"\n總計: {result.grand_total:,.2f}")
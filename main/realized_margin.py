@@ -0,0 +1,351 @@
+import numpy as np
+import pandas as pd
+from pandas.api.extensions import take
+from date_utils import to_date_column
+from key_join import KeyIndex
+from partial_aggregates import merge_counts
+
+# 實際毛利的彙總維度；'All' 為全部銷售明細的總覽列
+REALIZED_DIMENSIONS = ['product', 'region', 'category', 'date']
+
+# 各銷售明細來源的欄位對應
+# match: 依序嘗試的 (明細欄位, 產品欄位)；先以 SKU 對應，找不到再以產品名稱對應
+# revenue: 折扣後、未稅的實收金額
+SALES_LINE_SOURCES = {
+    'sales': {
+        'match': [('Product', 'name')],
+        'qty': 'Qty', 'revenue': 'line_amount',
+        'date': 'Order Date', 'region': 'Region', 'category': None
+    },
+    'student_case': {
+        'match': [('product_id', 'sku'), ('product_name', 'name')],
+        'qty': 'qty', 'revenue': 'subtotal',
+        'date': 'order_date', 'region': None, 'category': 'category'
+    },
+    'instructor_case': {
+        'match': [('product', 'name')],
+        'qty': 'qty', 'revenue': 'subtotal',
+        'date': 'order_date', 'region': 'region', 'category': 'category'
+    }
+}
+
+VALUE_COLUMNS = ['line_count', 'costed_lines', 'qty', 'revenue', 'costed_revenue', 'cost']
+
+# 對應到產品成本的明細比例低於此值時，視為明細與產品主檔的鍵值不一致，不輸出實際毛利
+MIN_MATCH_RATE = 0.05
+
+def normalize_key(values):
+    """
+    對應用的鍵值：轉字串、去空白、轉小寫（缺失值保持缺失）
+    """
+    values = pd.Series(values)
+    return values.where(values.isna(), values.astype(str).str.strip().str.lower())
+
+class RealizedMarginEngine:
+    """
+    以銷售明細計算實際毛利
+
+    - 每筆明細以 SKU／產品名稱鍵值索引對應產品成本（只查詢不重複的鍵值）
+    - 明細層級的成本與毛利為整欄向量運算
+    - 各維度（產品、地區、類別、日期）轉成整數代碼後以 bincount 一次彙總
+    - 可逐批（chunk）加入明細，狀態只保存各維度的彙總值，不保留明細
+    """
+
+    def __init__(self, products_analysis, dimensions=None):
+        """
+        Args:
+            products_analysis (pd.DataFrame): GrossMarginAnalyzer.calculate_gross_margin() 的結果，
+                需有 sku、cost；name、category、gross_margin_pct、target_margin_pct 可選
+            dimensions (list): 彙總維度，預設 product、region、category、date
+        """
+        self.dimensions = list(dimensions or REALIZED_DIMENSIONS)
+        self.products = products_analysis[products_analysis['sku'].notna()].reset_index(drop=True)
+        self.unit_cost = self.products['cost'].to_numpy(dtype=float)
+        self.indexes = {'sku': self._build_index('sku')}
+        if 'name' in self.products.columns:
+            self.indexes['name'] = self._build_index('name')
+
+        self.state = None
+        self.unmatched = pd.Series(dtype=np.int64)
+        self.total_lines = 0
+        self.matched_lines = 0
+
+    def _build_index(self, column):
+        keys = pd.DataFrame({'key': normalize_key(self.products[column]), 'row': np.arange(len(self.products))})
+        keys = keys[keys['key'].notna()]
+
+        # 同名的不同產品無法以名稱判斷，只能以 SKU 對應
+        ambiguous = keys['key'].duplicated(keep=False)
+        if ambiguous.any():
+            names = sorted(self.products.loc[keys.loc[ambiguous, 'row'], column].astype(str).unique())
+            print(f"  產品 {column} 重複，不以此欄位對應: {names}")
+            keys = keys[~ambiguous]
+
+        return KeyIndex(keys, 'key', name=f'products({column})')
+
+    def _match_column(self, values, product_column):
+        """
+        只對不重複的鍵值做正規化與索引查詢，再展開回每筆明細
+
+        Returns:
+            tuple: (每筆明細的產品列位置（未對應為 -1）, 鍵值代碼, 不重複鍵值)
+        """
+        codes, uniques = pd.factorize(values)
+        index = self.indexes[product_column]
+        positions = index.positions(normalize_key(uniques))
+        unique_rows = take(index.dimension['row'].to_numpy(), positions, allow_fill=True, fill_value=-1)
+        return take(unique_rows, codes, allow_fill=True, fill_value=-1), codes, uniques
+
+    def match(self, lines, source):
+        """
+        找出每筆明細對應的產品列位置
+
+        Returns:
+            np.ndarray: 產品列位置，未對應為 -1
+        """
+        return self._match(lines, SALES_LINE_SOURCES[source])[0]
+
+    def _match(self, lines, spec):
+        rows = np.full(len(lines), -1, dtype=np.int64)
+        key_codes, key_uniques = None, None
+        for line_column, product_column in spec['match']:
+            if line_column not in lines.columns or product_column not in self.indexes:
+                continue
+            found, codes, uniques = self._match_column(lines[line_column], product_column)
+            if key_codes is None:
+                # 第一個對應欄位作為未對應明細的產品顯示值
+                key_codes, key_uniques = codes, uniques
+            fill = (rows < 0) & (found >= 0)
+            rows[fill] = found[fill]
+        return rows, key_codes, key_uniques
+
+    def add_lines(self, lines, source):
+        """
+        加入一批銷售明細
+
+        Args:
+            lines (pd.DataFrame): 銷售明細
+            source (str): SALES_LINE_SOURCES 的來源名稱
+        """
+        if source not in SALES_LINE_SOURCES:
+            raise ValueError(f"未定義的銷售明細來源: {source}（可用: {list(SALES_LINE_SOURCES)}）")
+        if len(lines) == 0:
+            return
+        spec = SALES_LINE_SOURCES[source]
+        rows, key_codes, key_uniques = self._match(lines, spec)
+        matched = rows >= 0
+
+        # 明細層級成本與毛利（向量運算）；無成本或無金額的明細不計入毛利
+        qty = pd.to_numeric(lines[spec['qty']], errors='coerce').to_numpy(dtype=float)
+        revenue = pd.to_numeric(lines[spec['revenue']], errors='coerce').to_numpy(dtype=float)
+        cost = qty * take(self.unit_cost, rows, allow_fill=True)
+        costed = ~np.isnan(cost) & ~np.isnan(revenue)
+
+        values = {
+            'line_count': np.ones(len(lines)),
+            'costed_lines': costed.astype(float),
+            'qty': np.nan_to_num(qty),
+            'revenue': np.nan_to_num(revenue),
+            'costed_revenue': np.where(costed, revenue, 0.0),
+            'cost': np.where(costed, cost, 0.0)
+        }
+
+        # 所有維度以整數代碼 bincount 彙總，不建立堆疊後的物件陣列
+        partials = [self._aggregate('All', np.zeros(len(lines), dtype=np.int64), np.array(['All'], dtype=object), values)]
+        dimension_codes = self._dimension_codes(lines, spec, rows, key_codes, key_uniques)
+        for dim in self.dimensions:
+            codes, labels = dimension_codes[dim]
+            partials.append(self._aggregate(dim, codes, labels, values))
+        partial = pd.concat(partials, ignore_index=True)
+        partial = partial.groupby(['dimension', 'group'], sort=False)[VALUE_COLUMNS].sum().reset_index()
+        self.state = merge_counts(self.state, partial, ['dimension', 'group'], VALUE_COLUMNS)
+
+        # 未對應的鍵值統計
+        if key_codes is not None:
+            unmatched_codes = key_codes[~matched & (key_codes >= 0)]
+            if len(unmatched_codes):
+                counts = np.bincount(unmatched_codes, minlength=len(key_uniques))
+                present = counts > 0
+                counts = pd.Series(counts[present], index=pd.Index(key_uniques[present]).astype(str))
+                counts = counts.groupby(level=0).sum()
+                self.unmatched = self.unmatched.add(counts, fill_value=0).astype(np.int64)
+
+        self.total_lines += len(lines)
+        self.matched_lines += int(matched.sum())
+
+    def add_lines_chunked(self, lines, source, chunk_size=1_000_000):
+        """
+        大量明細分批加入，控制每批的暫存大小
+        """
+        for start in range(0, len(lines), chunk_size):
+            self.add_lines(lines.iloc[start:start + chunk_size], source)
+
+    @staticmethod
+    def _aggregate(dimension, codes, labels, values):
+        """
+        依維度代碼加總各數值欄位（代碼 -1 表示維度值缺失，不計入）
+        """
+        valid = codes >= 0
+        codes = codes[valid]
+        sums = {col: np.bincount(codes, weights=v[valid], minlength=len(labels)) for col, v in values.items()}
+        present = sums['line_count'] > 0
+        result = pd.DataFrame({col: sums[col][present] for col in VALUE_COLUMNS})
+        result.insert(0, 'group', np.asarray(labels, dtype=object)[present])
+        result.insert(0, 'dimension', dimension)
+        return result
+
+    def _dimension_codes(self, lines, spec, rows, key_codes, key_uniques):
+        """
+        產生每個維度的 (整數代碼, 代碼對應的字串標籤)
+
+        產品以對應到的 SKU 表示（未對應保留原鍵值），類別優先使用產品主檔；
+        標籤統一為字串，同一標籤出現在不同代碼時會在彙總後合併
+        """
+        n_rows = len(lines)
+        matched = rows >= 0
+        n_products = len(self.products)
+        result = {}
+
+        product_codes = rows.copy()
+        product_labels = self.products['sku'].astype(str).tolist()
+        if key_codes is not None:
+            raw = ~matched & (key_codes >= 0)
+            product_codes[raw] = n_products + key_codes[raw]
+            product_labels += [str(value) for value in key_uniques]
+        result['product'] = (product_codes, product_labels)
+
+        line_codes, line_labels = self._factorize(lines, spec['category'])
+        if 'category' in self.products.columns:
+            category_codes, category_labels = pd.factorize(self.products['category'])
+            from_master = take(category_codes, rows, allow_fill=True, fill_value=-1)
+            codes = np.where(from_master >= 0, from_master, np.where(line_codes >= 0, len(category_labels) + line_codes, -1))
+            result['category'] = (codes, [str(value) for value in category_labels] + line_labels)
+        else:
+            result['category'] = (line_codes, line_labels)
+
+        result['region'] = self._factorize(lines, spec['region'])
+
+        if spec['date'] in lines.columns:
+            dates = to_date_column(lines[spec['date']].reset_index(drop=True)).dt.normalize()
+            codes, uniques = pd.factorize(dates)
+            result['date'] = (codes, list(pd.DatetimeIndex(uniques).strftime('%Y-%m-%d')))
+        else:
+            result['date'] = (np.full(n_rows, -1, dtype=np.int64), [])
+
+        return {dim: result[dim] for dim in self.dimensions}
+
+    @staticmethod
+    def _factorize(lines, column):
+        if column not in lines.columns:
+            return np.full(len(lines), -1, dtype=np.int64), []
+        codes, uniques = pd.factorize(lines[column])
+        return codes, [str(value) for value in uniques]
+
+    def summary(self):
+        """
+        產生實際毛利摘要
+
+        Returns:
+            pd.DataFrame: 每個 (dimension, group) 一列；realized_margin_pct 只以有成本的明細計算，
+                unmatched_revenue 為對應不到成本的營收。產品列另附牌價毛利率、目標與旗標：
+                below_target（實際毛利率低於目標）、list_ok_realized_low（牌價達標但實際低於目標）
+        """
+        if self.state is None:
+            return pd.DataFrame()
+
+        summary = self.state.copy()
+        summary['gross_profit'] = summary['costed_revenue'] - summary['cost']
+        summary['realized_margin_pct'] = summary['gross_profit'] / summary['costed_revenue'].where(summary['costed_revenue'] != 0) * 100
+        summary['unmatched_revenue'] = summary['revenue'] - summary['costed_revenue']
+
+        # 產品列附上牌價毛利率與目標毛利率；以去除重複 SKU 後的索引查詢產品列
+        is_product = (summary['dimension'] == 'product').to_numpy()
+        sku_index = self.indexes['sku']
+        found = sku_index.positions(normalize_key(summary['group']))
+        positions = take(sku_index.dimension['row'].to_numpy(), found, allow_fill=True, fill_value=-1)
+        positions = np.where(is_product, positions, -1)
+        for column in ['gross_margin_pct', 'target_margin_pct']:
+            if column in self.products.columns:
+                summary[column] = take(self.products[column].to_numpy(dtype=float), positions, allow_fill=True)
+            else:
+                summary[column] = np.nan
+        summary = summary.rename(columns={'gross_margin_pct': 'list_margin_pct'})
+
+        summary['below_target'] = summary['realized_margin_pct'] < summary['target_margin_pct']
+        summary['list_ok_realized_low'] = summary['below_target'] & (summary['list_margin_pct'] >= summary['target_margin_pct'])
+
+        dimension_order = {dim: i for i, dim in enumerate(['All'] + self.dimensions)}
+        summary['_order'] = summary['dimension'].map(dimension_order)
+        summary['_group'] = summary['group'].astype(str)
+        summary = summary.sort_values(['_order', '_group']).drop(columns=['_order', '_group']).reset_index(drop=True)
+        return summary.round(2)
+
+    def flagged_products(self):
+        """
+        牌價毛利率達標、但實際毛利率低於目標的產品
+        """
+        summary = self.summary()
+        if len(summary) == 0:
+            return summary
+        return summary[summary['list_ok_realized_low']].reset_index(drop=True)
+
+    @property
+    def match_rate(self):
+        """對應到產品成本的明細比例（沒有明細時為 0）"""
+        return self.matched_lines / self.total_lines if self.total_lines else 0.0
+
+    def report(self, source=None, min_match_rate=MIN_MATCH_RATE):
+        """
+        輸出對應率與旗標產品；對應率低於 min_match_rate 時只輸出警告與未對應的產品
+
+        Args:
+            source (str): 銷售明細來源名稱（用於標題）
+            min_match_rate (float): 輸出實際毛利所需的最低對應率
+        """
+        title = f"實際毛利分析（{source}）" if source else "實際毛利分析（銷售明細）"
+        print(f"\n=== {title} ===")
+        print(f"銷售明細: {self.total_lines} 筆，對應到產品成本: {self.matched_lines} 筆（{self.match_rate:.1%}）")
+        if len(self.unmatched):
+            top = self.unmatched.sort_values(ascending=False).head(10)
+            print(f"未對應的產品（共 {len(self.unmatched)} 個，{int(self.unmatched.sum())} 筆）:")
+            for key, count in top.items():
+                print(f"  {key}: {count} 筆")
+
+        if self.match_rate < min_match_rate:
+            print(f"⚠️ 對應率低於 {min_match_rate:.0%}，略過實際毛利（請確認銷售明細的產品與產品主檔的 SKU／名稱一致）")
+            return
+
+        summary = self.summary()
+        if len(summary) == 0:
+            return
+        overall = summary[summary['dimension'] == 'All'].iloc[0]
+        if pd.notna(overall['realized_margin_pct']):
+            print(f"整體實際毛利率: {overall['realized_margin_pct']:.2f}%（毛利 {overall['gross_profit']:,.2f}）")
+
+        flagged = summary[summary['list_ok_realized_low']]
+        if len(flagged):
+            print("牌價毛利率達標但實際毛利率低於目標的產品:")
+            print(flagged[['group', 'list_margin_pct', 'realized_margin_pct', 'target_margin_pct', 'costed_revenue']].to_string(index=False))
+
+def summarize_sources(engines, min_match_rate=MIN_MATCH_RATE):
+    """
+    合併各銷售明細來源的實際毛利摘要（各來源分開計算，不混在同一個總覽）
+
+    Args:
+        engines (dict): {來源名稱: RealizedMarginEngine}
+        min_match_rate (float): 對應率低於此值的來源不列入
+
+    Returns:
+        pd.DataFrame: summary() 的欄位前加上 source；沒有可用的來源時為空表
+    """
+    summaries = []
+    for source, engine in engines.items():
+        if engine.match_rate < min_match_rate:
+            continue
+        summary = engine.summary()
+        if len(summary):
+            summary.insert(0, 'source', source)
+            summaries.append(summary)
+    if not summaries:
+        return pd.DataFrame()
+    return pd.concat(summaries, ignore_index=True)
@@ -1,22 +1,52 @@
-import pandas as pd
-import plotly.graph_objects as go
-import plotly.express as px
-from plotly.subplots import make_subplots
+from startup import StartupTimer, LazyFigures, shared_snapshot
+
+# 啟動時間從匯入重量級套件之前開始計算
+STARTUP_TIMER = StartupTimer()
+
 import dash
 from dash import dcc, html, dash_table
 from dash.dependencies import Input, Output
 import dash_bootstrap_components as dbc
-from datetime import datetime
+import threading
 import warnings
+import numpy as np
+import pandas as pd
+from date_utils import to_date_column
+from data_loader import load_sheet
+from heavy_hitters import top_items
+from olap_cube import get_cube, default_cube_path
+from table_paging import TableIndex, CUSTOM_PAGING_PROPS
+from data_watcher import DataWatcher, DATA_VERSION_STORE, version_components, register_version_push, files_version
+from callback_cache import CallbackCache, register_metrics_endpoint
 warnings.filterwarnings('ignore')
 
+STARTUP_TIMER.mark('import')
+
+DATA_FILE = 'clean/sales_clean.xlsx'
+WATCH_FILES = [DATA_FILE, default_cube_path(DATA_FILE)]
+TABLE_COLUMNS = ['OrderID', 'Order Date', 'Product', 'Qty', 'Unit Price', 'line_amount', 'Region']
+
+# 資料更新時需要替換內容的元件
+STAT_IDS = ['stat-total-sales', 'stat-total-orders', 'stat-total-products', 'stat-total-regions']
+GRAPH_IDS = {
+    'daily_sales': 'daily-sales-chart',
+    'top_products': 'top-products-chart',
+    'region_summary': 'region-summary-chart',
+    'region_bar': 'region-bar-chart'
+}
+
+# 首屏的圖表隨版面送出；下方的區域圖表在頁面載入後才由回調建立
+VISIBLE_FIGURES = ['daily_sales', 'top_products']
+DEFERRED_FIGURES = ['region_summary', 'region_bar']
+FIGURE_NAMES = VISIBLE_FIGURES + DEFERRED_FIGURES
+
 def load_sales_data():
     """
     讀取 sales_clean.xlsx 的 Cleaned_Data 工作表
     """
     try:
         # 讀取 Excel 檔案的 Cleaned_Data 工作表
-        df = pd.read_excel('clean/sales_clean.xlsx', sheet_name='Cleaned_Data')
+        df = load_sheet(DATA_FILE, sheet_name='Cleaned_Data')
         print(f"成功讀取資料，共 {len(df)} 筆記錄")
         print(f"資料欄位: {df.columns.tolist()}")
         return df
@@ -24,13 +54,17 @@ def load_sales_data():
         print(f"讀取檔案時發生錯誤: {e}")
         return None
 
-def create_daily_sales_chart(df):
+def create_daily_sales_chart(cube):
     """
     創建當日銷售總額圖表
     """
-    # 按日期彙總銷售總額
-    daily_sales = df.groupby('Order Date')['line_amount'].sum().reset_index()
-    daily_sales['Order Date'] = pd.to_datetime(daily_sales['Order Date'])
+    # plotly 延遲到建立圖表時才匯入，縮短啟動時間
+    import plotly.graph_objects as go
+    
+    # 按日期彙總銷售總額（由 cube 上捲到日期）
+    daily_sales = cube.query(by=['date'], measures=['amount'])
+    daily_sales = daily_sales.rename(columns={'date': 'Order Date', 'amount': 'line_amount'})[['Order Date', 'line_amount']]
+    daily_sales['Order Date'] = to_date_column(daily_sales['Order Date'])
     daily_sales = daily_sales.sort_values('Order Date')
     
     fig = go.Figure()
@@ -53,12 +87,15 @@ def create_daily_sales_chart(df):
     
     return fig
 
-def create_top_products_chart(df):
+def create_top_products_chart(cube):
     """
     創建前 5 名商品圖表
     """
+    import plotly.graph_objects as go
+    
     # 按產品彙總銷售總額，取前 5 名
-    top_products = df.groupby('Product')['line_amount'].sum().sort_values(ascending=False).head(5)
+    product_sales = cube.query(by=['product'], measures=['amount'])
+    top_products = top_items(product_sales, 'product', 'amount', 5)
     
     fig = go.Figure(data=[
         go.Bar(
@@ -81,12 +118,21 @@ def create_top_products_chart(df):
     
     return fig
 
-def create_region_summary_chart(df):
+def region_totals(cube):
+    """
+    各區域銷售總額（欄位 Region、line_amount）
+    """
+    region_sales = cube.query(by=['region'], measures=['amount'])
+    return region_sales.rename(columns={'region': 'Region', 'amount': 'line_amount'})[['Region', 'line_amount']]
+
+def create_region_summary_chart(region_sales):
     """
     創建按區域彙總圖表
+    
+    Args:
+        region_sales (pd.DataFrame): region_totals() 的結果（與區域柱狀圖共用）
     """
-    # 按區域彙總銷售總額
-    region_sales = df.groupby('Region')['line_amount'].sum().reset_index()
+    import plotly.graph_objects as go
     
     fig = go.Figure(data=[
         go.Pie(
@@ -107,12 +153,14 @@ def create_region_summary_chart(df):
     
     return fig
 
-def create_region_bar_chart(df):
+def create_region_bar_chart(region_sales):
     """
     創建區域銷售柱狀圖
+    
+    Args:
+        region_sales (pd.DataFrame): region_totals() 的結果（與區域佔比圖共用）
     """
-    # 按區域彙總銷售總額
-    region_sales = df.groupby('Region')['line_amount'].sum().reset_index()
+    import plotly.graph_objects as go
     
     fig = go.Figure(data=[
         go.Bar(
@@ -134,19 +182,26 @@ def create_region_bar_chart(df):
     
     return fig
 
-def create_summary_stats(df):
+def create_summary_stats(cube, total_orders):
     """
-    創建摘要統計資訊
+    創建摘要統計資訊（金額、商品與區域由 cube 或其切片計算）
+    
+    同一張訂單可有多筆明細（清洗時以 OrderID + Product 去重），不重複的
+    訂單數無法由 cube 的明細筆數相加，改由 count_orders 以明細計算後傳入。
+    
+    Args:
+        cube (Cube): cube 或篩選後的切片
+        total_orders (int): 不重複的訂單數
     """
     # 計算各種統計數據
-    total_sales = df['line_amount'].sum()
-    total_orders = df['OrderID'].nunique()
-    total_products = df['Product'].nunique()
-    total_regions = df['Region'].nunique()
+    totals = cube.query(measures=['amount'])
+    total_sales = totals['amount'].iloc[0]
+    total_products = cube.data['product'].nunique()
+    total_regions = cube.data['region'].nunique()
     avg_order_value = total_sales / total_orders if total_orders > 0 else 0
     
     # 最新銷售日期
-    latest_date = pd.to_datetime(df['Order Date'].max())
+    latest_date = cube.data['date'].max()
     
     return {
         'total_sales': total_sales,
@@ -157,117 +212,447 @@ def create_summary_stats(df):
         'latest_date': latest_date
     }
 
-def create_dashboard():
+def format_summary_stats(stats):
     """
-    創建 Dash 儀表板
+    摘要統計卡片顯示的文字（總銷售額、總訂單數、商品種類、銷售區域）
+    """
+    return [
+        f"NT$ {stats['total_sales']:,.0f}",
+        f"{stats['total_orders']:,}",
+        f"{stats['total_products']}",
+        f"{stats['total_regions']}"
+    ]
+
+def overview_builders(cube):
+    """
+    四張圖表的建立函數（供 LazyFigures 使用），兩張區域圖表共用同一次區域彙總
+    
+    Args:
+        cube (callable): 回傳 Cube 的函數，第一張圖表建立時才呼叫
+    """
+    shared = {}
+    
+    def regions():
+        # LazyFigures 建立圖表時持有鎖，不會重複計算
+        if 'region_sales' not in shared:
+            shared['region_sales'] = region_totals(cube())
+        return shared['region_sales']
+    
+    return {
+        'daily_sales': lambda: create_daily_sales_chart(cube()),
+        'top_products': lambda: create_top_products_chart(cube()),
+        'region_summary': lambda: create_region_summary_chart(regions()),
+        'region_bar': lambda: create_region_bar_chart(regions())
+    }
+
+def build_row_filter(df):
+    """
+    明細列的篩選代碼（區域、商品、日期與訂單），每個資料版本建立一次
+    
+    篩選器改變時只需以代碼查表產生遮罩，供不重複訂單數與明細表格使用
+    """
+    region_codes, regions = pd.factorize(df['Region'], sort=True)
+    product_codes, products = pd.factorize(df['Product'], sort=True)
+    order_codes, orders = pd.factorize(df['OrderID'])
+    return {
+        'region': (region_codes, regions),
+        'product': (product_codes, products),
+        'date': to_date_column(df['Order Date']).dt.normalize().to_numpy(),
+        'order': order_codes,
+        'n_orders': len(orders)
+    }
+
+def row_filter_arrays(row_filter, prefix=''):
+    """
+    匯出 build_row_filter 的陣列（寫入啟動快照，供其他 worker 記憶體映射）
+    """
+    arrays = {f'{prefix}date': row_filter['date'], f'{prefix}order': row_filter['order'],
+              f'{prefix}n_orders': np.array([row_filter['n_orders']])}
+    for column in ('region', 'product'):
+        codes, labels = row_filter[column]
+        arrays[f'{prefix}{column}.codes'] = codes
+        arrays[f'{prefix}{column}.labels'] = labels.to_numpy()
+    return arrays
+
+def row_filter_from_arrays(arrays, prefix=''):
+    """
+    由 row_filter_arrays 匯出的陣列還原 build_row_filter 的結果
+    """
+    row_filter = {'date': arrays[f'{prefix}date'], 'order': arrays[f'{prefix}order'],
+                  'n_orders': int(arrays[f'{prefix}n_orders'][0])}
+    for column in ('region', 'product'):
+        row_filter[column] = (arrays[f'{prefix}{column}.codes'], pd.Index(arrays[f'{prefix}{column}.labels']))
+    return row_filter
+
+def filter_rows_mask(row_filter, filters):
+    """
+    normalize_filters 的結果轉為明細列的布林遮罩（與 cube_filters 的條件相同）
+    """
+    regions, products, start_date, end_date = filters
+    mask = np.ones(len(row_filter['order']), dtype=bool)
+    for column, values in (('region', regions), ('product', products)):
+        if values:
+            codes, labels = row_filter[column]
+            # 缺失值（代碼 -1）使用最後一個位置
+            mask &= np.append(labels.isin(list(values)), False)[codes]
+    dates = row_filter['date']
+    if start_date:
+        mask &= dates >= np.datetime64(pd.Timestamp(start_date))
+    if end_date:
+        mask &= dates <= np.datetime64(pd.Timestamp(end_date))
+    return mask
+
+def count_orders(row_filter, mask=None):
+    """
+    不重複的訂單數（OrderID 缺失的明細不計入）
+    
+    Args:
+        row_filter (dict): build_row_filter 的結果
+        mask (np.ndarray): 篩選後的明細遮罩，None 表示全部
+    """
+    codes = row_filter['order'] if mask is None else row_filter['order'][mask]
+    codes = codes[codes >= 0]
+    return int(np.count_nonzero(np.bincount(codes, minlength=row_filter['n_orders'])))
+
+def normalize_filters(regions, products, start_date, end_date):
+    """
+    篩選條件正規化為快取鍵值：區域與商品排序去重、日期轉為 ISO 字串
+    
+    Returns:
+        tuple: (區域, 商品, 開始日期, 結束日期)；全部為空表示不篩選
+    """
+    def dates(value):
+        return pd.Timestamp(value).isoformat() if value else None
+    
+    return (tuple(sorted(set(regions or []))), tuple(sorted(set(products or []))),
+            dates(start_date), dates(end_date))
+
+def cube_filters(filters):
+    """
+    normalize_filters 的結果轉為 Cube 的 filters（日期範圍含兩端，可只設定一端）
+    """
+    regions, products, start_date, end_date = filters
+    result = {}
+    if regions:
+        result['region'] = list(regions)
+    if products:
+        result['product'] = list(products)
+    if start_date or end_date:
+        result['date'] = slice(start_date, end_date)
+    return result
+
+def build_snapshot():
+    """
+    解析 Excel 並建立快照內容：資料、摘要與所有圖表（JSON）、篩選與表格索引陣列
+    
+    Returns:
+        tuple: (資料, 中繼資料, 索引陣列)
     """
-    # 讀取資料
     df = load_sales_data()
     if df is None:
-        return "無法讀取資料檔案"
+        raise ValueError("無法讀取資料檔案")
+    cube = get_cube('sales', DATA_FILE, df)
+    row_filter = build_row_filter(df)
+    stats_text = format_summary_stats(create_summary_stats(cube, count_orders(row_filter)))
+    figures = LazyFigures(overview_builders(lambda: cube))
+    arrays = {**row_filter_arrays(row_filter, 'row_filter.'),
+              **TableIndex(df, TABLE_COLUMNS).to_arrays('table_index.')}
+    return df, {'stats_text': stats_text, 'figures': figures.to_json()}, arrays
+
+def build_dashboard_state(version):
+    """
+    載入資料並建立摘要、圖表與表格索引（啟動與資料更新時執行）
+    
+    設定 DASHBOARD_SNAPSHOT_DIR 時，同一資料版本的資料（記憶體映射的
+    Feather）、篩選與表格索引（記憶體映射的 .npy）、摘要與圖表（JSON）
+    直接由快照載入，不解析 Excel 也不重建索引；資料更新時只有一個行程
+    重新產生快照。沒有快照時圖表在第一次使用時才建立。
+    
+    Returns:
+        dict: version、df、cube（回傳 Cube 的函數）、row_filter、regions、products、
+            stats_text、figures、table_index
+    """
+    # 摘要、圖表與篩選都直接查詢物化的 cube，不再掃描明細
+    # （有快照時到第一次篩選才取得）
+    cubes = {}
+    lock = threading.Lock()
+    
+    def sales_cube():
+        with lock:
+            if 'sales' not in cubes:
+                cubes['sales'] = get_cube('sales', DATA_FILE, df)
+            return cubes['sales']
+    
+    snapshot = shared_snapshot('sales', version, build_snapshot)
+    if snapshot is not None:
+        df, meta, arrays = snapshot
+        row_filter = row_filter_from_arrays(arrays, 'row_filter.')
+        table_index = TableIndex.from_arrays(df, arrays, TABLE_COLUMNS, 'table_index.')
+        stats_text, prebuilt = meta['stats_text'], meta['figures']
+    else:
+        df = load_sales_data()
+        if df is None:
+            raise ValueError("無法讀取資料檔案")
+        row_filter = build_row_filter(df)
+        table_index = TableIndex(df, TABLE_COLUMNS).prepare()
+        stats_text = format_summary_stats(create_summary_stats(sales_cube(), count_orders(row_filter)))
+        prebuilt = None
+    
+    return {
+        'version': version,
+        'df': df,
+        'cube': sales_cube,
+        'row_filter': row_filter,
+        'regions': list(row_filter['region'][1]),
+        'products': list(row_filter['product'][1]),
+        'stats_text': stats_text,
+        'figures': LazyFigures(overview_builders(sales_cube), prebuilt),
+        'table_index': table_index
+    }
+
+def prepare_snapshot():
+    """
+    預先寫入目前資料版本的啟動快照（多 worker 服務啟動前由主行程執行一次）
+    """
+    shared_snapshot('sales', files_version(WATCH_FILES), build_snapshot)
+
+def create_dashboard(server=True, url_base_pathname='/', watcher=None):
+    """
+    創建 Dash 儀表板
+    
+    Args:
+        server (flask.Flask 或 bool): 共用的 Flask 伺服器，True 表示建立新的伺服器
+        url_base_pathname (str): 儀表板的路徑前綴（多頁面中心中的頁面路徑）
+        watcher (LazyWatcher): 共用的資料監看器；None 表示啟動時立即載入資料
+    """
+    # 讀取資料；清洗結果或 cube 檔更新時在背景重新載入並替換，不需重啟
+    lazy = watcher is not None
+    if not lazy:
+        try:
+            watcher = DataWatcher('sales', WATCH_FILES, build_dashboard_state)
+        except ValueError as e:
+            return str(e)
+    watcher.start()
+    STARTUP_TIMER.mark('load')
     
     # 創建 Dash 應用
-    app = dash.Dash(__name__, external_stylesheets=[dbc.themes.BOOTSTRAP])
-    
-    # 獲取摘要統計
-    stats = create_summary_stats(df)
-    
-    # 創建圖表
-    daily_sales_fig = create_daily_sales_chart(df)
-    top_products_fig = create_top_products_chart(df)
-    region_summary_fig = create_region_summary_chart(df)
-    region_bar_fig = create_region_bar_chart(df)
-    
-    # 儀表板佈局
-    app.layout = dbc.Container([
-        dbc.Row([
-            dbc.Col([
-                html.H1("銷售資料分析儀表板", className="text-center mb-4"),
-                html.Hr()
-            ])
-        ]),
+    # 共用的監看器延遲載入資料：不在建立時呼叫版面函數驗證回調，第一次開啟頁面才載入
+    app = dash.Dash(__name__, server=server, url_base_pathname=url_base_pathname,
+                    suppress_callback_exceptions=lazy, external_stylesheets=[dbc.themes.BOOTSTRAP])
+    
+    # 儀表板佈局（每次開啟頁面時以目前的資料建立）
+    def serve_layout():
+        state = watcher.current()
+        stats_text = state['stats_text']
+        figures = state['figures']
         
-        # 摘要統計卡片
-        dbc.Row([
-            dbc.Col([
-                dbc.Card([
-                    dbc.CardBody([
-                        html.H4("總銷售額", className="card-title"),
-                        html.H2(f"NT$ {stats['total_sales']:,.0f}", className="text-primary")
-                    ])
-                ], className="text-center")
-            ], width=3),
-            dbc.Col([
-                dbc.Card([
-                    dbc.CardBody([
-                        html.H4("總訂單數", className="card-title"),
-                        html.H2(f"{stats['total_orders']:,}", className="text-success")
-                    ])
-                ], className="text-center")
-            ], width=3),
-            dbc.Col([
-                dbc.Card([
-                    dbc.CardBody([
-                        html.H4("商品種類", className="card-title"),
-                        html.H2(f"{stats['total_products']}", className="text-info")
-                    ])
-                ], className="text-center")
-            ], width=3),
-            dbc.Col([
-                dbc.Card([
-                    dbc.CardBody([
-                        html.H4("銷售區域", className="card-title"),
-                        html.H2(f"{stats['total_regions']}", className="text-warning")
+        return dbc.Container([
+            dbc.Row([
+                dbc.Col([
+                    html.H1("銷售資料分析儀表板", className="text-center mb-4"),
+                    html.Hr()
+                ])
+            ]),
+        
+            # 摘要統計卡片
+            dbc.Row([
+                dbc.Col([
+                    dbc.Card([
+                        dbc.CardBody([
+                            html.H4("總銷售額", className="card-title"),
+                            html.H2(stats_text[0], id=STAT_IDS[0], className="text-primary")
+                        ])
+                    ], className="text-center")
+                ], width=3),
+                dbc.Col([
+                    dbc.Card([
+                        dbc.CardBody([
+                            html.H4("總訂單數", className="card-title"),
+                            html.H2(stats_text[1], id=STAT_IDS[1], className="text-success")
+                        ])
+                    ], className="text-center")
+                ], width=3),
+                dbc.Col([
+                    dbc.Card([
+                        dbc.CardBody([
+                            html.H4("商品種類", className="card-title"),
+                            html.H2(stats_text[2], id=STAT_IDS[2], className="text-info")
+                        ])
+                    ], className="text-center")
+                ], width=3),
+                dbc.Col([
+                    dbc.Card([
+                        dbc.CardBody([
+                            html.H4("銷售區域", className="card-title"),
+                            html.H2(stats_text[3], id=STAT_IDS[3], className="text-warning")
+                        ])
+                    ], className="text-center")
+                ], width=3)
+            ], className="mb-4"),
+            
+            # 篩選器（摘要與圖表由 cube 的切片計算）
+            dbc.Row([
+                dbc.Col([
+                    dbc.Card([
+                        dbc.CardHeader("資料篩選"),
+                        dbc.CardBody([
+                            dbc.Row([
+                                dbc.Col([
+                                    html.Label("區域:"),
+                                    dcc.Dropdown(
+                                        id='region-filter',
+                                        options=[{'label': region, 'value': region} for region in state['regions']],
+                                        multi=True,
+                                        placeholder="全部區域"
+                                    )
+                                ], width=4),
+                                dbc.Col([
+                                    html.Label("商品:"),
+                                    dcc.Dropdown(
+                                        id='product-filter',
+                                        options=[{'label': product, 'value': product} for product in state['products']],
+                                        multi=True,
+                                        placeholder="全部商品"
+                                    )
+                                ], width=4),
+                                dbc.Col([
+                                    html.Label("日期範圍:"),
+                                    dcc.DatePickerRange(
+                                        id='date-filter',
+                                        display_format='YYYY-MM-DD',
+                                        start_date_placeholder_text="開始日期",
+                                        end_date_placeholder_text="結束日期",
+                                        clearable=True
+                                    )
+                                ], width=4)
+                            ])
+                        ])
                     ])
-                ], className="text-center")
-            ], width=3)
-        ], className="mb-4"),
+                ])
+            ], className="mb-4"),
         
-        # 圖表區域
-        dbc.Row([
-            dbc.Col([
-                dcc.Graph(figure=daily_sales_fig)
-            ], width=6),
-            dbc.Col([
-                dcc.Graph(figure=top_products_fig)
-            ], width=6)
-        ], className="mb-4"),
+            # 圖表區域
+            dbc.Row([
+                dbc.Col([
+                    dcc.Graph(id=GRAPH_IDS['daily_sales'], figure=figures.get('daily_sales'))
+                ], width=6),
+                dbc.Col([
+                    dcc.Graph(id=GRAPH_IDS['top_products'], figure=figures.get('top_products'))
+                ], width=6)
+            ], className="mb-4"),
         
-        dbc.Row([
-            dbc.Col([
-                dcc.Graph(figure=region_summary_fig)
-            ], width=6),
-            dbc.Col([
-                dcc.Graph(figure=region_bar_fig)
-            ], width=6)
-        ], className="mb-4"),
+            dbc.Row([
+                dbc.Col([
+                    dcc.Graph(id=GRAPH_IDS['region_summary'])
+                ], width=6),
+                dbc.Col([
+                    dcc.Graph(id=GRAPH_IDS['region_bar'])
+                ], width=6)
+            ], className="mb-4"),
         
-        # 資料表格
-        dbc.Row([
-            dbc.Col([
-                html.H3("銷售資料明細", className="mb-3"),
-                html.Div([
-                    dash_table.DataTable(
-                        id='sales-table',
-                        columns=[
-                            {"name": "訂單ID", "id": "OrderID"},
-                            {"name": "日期", "id": "Order Date"},
-                            {"name": "產品", "id": "Product"},
-                            {"name": "數量", "id": "Qty"},
-                            {"name": "單價", "id": "Unit Price"},
-                            {"name": "小計", "id": "line_amount"},
-                            {"name": "區域", "id": "Region"}
-                        ],
-                        data=df.head(100).to_dict('records'),  # 只顯示前100筆
-                        page_size=20,
-                        style_table={'overflowX': 'auto'},
-                        style_cell={'textAlign': 'center'},
-                        style_header={'backgroundColor': 'rgb(230, 230, 230)', 'fontWeight': 'bold'}
-                    )
+            # 資料表格
+            dbc.Row([
+                dbc.Col([
+                    html.H3("銷售資料明細", className="mb-3"),
+                    html.P("依上方的區域、商品與日期篩選", className="text-muted"),
+                    html.Div([
+                        dash_table.DataTable(
+                            id='sales-table',
+                            columns=[
+                                {"name": "訂單ID", "id": "OrderID"},
+                                {"name": "日期", "id": "Order Date"},
+                                {"name": "產品", "id": "Product"},
+                                {"name": "數量", "id": "Qty"},
+                                {"name": "單價", "id": "Unit Price"},
+                                {"name": "小計", "id": "line_amount"},
+                                {"name": "區域", "id": "Region"}
+                            ],
+                            # 伺服器端分頁：只傳送目前頁面的資料
+                            page_size=20,
+                            **CUSTOM_PAGING_PROPS,
+                            style_table={'overflowX': 'auto'},
+                            style_cell={'textAlign': 'center'},
+                            style_header={'backgroundColor': 'rgb(230, 230, 230)', 'fontWeight': 'bold'}
+                        )
+                    ])
                 ])
-            ])
-        ])
-    ], fluid=True)
+            ]),
+            
+            # 資料版本（資料更新時推送給回調）
+            *version_components(watcher)
+        ], fluid=True)
+    
+    app.layout = STARTUP_TIMER.first_call('layout', serve_layout)
+    
+    register_version_push(app, watcher)
+    
+    def build_table_page(state, filters, page_current, page_size, sort_by, filter_query):
+        # 明細表格套用與摘要、圖表相同的篩選條件；翻頁時重複使用同一組篩選結果
+        base_mask = filter_rows_mask(state['row_filter'], filters) if any(filters) else None
+        try:
+            return state['table_index'].page(page_current, page_size, sort_by, filter_query,
+                                             base_mask, (state['version'], filters))
+        except ValueError as e:
+            # 表格篩選條件無法解析時顯示空白頁面
+            print(f"表格篩選失敗: {e}")
+            return [], 1
+    
+    # 回調函數：伺服器端分頁、排序與篩選（含頁面上方的篩選器）
+    @app.callback(
+        [Output('sales-table', 'data'),
+         Output('sales-table', 'page_count')],
+        [Input('region-filter', 'value'),
+         Input('product-filter', 'value'),
+         Input('date-filter', 'start_date'),
+         Input('date-filter', 'end_date'),
+         Input('sales-table', 'page_current'),
+         Input('sales-table', 'page_size'),
+         Input('sales-table', 'sort_by'),
+         Input('sales-table', 'filter_query'),
+         Input(DATA_VERSION_STORE, 'data')]
+    )
+    def update_table(regions, products, start_date, end_date, page_current, page_size, sort_by, filter_query,
+                     data_version):
+        filters = normalize_filters(regions, products, start_date, end_date)
+        return build_table_page(watcher.current(), filters, page_current, page_size, sort_by, filter_query)
+    
+    # 篩選結果快取（LRU；鍵值包含資料版本）
+    overview_cache = CallbackCache('sales_overview')
+    
+    @overview_cache.memoize(lambda state, filters: (state['version'], filters))
+    def build_filtered_overview(state, filters):
+        # 切片一次，摘要與四張圖表都只彙總切片後的維度組合，與訂單筆數無關
+        cube = state['cube']().slice(cube_filters(filters))
+        figures = LazyFigures(overview_builders(lambda: cube))
+        total_orders = count_orders(state['row_filter'], filter_rows_mask(state['row_filter'], filters))
+        return format_summary_stats(create_summary_stats(cube, total_orders)) + [figures.get(name) for name in FIGURE_NAMES]
+    
+    # 回調函數：篩選條件或資料版本改變時更新摘要與圖表
+    @app.callback(
+        [Output(stat_id, 'children') for stat_id in STAT_IDS] +
+        [Output(GRAPH_IDS[name], 'figure') for name in FIGURE_NAMES],
+        [Input('region-filter', 'value'),
+         Input('product-filter', 'value'),
+         Input('date-filter', 'start_date'),
+         Input('date-filter', 'end_date'),
+         Input(DATA_VERSION_STORE, 'data')]
+    )
+    def update_overview(regions, products, start_date, end_date, data_version):
+        state = watcher.current()
+        filters = normalize_filters(regions, products, start_date, end_date)
+        if any(filters):
+            return build_filtered_overview(state, filters)
+        
+        figures = state['figures']
+        deferred = [figures.get(name) for name in DEFERRED_FIGURES]
+        if dash.callback_context.triggered_id is None:
+            # 頁面載入：摘要與首屏圖表已隨版面送出，只建立下方的圖表
+            return [dash.no_update] * (len(STAT_IDS) + len(VISIBLE_FIGURES)) + deferred
+        return state['stats_text'] + [figures.get(name) for name in VISIBLE_FIGURES] + deferred
+    
+    STARTUP_TIMER.attach(app)
+    register_metrics_endpoint(app, [overview_cache], path=f"{url_base_pathname}metrics", extra={'startup': STARTUP_TIMER.report})
+    STARTUP_TIMER.mark('app')
     
     return app
 
@@ -278,6 +663,7 @@ if __name__ == "__main__":
     if isinstance(app, str):
         print(app)
     else:
+        STARTUP_TIMER.print_report()
         print("啟動銷售分析儀表板...")
         print("請在瀏覽器中開啟: http://127.0.0.1:8050")
         app.run_server(debug=True, host='127.0.0.1', port=8050)
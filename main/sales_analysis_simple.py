@@ -1,7 +1,9 @@
-import pandas as pd
 import json
 from datetime import datetime
 import warnings
+from date_utils import to_date_column, format_date
+from data_loader import load_sheet
+from heavy_hitters import top_items
 warnings.filterwarnings('ignore')
 
 def load_sales_data():
@@ -10,7 +12,7 @@ def load_sales_data():
     """
     try:
         # 讀取 Excel 檔案的 Cleaned_Data 工作表
-        df = pd.read_excel('../clean/sales_clean.xlsx', sheet_name='Cleaned_Data')
+        df = load_sheet('../clean/sales_clean.xlsx', sheet_name='Cleaned_Data')
         print(f"成功讀取資料，共 {len(df)} 筆記錄")
         print(f"資料欄位: {df.columns.tolist()}")
         return df
@@ -30,11 +32,11 @@ def create_html_dashboard(df):
     
     # 當日銷售總額
     daily_sales = df.groupby('Order Date')['line_amount'].sum().reset_index()
-    daily_sales['Order Date'] = pd.to_datetime(daily_sales['Order Date'])
+    daily_sales['Order Date'] = to_date_column(daily_sales['Order Date'])
     daily_sales = daily_sales.sort_values('Order Date')
     
     # 前 5 名商品
-    top_products = df.groupby('Product')['line_amount'].sum().sort_values(ascending=False).head(5)
+    top_products = top_items(df, 'Product', 'line_amount', 5)
     
     # 按區域彙總
     region_sales = df.groupby('Region')['line_amount'].sum().reset_index()
@@ -215,7 +217,7 @@ def create_html_dashboard(df):
         html_content += f"""
                     <tr>
                         <td>{row['OrderID']}</td>
-                        <td>{row['Order Date']}</td>
+                        <td>{format_date(row['Order Date'])}</td>
                         <td>{row['Product']}</td>
                         <td>{row['Qty']}</td>
                         <td>NT$ {row['Unit Price']:,.0f}</td>
@@ -3,6 +3,10 @@ import numpy as np
 import re
 from datetime import datetime
 import warnings
+from date_utils import to_date_column, excel_writer
+from pivot_engine import build_pivot
+from heavy_hitters import HeavyHitters
+from olap_cube import materialize_cube, default_cube_path
 warnings.filterwarnings('ignore')
 
 def clean_sales_data(input_file, output_file):
@@ -26,7 +30,7 @@ def clean_sales_data(input_file, output_file):
     
     # 1. 日期格式標準化
     print("\n1. 處理日期格式...")
-    df['Order Date'] = df['Order Date'].apply(standardize_date)
+    df['Order Date'] = to_date_column(df['Order Date'].apply(standardize_date))
     
     # 2. 產品名稱清理
     print("2. 清理產品名稱...")
@@ -65,13 +69,16 @@ def clean_sales_data(input_file, output_file):
     
     # 儲存到 Excel
     print(f"\n儲存清洗後的資料到: {output_file}")
-    with pd.ExcelWriter(output_file, engine='openpyxl') as writer:
+    with excel_writer(output_file) as writer:
         df.to_excel(writer, sheet_name='Cleaned_Data', index=False)
         
         # 儲存彙總報表
         for sheet_name, summary_df in summary_sheets.items():
             summary_df.to_excel(writer, sheet_name=sheet_name, index=True)
     
+    # 物化 OLAP cube（date × region × product），樞紐分析與儀表板直接查詢 cube
+    materialize_cube(df, 'sales', default_cube_path(output_file))
+    
     print("資料清洗完成！")
     return df
 
@@ -269,23 +276,19 @@ def create_summary_reports(df):
     summary_sheets['Product_Summary'] = product_summary
     
     # 3. 樞紐表：產品為標題，地區為分類，line_amount為數值
+    # 產品 × 地區組合過多時自動改用稀疏模式，以長表輸出
     print("建立樞紐表...")
-    pivot_table = df.pivot_table(
-        values='line_amount',
+    pivot = build_pivot(
+        df,
         index='Product',
         columns='Region',
-        aggfunc='sum',
-        fill_value=0
+        values='line_amount',
+        row_total_label='Total',
+        column_total_label='Total'
     )
-    
-    # 新增總計欄位
-    pivot_table['Total'] = pivot_table.sum(axis=1)
-    
-    # 新增總計列
-    total_row = pivot_table.sum()
-    pivot_table.loc['Total'] = total_row
-    
-    summary_sheets['Pivot_Table'] = pivot_table
+    if pivot.sparse:
+        print(f"  稀疏模式 (密度 {pivot.density:.2%})，樞紐表以長表輸出")
+    summary_sheets.update(pivot.to_sheets('Pivot_Table'))
     
     # 4. 按日期彙總
     print("建立日期彙總報表...")
@@ -300,8 +303,28 @@ def create_summary_reports(df):
     })
     summary_sheets['Date_Summary'] = date_summary
     
+    # 5. 熱銷商品（串流 top-K，狀態大小固定，附誤差界限）
+    print("建立熱銷商品排名...")
+    summary_sheets['Top_Products'] = create_top_products(df)
+    
     return summary_sheets
 
+def create_top_products(df, top_n=10, chunk_size=10000):
+    """
+    以 HeavyHitters 逐批累積，取得依營收與數量排名的前 N 名商品
+    """
+    tracker = HeavyHitters('Product', {'revenue': 'line_amount', 'quantity': 'Qty'})
+    for start in range(0, len(df), chunk_size):
+        tracker.update(df.iloc[start:start + chunk_size])
+    
+    rankings = []
+    for measure in ['revenue', 'quantity']:
+        ranking = tracker.top(top_n, by=measure)
+        ranking.insert(0, 'Measure', measure)
+        ranking.insert(1, 'Rank', range(1, len(ranking) + 1))
+        rankings.append(ranking)
+    return pd.concat(rankings, ignore_index=True).set_index(['Measure', 'Rank'])
+
 if __name__ == "__main__":
     # 設定檔案路徑
     input_file = "dirty/3.sales_dirty.xlsx"
@@ -318,3 +341,5 @@ if __name__ == "__main__":
         print("- Product_Summary: 產品彙總") 
         print("- Pivot_Table: 樞紐表 (產品為標題，地區為分類)")
         print("- Date_Summary: 日期彙總")
+        print("- Top_Products: 熱銷商品排名 (營收、數量)")
+        print(f"Cube 檔: {default_cube_path(output_file)}")
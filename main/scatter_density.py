@@ -0,0 +1,103 @@
+import numpy as np
+import pandas as pd
+
+# 點數超過此值時改以伺服器端彙總的密度圖呈現（只傳送網格，不傳送每一筆資料）
+DEFAULT_MAX_POINTS = 5000
+
+# 密度圖每個軸的格數上限；不重複值不超過此數時（如折扣）直接以各值為一格
+DEFAULT_BINS = 60
+
+def axis_bins(values, bins=DEFAULT_BINS):
+    """
+    將一個軸的值分格
+
+    Args:
+        values (np.ndarray): 數值（不含缺失值）
+        bins (int): 格數上限
+
+    Returns:
+        tuple: (每個值的格代碼, 各格中心值)
+    """
+    uniques = np.sort(pd.unique(values))
+    if len(uniques) <= bins:
+        # 離散值：每個值一格，座標即原值
+        return np.searchsorted(uniques, values), uniques
+
+    lo, hi = uniques[0], uniques[-1]
+    edges = np.linspace(lo, hi, bins + 1)
+    codes = np.clip(((values - lo) / (hi - lo) * bins).astype(np.int64), 0, bins - 1)
+    return codes, (edges[:-1] + edges[1:]) / 2
+
+def density_grid(x, y, bins=DEFAULT_BINS, weights=None):
+    """
+    x × y 的二維直方圖
+
+    Args:
+        x, y (array-like): 座標，任一為缺失值的點不列入
+        bins (int): 每個軸的格數上限
+        weights (array-like): 權重，None 表示計算筆數
+
+    Returns:
+        tuple: (x 格中心, y 格中心, 網格 [len(y), len(x)])
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    valid = ~(np.isnan(x) | np.isnan(y))
+    if weights is not None:
+        weights = np.nan_to_num(np.asarray(weights, dtype=float)[valid])
+    x, y = x[valid], y[valid]
+    if len(x) == 0:
+        return np.array([]), np.array([]), np.zeros((0, 0))
+
+    x_codes, x_centers = axis_bins(x, bins)
+    y_codes, y_centers = axis_bins(y, bins)
+    grid = np.bincount(y_codes * len(x_centers) + x_codes, weights=weights,
+                       minlength=len(x_centers) * len(y_centers))
+    return x_centers, y_centers, grid.reshape(len(y_centers), len(x_centers))
+
+def scatter_or_density(df, x, y, title=None, labels=None, size=None, max_points=DEFAULT_MAX_POINTS,
+                       bins=DEFAULT_BINS, count_label='筆數', height=None):
+    """
+    點數不多時繪製散佈圖；超過 max_points 時改為密度熱圖
+
+    Args:
+        df (pd.DataFrame): 資料
+        x, y (str): 座標欄位
+        title (str): 圖表標題
+        labels (dict): 欄位顯示名稱（同 plotly express）
+        size (str): 散佈圖的點大小欄位（密度圖不使用）
+        max_points (int): 切換為密度圖的點數門檻
+        bins (int): 密度圖每個軸的格數上限
+        count_label (str): 密度圖色階的名稱
+        height (int): 圖表高度
+
+    Returns:
+        go.Figure
+    """
+    # plotly 只在繪圖時匯入，儀表板啟動時不需載入
+    import plotly.express as px
+    import plotly.graph_objects as go
+    
+    labels = labels or {}
+    if len(df) <= max_points:
+        fig = px.scatter(df, x=x, y=y, size=size, title=title, labels=labels)
+    else:
+        x_centers, y_centers, grid = density_grid(df[x], df[y], bins)
+        x_label, y_label = labels.get(x, x), labels.get(y, y)
+        fig = go.Figure(go.Heatmap(
+            x=x_centers,
+            y=y_centers,
+            # 沒有資料的格子留白
+            z=np.where(grid > 0, grid, np.nan),
+            colorscale='Blues',
+            colorbar={'title': count_label},
+            hovertemplate=f"{x_label}: %{{x}}<br>{y_label}: %{{y}}<br>{count_label}: %{{z:,.0f}}<extra></extra>"
+        ))
+        fig.update_layout(
+            title=title,
+            xaxis_title=x_label,
+            yaxis_title=y_label
+        )
+    if height:
+        fig.update_layout(height=height)
+    return fig
@@ -0,0 +1,107 @@
+import os
+import argparse
+import importlib
+from startup import configure_snapshot_dir
+
+# 可由正式環境啟動的儀表板：名稱 → 模組（需提供 create_dashboard 與 prepare_snapshot）
+# hub 為所有資料集的多頁面中心
+DASHBOARDS = {
+    'sales': 'sales_analysis_dashboard',
+    'student_case': 'student_case_analysis_dashboard',
+    'hub': 'dashboard_hub'
+}
+
+# 多 worker 共用的快照目錄（未設定 DASHBOARD_SNAPSHOT_DIR 時使用）
+DEFAULT_SNAPSHOT_DIR = os.path.join('clean', 'dashboard_snapshots')
+
+# 每個 worker 的執行緒數；worker 數預設為 CPU 核心數 × 2 + 1
+DEFAULT_THREADS = 4
+DEFAULT_WORKERS = (os.cpu_count() or 1) * 2 + 1
+
+def dashboard_module(name):
+    """
+    取得儀表板模組
+    """
+    if name not in DASHBOARDS:
+        raise ValueError(f"未知的儀表板: {name}（可用: {list(DASHBOARDS)}）")
+    return importlib.import_module(DASHBOARDS[name])
+
+def create_server(name):
+    """
+    WSGI 入口，例如 gunicorn "serving:create_server('sales')"
+
+    Returns:
+        flask.Flask: 儀表板的 WSGI 應用
+    """
+    app = dashboard_module(name).create_dashboard()
+    if isinstance(app, str):
+        raise ValueError(app)
+    return app.server
+
+def serve(name, host='0.0.0.0', port=8050, workers=DEFAULT_WORKERS, threads=DEFAULT_THREADS,
+          snapshot_dir=None):
+    """
+    以多 worker 的 WSGI 伺服器（gunicorn）啟動儀表板
+
+    主行程先解析 Excel 並寫入未壓縮的 Feather 快照與篩選、表格索引陣列，
+    各 worker 啟動時以記憶體映射載入同一份檔案，資料與索引頁面由作業系統
+    共用，記憶體不隨 worker 數量倍增。資料更新後由第一個發現的 worker
+    取得寫入鎖重新產生快照，其他 worker 等待後直接映射新版本。
+
+    Args:
+        name (str): DASHBOARDS 中的儀表板名稱
+        host (str): 綁定位址
+        port (int): 連接埠
+        workers (int): worker 行程數
+        threads (int): 每個 worker 的執行緒數
+        snapshot_dir (str): 快照目錄，預設為 DASHBOARD_SNAPSHOT_DIR 或 DEFAULT_SNAPSHOT_DIR
+    """
+    snapshot_dir = snapshot_dir or os.environ.get('DASHBOARD_SNAPSHOT_DIR') or DEFAULT_SNAPSHOT_DIR
+    configure_snapshot_dir(snapshot_dir)
+    # worker 由 gunicorn 重新啟動時也使用同一個快照目錄
+    os.environ['DASHBOARD_SNAPSHOT_DIR'] = snapshot_dir
+
+    module = dashboard_module(name)
+    print(f"準備 {name} 資料快照: {snapshot_dir}")
+    module.prepare_snapshot()
+
+    try:
+        from gunicorn.app.base import BaseApplication
+    except ImportError:
+        # gunicorn 不支援 Windows；改以單一行程多執行緒的伺服器服務
+        print("未安裝 gunicorn（或在 Windows 上執行），改以單一行程服務")
+        create_server(name).run(host=host, port=port, threaded=True)
+        return
+
+    class DashboardApplication(BaseApplication):
+        def load_config(self):
+            self.cfg.set('bind', f"{host}:{port}")
+            self.cfg.set('workers', workers)
+            self.cfg.set('threads', threads)
+            self.cfg.set('worker_class', 'gthread')
+            # 每個 worker 自行建立應用（載入映射的快照、啟動資料監看執行緒）
+            self.cfg.set('preload_app', False)
+
+        def load(self):
+            return create_server(name)
+
+    print(f"以 {workers} 個 worker × {threads} 個執行緒啟動 {name}: http://{host}:{port}")
+    DashboardApplication().run()
+
+def main():
+    """
+    主函數
+    """
+    parser = argparse.ArgumentParser(description="以正式環境的多 worker 伺服器啟動儀表板")
+    parser.add_argument('dashboard', choices=list(DASHBOARDS), help="儀表板名稱")
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=8050)
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS)
+    parser.add_argument('--threads', type=int, default=DEFAULT_THREADS)
+    parser.add_argument('--snapshot-dir', default=None, help="Feather 快照目錄")
+    args = parser.parse_args()
+
+    serve(args.dashboard, args.host, args.port, args.workers, args.threads, args.snapshot_dir)
+
+if __name__ == "__main__":
+    main()
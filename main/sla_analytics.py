@@ -0,0 +1,250 @@
+import numpy as np
+import pandas as pd
+from date_utils import to_date_column
+from partial_aggregates import merge_counts
+
+# 預設分析維度；'All' 為全部訂單的總覽列
+SLA_DIMENSIONS = ['region', 'product', 'category']
+LEAD_TIME_PERCENTILES = [50, 90, 99]
+
+def stack_dimensions(df, dimensions, value_columns):
+    """
+    將多個維度堆疊成 (dimension, group) 長表，讓所有維度共用一次 groupby
+
+    Args:
+        df (pd.DataFrame): 訂單資料
+        dimensions (list): 維度欄位
+        value_columns (list): 跟著複製的數值欄位
+
+    Returns:
+        pd.DataFrame: 欄位 [dimension, group, *value_columns]，維度值缺失的列會被排除
+    """
+    n_rows = len(df)
+    labels = ['All'] + list(dimensions)
+    groups = [np.full(n_rows, 'All', dtype=object)] + [df[dim].to_numpy(dtype=object) for dim in dimensions]
+
+    stacked = {
+        'dimension': np.repeat(np.array(labels, dtype=object), n_rows),
+        'group': np.concatenate(groups) if n_rows else np.array([], dtype=object)
+    }
+    for col in value_columns:
+        stacked[col] = np.tile(df[col].to_numpy(), len(labels))
+
+    stacked = pd.DataFrame(stacked)
+    return stacked[stacked['group'].notna()]
+
+def histogram_percentiles(hist, value_column, count_column, percentiles):
+    """
+    由已排序的 (group, value, count) 直方圖計算各組百分位數
+
+    等同把每組展開後用 np.percentile（linear 內插），但只在壓縮後的
+    直方圖上以 cumsum + searchsorted 一次算完所有組，不需逐組迴圈。
+
+    Args:
+        hist (pd.DataFrame): 已依 (dimension, group, value) 排序的直方圖
+        value_column (str): 數值欄位（如 lead_time_days）
+        count_column (str): 次數欄位
+        percentiles (list): 百分位數（0 ~ 100）
+
+    Returns:
+        pd.DataFrame: index 為 (dimension, group)，欄位為 p50、p90 ...
+    """
+    group_keys = hist[['dimension', 'group']]
+    is_start = ~group_keys.duplicated().to_numpy()
+    start_rows = np.flatnonzero(is_start)
+
+    counts = hist[count_column].to_numpy(dtype=np.int64)
+    values = hist[value_column].to_numpy(dtype=float)
+    cumulative = np.cumsum(counts)
+
+    # 每組在全域累積次數中的起點與樣本數
+    group_totals = np.add.reduceat(counts, start_rows)
+    group_offsets = cumulative[start_rows] - counts[start_rows]
+
+    result = {}
+    for pct in percentiles:
+        rank = pct / 100 * (group_totals - 1)
+        lower_rank = np.floor(rank)
+        upper_rank = np.ceil(rank)
+        lower_rows = np.searchsorted(cumulative, group_offsets + lower_rank, side='right')
+        upper_rows = np.searchsorted(cumulative, group_offsets + upper_rank, side='right')
+        lower_values = values[lower_rows]
+        upper_values = values[upper_rows]
+        result[f'lead_time_p{pct}'] = lower_values + (upper_values - lower_values) * (rank - lower_rank)
+
+    index = pd.MultiIndex.from_frame(group_keys.iloc[start_rows].reset_index(drop=True))
+    return pd.DataFrame(result, index=index)
+
+class SLATracker:
+    """
+    交期（lead time）與 SLA 指標的累積器
+
+    - 已出貨訂單以 (dimension, group, lead_time_days) 次數直方圖累積，
+      可持續以 add_shipped() 加入新出貨訂單，狀態大小只與組數 × 天數有關
+    - 未出貨訂單（backlog）以快照形式保存，每次 set_open_orders() 取代
+    - summary() 一次產生所有維度的 p50/p90/p99、逾期率與積壓天數
+    """
+
+    def __init__(self, dimensions=None, percentiles=None):
+        """
+        Args:
+            dimensions (list): 分析維度，預設 region、product、category
+            percentiles (list): 交期百分位數，預設 50、90、99
+        """
+        self.dimensions = list(dimensions or SLA_DIMENSIONS)
+        self.percentiles = list(percentiles or LEAD_TIME_PERCENTILES)
+        self.lead_time_hist = None
+        self.overdue_counts = None
+        self.open_orders = None
+        self.latest_date = pd.NaT
+
+    def _track_latest_date(self, orders, columns):
+        for col in columns:
+            if col in orders.columns:
+                latest = to_date_column(orders[col]).max()
+                if pd.notna(latest) and (pd.isna(self.latest_date) or latest > self.latest_date):
+                    self.latest_date = latest
+
+    def add_shipped(self, orders):
+        """
+        加入一批已出貨訂單（需有 lead_time_days、overdue 與各維度欄位）
+
+        lead_time_days 為負值（出貨日早於訂單日）視為資料錯誤，
+        不納入百分位數，另計入 invalid_lead_time。
+        """
+        shipped = orders[orders['lead_time_days'].notna()]
+        if len(shipped) == 0:
+            return
+        self._track_latest_date(shipped, ['order_date', 'ship_date'])
+
+        lead_days = shipped['lead_time_days'].to_numpy(dtype=float)
+        overdue = shipped['overdue']
+        values = pd.DataFrame({
+            'lead_time_days': lead_days,
+            'valid_lead_time': lead_days >= 0,
+            'overdue_known': overdue.notna().to_numpy(),
+            'overdue_orders': (overdue == True).to_numpy()
+        }, index=shipped.index)
+        stacked = stack_dimensions(
+            pd.concat([shipped[self.dimensions], values], axis=1),
+            self.dimensions,
+            list(values.columns)
+        )
+
+        # 交期直方圖：只用一次 groupby 涵蓋所有維度
+        valid = stacked[stacked['valid_lead_time']]
+        new_hist = valid.groupby(['dimension', 'group', 'lead_time_days']).size().rename('orders').reset_index()
+        self.lead_time_hist = merge_counts(self.lead_time_hist, new_hist, ['dimension', 'group', 'lead_time_days'], ['orders'])
+
+        stacked = stacked.assign(invalid_lead_time=~stacked['valid_lead_time'])
+        overdue_columns = ['overdue_known', 'overdue_orders', 'invalid_lead_time']
+        new_overdue = stacked.groupby(['dimension', 'group'])[overdue_columns].sum().reset_index()
+        self.overdue_counts = merge_counts(self.overdue_counts, new_overdue, ['dimension', 'group'], overdue_columns)
+
+    def set_open_orders(self, orders):
+        """
+        以目前尚未出貨的訂單取代 backlog 快照
+        """
+        open_orders = orders[orders['order_date'].notna()].copy()
+        open_orders['order_date'] = to_date_column(open_orders['order_date'])
+        self._track_latest_date(open_orders, ['order_date'])
+
+        stacked = stack_dimensions(open_orders, self.dimensions, ['order_date'])
+        self.open_orders = stacked.groupby(['dimension', 'group', 'order_date']).size().rename('orders').reset_index()
+
+    def update(self, orders):
+        """
+        以一批訂單更新狀態：有出貨日的加入交期統計，沒有出貨日的視為 backlog
+        """
+        ship_dates = to_date_column(orders['ship_date'])
+        self.add_shipped(orders[ship_dates.notna()])
+        self.set_open_orders(orders[ship_dates.isna()])
+
+    def summary(self, as_of=None):
+        """
+        產生 SLA 摘要表
+
+        Args:
+            as_of (str 或 Timestamp): backlog 積壓天數的計算基準日，
+                預設為資料中最新的訂單／出貨日
+
+        Returns:
+            pd.DataFrame: 每個 (dimension, group) 一列
+        """
+        as_of = pd.Timestamp(as_of) if as_of is not None else self.latest_date
+        index_names = ['dimension', 'group']
+
+        if self.overdue_counts is None and self.open_orders is None:
+            return pd.DataFrame()
+
+        hist = self.lead_time_hist
+        if hist is None:
+            hist = pd.DataFrame({'dimension': [], 'group': [], 'lead_time_days': [], 'orders': []})
+        shipped = hist.groupby(index_names)['orders'].sum().rename('shipped_orders')
+        weighted = (hist['lead_time_days'] * hist['orders']).groupby([hist['dimension'], hist['group']]).sum()
+        lead_mean = (weighted / shipped).rename('lead_time_mean')
+
+        if len(hist):
+            percentiles = histogram_percentiles(hist, 'lead_time_days', 'orders', self.percentiles)
+        else:
+            percentiles = pd.DataFrame(columns=[f'lead_time_p{p}' for p in self.percentiles], dtype=float)
+
+        overdue = self.overdue_counts
+        if overdue is None:
+            overdue = pd.DataFrame({'dimension': [], 'group': [], 'overdue_known': [], 'overdue_orders': [], 'invalid_lead_time': []})
+        overdue = overdue.set_index(index_names)
+        overdue_rate = (overdue['overdue_orders'] / overdue['overdue_known'].where(overdue['overdue_known'] > 0) * 100).rename('overdue_rate_pct')
+
+        backlog = self.open_orders
+        if backlog is not None and len(backlog) and pd.notna(as_of):
+            ages = (as_of - backlog['order_date']).dt.days
+            keys = [backlog['dimension'], backlog['group']]
+            backlog_orders = backlog.groupby(index_names)['orders'].sum().rename('backlog_orders')
+            backlog_avg_age = ((ages * backlog['orders']).groupby(keys).sum() / backlog_orders).rename('backlog_avg_age_days')
+            backlog_max_age = ages.groupby(keys).max().rename('backlog_max_age_days')
+            backlog_stats = pd.concat([backlog_orders, backlog_avg_age, backlog_max_age], axis=1)
+        else:
+            backlog_stats = pd.DataFrame(
+                np.nan,
+                index=shipped.index,
+                columns=['backlog_orders', 'backlog_avg_age_days', 'backlog_max_age_days']
+            )
+
+        summary = pd.concat([
+            shipped,
+            lead_mean,
+            percentiles,
+            overdue[['overdue_orders', 'overdue_known']],
+            overdue_rate,
+            overdue[['invalid_lead_time']].rename(columns={'invalid_lead_time': 'invalid_lead_time_orders'}),
+            backlog_stats
+        ], axis=1)
+        summary.index = summary.index.set_names(index_names)
+
+        count_columns = ['shipped_orders', 'overdue_orders', 'overdue_known', 'invalid_lead_time_orders', 'backlog_orders']
+        summary[count_columns] = summary[count_columns].fillna(0).astype(int)
+        summary = summary.reset_index()
+
+        # 依維度原始順序（All 在最前）與組名排序
+        dimension_order = {dim: i for i, dim in enumerate(['All'] + self.dimensions)}
+        summary['_order'] = summary['dimension'].map(dimension_order)
+        summary = summary.sort_values(['_order', 'group']).drop(columns='_order').reset_index(drop=True)
+        summary.insert(2, 'as_of', as_of)
+        return summary.round(2)
+
+def compute_sla_summary(orders_df, dimensions=None, as_of=None):
+    """
+    計算訂單的交期與 SLA 指標（單批資料）
+
+    Args:
+        orders_df (pd.DataFrame): orders_clean 資料
+        dimensions (list): 分析維度，預設 region、product、category
+        as_of (str 或 Timestamp): backlog 計算基準日
+
+    Returns:
+        pd.DataFrame: SLA 摘要表
+    """
+    dimensions = [dim for dim in (dimensions or SLA_DIMENSIONS) if dim in orders_df.columns]
+    tracker = SLATracker(dimensions=dimensions)
+    tracker.update(orders_df)
+    return tracker.summary(as_of=as_of)
@@ -0,0 +1,344 @@
+import os
+import json
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+
+# 啟動快照目錄（選用）；設定後儀表板以 Feather 資料與圖表 JSON 啟動，不解析 Excel
+_snapshot_dir = os.environ.get('DASHBOARD_SNAPSHOT_DIR') or None
+
+def configure_snapshot_dir(directory):
+    """
+    開啟（或以 None 關閉）啟動快照
+
+    Args:
+        directory (str 或 None): 快照目錄
+    """
+    global _snapshot_dir
+    _snapshot_dir = directory
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+def snapshot_enabled():
+    """
+    是否使用啟動快照
+    """
+    return _snapshot_dir is not None
+
+class StartupTimer:
+    """
+    儀表板啟動時間分析（匯入、資料載入、版面建立、第一個請求）
+
+    在儀表板模組最上方、匯入重量級套件之前建立，各階段以 mark() 記錄
+    與前一個階段的間隔；只在第一次呼叫時計時的步驟（如版面建立）以
+    first_call() 包裝。
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self._last = self.started
+        self._phases = {}
+        self._lock = threading.Lock()
+
+    def mark(self, phase):
+        """
+        記錄從上一個 mark 到現在的時間
+        """
+        now = time.perf_counter()
+        with self._lock:
+            self._phases[phase] = now - self._last
+            self._last = now
+
+    def first_call(self, phase, func):
+        """
+        包裝函數，第一次呼叫時記錄其執行時間
+        """
+        def wrapper(*args, **kwargs):
+            if phase in self._phases:
+                return func(*args, **kwargs)
+            started = time.perf_counter()
+            result = func(*args, **kwargs)
+            with self._lock:
+                self._phases.setdefault(phase, time.perf_counter() - started)
+            return result
+        return wrapper
+
+    def attach(self, app):
+        """
+        記錄從啟動到第一個請求完成的時間（Flask after_request）
+        """
+        def record_first_request(response):
+            with self._lock:
+                self._phases.setdefault('first_request_at', time.perf_counter() - self.started)
+            return response
+
+        app.server.after_request(record_first_request)
+
+    def report(self):
+        """
+        各階段秒數
+
+        Returns:
+            dict: {'phases': {階段: 秒數}, 'elapsed': 從建立到現在的秒數}
+        """
+        with self._lock:
+            phases = {phase: round(seconds, 3) for phase, seconds in self._phases.items()}
+        return {'phases': phases, 'elapsed': round(time.perf_counter() - self.started, 3)}
+
+    def print_report(self, title="啟動時間"):
+        """
+        輸出各階段秒數
+        """
+        report = self.report()
+        print(f"{title}:")
+        for phase, seconds in report['phases'].items():
+            print(f"  {phase}: {seconds:.3f} 秒")
+
+def _snapshot_paths(name, snapshot_dir):
+    base = os.path.join(snapshot_dir, name)
+    return f"{base}.feather", f"{base}.json"
+
+def _arrays_dir(name, version, snapshot_dir):
+    # 索引陣列目錄名稱含資料版本，新版本寫入時不影響其他 worker 正在映射的舊版本
+    return os.path.join(snapshot_dir, f"{name}.{version}.arrays")
+
+def _mapped_types(arrow_type):
+    # 字串欄位保留為 Arrow 字串（直接引用映射的記憶體），不轉成 Python 物件
+    import pyarrow as pa
+    if pa.types.is_string(arrow_type) or pa.types.is_large_string(arrow_type):
+        import pandas as pd
+        return pd.StringDtype('pyarrow')
+    return None
+
+def load_snapshot(name, version, snapshot_dir=None):
+    """
+    以記憶體映射讀取啟動快照；沒有快照或資料版本不同時回傳 None
+
+    快照為未壓縮的 Feather（Arrow IPC）檔，數值欄位與字串欄位直接引用
+    映射的檔案頁面而不複製，同一台機器上的多個 worker 共用同一份實體記憶體。
+    回傳的資料框是唯讀的，不可就地修改。
+
+    Args:
+        name (str): 儀表板名稱
+        version (str): 目前資料版本（DataWatcher 的版本）
+        snapshot_dir (str 或 None): 快照目錄，None 表示依 configure_snapshot_dir 設定
+
+    Returns:
+        tuple 或 None: (資料, 中繼資料 dict)
+    """
+    snapshot_dir = snapshot_dir or _snapshot_dir
+    if not snapshot_dir:
+        return None
+    data_file, meta_file = _snapshot_paths(name, snapshot_dir)
+    try:
+        with open(meta_file, encoding='utf-8') as f:
+            meta = json.load(f)
+        if meta.get('version') != version:
+            return None
+        import pyarrow as pa
+        table = pa.ipc.open_file(pa.memory_map(data_file, 'r')).read_all()
+    except (OSError, ValueError):
+        return None
+    # 中繼資料最後寫入，資料檔須是同一次寫入的結果
+    if (table.schema.metadata or {}).get(b'snapshot_version') != version.encode('utf-8'):
+        return None
+    df = table.to_pandas(split_blocks=True, types_mapper=_mapped_types)
+    return df, meta
+
+def load_snapshot_arrays(name, version, snapshot_dir=None):
+    """
+    以記憶體映射讀取快照中的索引陣列（篩選與表格索引的排序位置、代碼等）
+
+    數值陣列直接引用映射的檔案頁面（唯讀），多個 worker 共用同一份實體記憶體；
+    物件陣列（如字串標籤）無法映射，改為讀入記憶體。
+
+    Returns:
+        dict 或 None: {名稱: np.ndarray}；沒有該版本的陣列時回傳 None
+    """
+    import numpy as np
+    snapshot_dir = snapshot_dir or _snapshot_dir
+    if not snapshot_dir:
+        return None
+    directory = _arrays_dir(name, version, snapshot_dir)
+    try:
+        files = sorted(f for f in os.listdir(directory) if f.endswith('.npy'))
+    except OSError:
+        return None
+    arrays = {}
+    for file_name in files:
+        path = os.path.join(directory, file_name)
+        try:
+            array = np.load(path, mmap_mode='r')
+        except ValueError:
+            array = np.load(path, allow_pickle=True)
+        # 以一般 ndarray 檢視使用（仍引用映射的記憶體）
+        arrays[file_name[:-len('.npy')]] = np.asarray(array)
+    return arrays
+
+def _save_arrays(name, version, arrays, snapshot_dir, suffix):
+    import numpy as np
+    directory = _arrays_dir(name, version, snapshot_dir)
+    if not os.path.isdir(directory):
+        tmp_dir = directory + suffix
+        os.makedirs(tmp_dir)
+        try:
+            for key, array in arrays.items():
+                np.save(os.path.join(tmp_dir, f"{key}.npy"), np.asarray(array), allow_pickle=True)
+            os.rename(tmp_dir, directory)
+        except OSError:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            if not os.path.isdir(directory):
+                raise
+    # 移除舊版本的陣列（已映射的 worker 仍可使用到釋放為止）
+    prefix = f"{name}."
+    for entry in os.listdir(snapshot_dir):
+        path = os.path.join(snapshot_dir, entry)
+        if entry.startswith(prefix) and entry.endswith('.arrays') and path != directory:
+            shutil.rmtree(path, ignore_errors=True)
+
+@contextmanager
+def snapshot_lock(name, snapshot_dir=None):
+    """
+    快照寫入鎖：同一台機器上只有一個行程重新產生快照，其他行程等待後直接映射
+
+    沒有 fcntl（Windows）時不鎖定；此時伺服器為單一行程
+    """
+    snapshot_dir = snapshot_dir or _snapshot_dir
+    try:
+        import fcntl
+    except ImportError:
+        yield
+        return
+    os.makedirs(snapshot_dir, exist_ok=True)
+    with open(os.path.join(snapshot_dir, f"{name}.lock"), 'a') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+def shared_snapshot(name, version, build, snapshot_dir=None):
+    """
+    取得資料版本的快照（資料、中繼資料與索引陣列）
+
+    沒有快照時取得寫入鎖，再確認一次（其他行程可能剛寫入），仍沒有才由
+    build() 產生並寫入；多個 worker 同時發現資料更新時只有一個解析 Excel。
+
+    Args:
+        name (str): 儀表板名稱
+        version (str): 資料版本
+        build (callable): build() → (df, meta, arrays)
+        snapshot_dir (str 或 None): 快照目錄，None 表示依 configure_snapshot_dir 設定
+
+    Returns:
+        tuple 或 None: 映射的 (資料, 中繼資料, 索引陣列)；未開啟快照或寫入失敗時回傳 None
+    """
+    snapshot_dir = snapshot_dir or _snapshot_dir
+    if not snapshot_dir:
+        return None
+
+    def load():
+        snapshot = load_snapshot(name, version, snapshot_dir)
+        arrays = load_snapshot_arrays(name, version, snapshot_dir) if snapshot is not None else None
+        return None if arrays is None else snapshot + (arrays,)
+
+    loaded = load()
+    if loaded is not None:
+        return loaded
+    with snapshot_lock(name, snapshot_dir):
+        loaded = load()
+        if loaded is None:
+            df, meta, arrays = build()
+            save_snapshot(name, version, df, meta, snapshot_dir, arrays=arrays)
+            loaded = load()
+    return loaded
+
+def save_snapshot(name, version, df, meta, snapshot_dir=None, arrays=None):
+    """
+    寫入啟動快照（未壓縮 Feather 資料、索引陣列與 JSON 中繼資料），先寫暫存檔再取代
+
+    中繼資料最後寫入；多個行程同時寫入同一版本時內容相同
+    （shared_snapshot 以寫入鎖避免重複產生）。
+
+    Args:
+        name (str): 儀表板名稱
+        version (str): 資料版本
+        df (pd.DataFrame): 載入並處理後的資料
+        meta (dict): 可序列化為 JSON 的中繼資料（如摘要文字、圖表）
+        snapshot_dir (str 或 None): 快照目錄，None 表示依 configure_snapshot_dir 設定
+        arrays (dict): 索引陣列 {名稱: np.ndarray}，以 .npy 寫入供記憶體映射
+    """
+    snapshot_dir = snapshot_dir or _snapshot_dir
+    if not snapshot_dir:
+        return
+    import pyarrow as pa
+    import pyarrow.feather as feather
+    os.makedirs(snapshot_dir, exist_ok=True)
+    data_file, meta_file = _snapshot_paths(name, snapshot_dir)
+    suffix = f".{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        for i, field in enumerate(table.schema):
+            if pa.types.is_floating(field.type) and table.column(i).null_count:
+                # 浮點欄位保留 NaN（不轉為 null），讀取時才能不複製直接引用
+                table = table.set_column(i, field, pa.array(df[field.name].to_numpy(), from_pandas=False))
+            elif pa.types.is_string(field.type):
+                # pandas 的 Arrow 字串欄位使用 large_string，預先轉換讀取時就不需複製
+                table = table.set_column(i, field.with_type(pa.large_string()), table.column(i).cast(pa.large_string()))
+        table = table.replace_schema_metadata({**(table.schema.metadata or {}),
+                                               b'snapshot_version': version.encode('utf-8')})
+        # 未壓縮、單一 record batch 才能以記憶體映射直接使用，不需解壓或串接
+        feather.write_feather(table, data_file + suffix, compression='uncompressed',
+                              chunksize=max(table.num_rows, 1))
+        os.replace(data_file + suffix, data_file)
+        if arrays is not None:
+            _save_arrays(name, version, arrays, snapshot_dir, suffix)
+        with open(meta_file + suffix, 'w', encoding='utf-8') as f:
+            json.dump({**meta, 'version': version}, f, ensure_ascii=False)
+        os.replace(meta_file + suffix, meta_file)
+    except Exception as e:
+        print(f"寫入啟動快照失敗: {e}")
+        for path in (data_file + suffix, meta_file + suffix):
+            if os.path.exists(path):
+                os.remove(path)
+
+def figure_json(fig):
+    """
+    圖表轉為可直接交給 dcc.Graph 的 JSON dict（讀取時不需匯入 plotly）
+    """
+    return json.loads(fig.to_json())
+
+class LazyFigures:
+    """
+    延遲建立的圖表：第一次取得時才建立，快照中已有的圖表直接使用
+    """
+
+    def __init__(self, builders, prebuilt=None):
+        """
+        Args:
+            builders (dict): {名稱: 建立圖表的函數}
+            prebuilt (dict): 快照中的圖表 {名稱: JSON dict}
+        """
+        self.builders = builders
+        self._figures = dict(prebuilt or {})
+        self._lock = threading.Lock()
+
+    def get(self, name):
+        """
+        取得圖表（go.Figure 或快照中的 JSON dict）
+        """
+        with self._lock:
+            if name not in self._figures:
+                self._figures[name] = self.builders[name]()
+            return self._figures[name]
+
+    def to_json(self):
+        """
+        建立所有圖表並轉為 JSON dict（寫入快照用）
+        """
+        return {name: self._as_json(self.get(name)) for name in self.builders}
+
+    @staticmethod
+    def _as_json(fig):
+        return fig if isinstance(fig, dict) else figure_json(fig)
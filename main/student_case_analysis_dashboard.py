@@ -1,12 +1,29 @@
+from startup import StartupTimer, shared_snapshot
+
+# 啟動時間從匯入重量級套件之前開始計算
+STARTUP_TIMER = StartupTimer()
+
+import numpy as np
 import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
 import dash
-from dash import dcc, html, Input, Output, dash_table
+from dash import dcc, html, Input, Output, State, ClientsideFunction, dash_table
 import dash_bootstrap_components as dbc
-import numpy as np
-from datetime import datetime
+from date_utils import to_date_column
+from data_loader import load_sheet, cache_info
+from table_paging import TableIndex, CUSTOM_PAGING_PROPS
+from filter_index import OrderFilterIndex
+from callback_cache import CallbackCache, register_metrics_endpoint
+from scatter_density import axis_bins, DEFAULT_BINS, DEFAULT_MAX_POINTS
+from data_watcher import DataWatcher, DATA_VERSION_STORE, version_components, register_version_push, files_version
+
+STARTUP_TIMER.mark('import')
+
+DATA_FILE = 'clean/student_case_clean.xlsx'
+WATCH_FILES = [DATA_FILE]
+TABLE_COLUMNS = ['order_date', 'product_name', 'category', 'qty', 'unit_price', 'discount', 'total_with_tax']
+
+# 交叉篩選的維度（圖表彙總資料的分組欄位），點選圖表後在瀏覽器端重新彙總
+CROSS_FILTER_COLUMNS = ['category', 'month', 'product_name', 'discount']
 
 def load_and_analyze_data():
     """
@@ -14,14 +31,13 @@ def load_and_analyze_data():
     """
     try:
         # 讀取 Excel 檔案
-        file_path = 'clean/student_case_clean.xlsx'
-        orders_df = pd.read_excel(file_path, sheet_name='orders_clean')
+        orders_df = load_sheet(DATA_FILE, sheet_name='orders_clean')
         
         print(f"成功載入 orders_clean 資料，共 {len(orders_df)} 筆記錄")
         print(f"欄位: {orders_df.columns.tolist()}")
         
         # 基本資料清理和轉換
-        orders_df['order_date'] = pd.to_datetime(orders_df['order_date'])
+        orders_df['order_date'] = to_date_column(orders_df['order_date'])
         orders_df['month'] = orders_df['order_date'].dt.month
         orders_df['month_name'] = orders_df['order_date'].dt.strftime('%B')
         orders_df['year'] = orders_df['order_date'].dt.year
@@ -39,250 +55,430 @@ def load_and_analyze_data():
         print(f"載入資料時發生錯誤: {str(e)}")
         return None
 
-def create_dashboard():
+def normalize_filters(selected_categories, start_date, end_date, min_amount):
     """
-    創建 Dash 儀表板
+    篩選條件正規化為快取鍵值：類別排序去重、日期轉為 ISO 字串
+    （兩者都有值才會篩選）、最小金額轉為浮點數
+    """
+    categories = tuple(sorted(set(selected_categories or [])))
+    if start_date and end_date:
+        dates = (pd.Timestamp(start_date).isoformat(), pd.Timestamp(end_date).isoformat())
+    else:
+        dates = (None, None)
+    amount = None if min_amount is None else float(min_amount)
+    return (categories,) + dates + (amount,)
+
+def normalize_cross_filter(cross_filter):
+    """
+    交叉篩選（{維度: 點選的值}）正規化為快取鍵值
+    """
+    return tuple(sorted((column, value) for column, value in (cross_filter or {}).items()
+                        if column in CROSS_FILTER_COLUMNS and value is not None))
+
+def discount_bins(filter_index):
+    """
+    折扣值分格：不重複的折扣值超過 DEFAULT_MAX_POINTS 時分為 DEFAULT_BINS 格，
+    否則每個折扣值一格
+
+    Returns:
+        tuple: (每個折扣值的格代碼, 各格的折扣值)
+    """
+    labels = np.asarray(filter_index.groups['discount']['labels'], dtype=float)
+    if len(labels) <= DEFAULT_MAX_POINTS:
+        return np.arange(len(labels)), labels
+    return axis_bins(labels, DEFAULT_BINS)
+
+def build_chart_aggregates(state, selection):
+    """
+    圖表用的精簡彙總資料：類別 × 月份 × 產品 × 折扣 的營收
+
+    各維度以排序後的值清單與整數代碼表示，瀏覽器端依交叉篩選重新加總
+    並繪製四張圖表，點選圖表不需再呼叫伺服器。
+
+    Returns:
+        dict: {'labels': {維度: 值清單（缺失值為 None）}, 'codes': {維度: 代碼清單}, 'revenue': 營收清單}
+    """
+    filter_index = state['filter_index']
+    # 保留分組值缺失的列（如沒有日期的訂單仍計入類別與產品營收），其值為 None
+    totals = filter_index.sum_by_groups(CROSS_FILTER_COLUMNS, selection, dropna=False)
+
+    # 折扣值對應到分格；分格後同一格的列再加總一次
+    bin_codes, bin_values = state['discount_bins']
+    discount_labels = np.asarray(filter_index.groups['discount']['labels'], dtype=float)
+    discounts = totals['discount'].to_numpy(dtype=float)
+    present = ~np.isnan(discounts)
+    discounts[present] = bin_values[bin_codes[np.searchsorted(discount_labels, discounts[present])]]
+    totals['discount'] = discounts
+    if len(bin_values) < len(discount_labels):
+        totals = totals.groupby(CROSS_FILTER_COLUMNS, as_index=False, dropna=False)['total_with_tax'].sum()
+    totals['month'] = pd.DatetimeIndex(totals['month']).strftime('%Y-%m')
+
+    labels, codes = {}, {}
+    for column in CROSS_FILTER_COLUMNS:
+        column_codes, column_labels = pd.factorize(totals[column], sort=True, use_na_sentinel=False)
+        labels[column] = [None if pd.isna(label) else label for label in column_labels]
+        codes[column] = column_codes.tolist()
+    return {'labels': labels, 'codes': codes, 'revenue': totals['total_with_tax'].round(2).tolist()}
+
+def cross_filter_groups(state, cross_filter):
+    """
+    交叉篩選轉為 OrderFilterIndex.select 的分組條件（表格依圖表點選的項目顯示明細）
+    """
+    groups = {}
+    for column, value in normalize_cross_filter(cross_filter):
+        if column == 'month':
+            groups[column] = [pd.Timestamp(f"{value}-01")]
+        elif column == 'discount':
+            # 點選的是分格的折扣值，展開為該格內的所有折扣值
+            bin_codes, bin_values = state['discount_bins']
+            labels = state['filter_index'].groups['discount']['labels']
+            selected_bins = np.flatnonzero(np.isclose(bin_values, float(value)))
+            groups[column] = list(labels[np.isin(bin_codes, selected_bins)])
+        else:
+            groups[column] = [value]
+    return groups
+
+def build_snapshot():
+    """
+    解析 Excel 並建立快照內容：資料與篩選、表格索引陣列
+    
+    Returns:
+        tuple: (資料, 中繼資料, 索引陣列)
     """
-    # 載入資料
     df = load_and_analyze_data()
     if df is None:
-        return "無法載入資料"
+        raise ValueError("無法載入資料")
+    arrays = {**OrderFilterIndex(df).to_arrays('filter_index.'),
+              **TableIndex(df, TABLE_COLUMNS).to_arrays('table_index.')}
+    return df, {}, arrays
+
+def prepare_snapshot():
+    """
+    預先寫入目前資料版本的啟動快照（多 worker 服務啟動前由主行程執行一次）
+    """
+    shared_snapshot('student_case', files_version(WATCH_FILES), build_snapshot)
+
+def build_dashboard_state(version):
+    """
+    載入資料並建立篩選器與表格索引（啟動與資料更新時執行）
+    
+    設定 DASHBOARD_SNAPSHOT_DIR 時，同一資料版本的資料（Feather）與
+    篩選、表格索引（.npy）都直接記憶體映射，不解析 Excel 也不重建索引，
+    多個 worker 共用同一份記憶體；資料更新時只有一個行程重新產生快照。
+    
+    Returns:
+        dict: version、df、filter_index、discount_bins、table_index
+    """
+    snapshot = shared_snapshot('student_case', version, build_snapshot)
+    if snapshot is not None:
+        df, _, arrays = snapshot
+        filter_index = OrderFilterIndex.from_arrays(df, arrays, 'filter_index.')
+        table_index = TableIndex.from_arrays(df, arrays, TABLE_COLUMNS, 'table_index.')
+    else:
+        df = load_and_analyze_data()
+        if df is None:
+            raise ValueError("無法載入資料")
+        filter_index = OrderFilterIndex(df)
+        table_index = TableIndex(df, TABLE_COLUMNS).prepare()
+    return {
+        'version': version,
+        'df': df,
+        'filter_index': filter_index,
+        'discount_bins': discount_bins(filter_index),
+        'table_index': table_index
+    }
+
+def create_dashboard(server=True, url_base_pathname='/', watcher=None):
+    """
+    創建 Dash 儀表板
+    
+    Args:
+        server (flask.Flask 或 bool): 共用的 Flask 伺服器，True 表示建立新的伺服器
+        url_base_pathname (str): 儀表板的路徑前綴（多頁面中心中的頁面路徑）
+        watcher (LazyWatcher): 共用的資料監看器；None 表示啟動時立即載入資料
+    """
+    # 載入資料；資料檔更新時在背景重新載入並替換，不需重啟
+    lazy = watcher is not None
+    if not lazy:
+        try:
+            watcher = DataWatcher('student_case', WATCH_FILES, build_dashboard_state)
+        except ValueError as e:
+            return str(e)
+    watcher.start()
+    STARTUP_TIMER.mark('load')
     
     # 創建 Dash 應用
-    app = dash.Dash(__name__, external_stylesheets=[dbc.themes.BOOTSTRAP])
+    # 共用的監看器延遲載入資料：不在建立時呼叫版面函數驗證回調，第一次開啟頁面才載入
+    app = dash.Dash(__name__, server=server, url_base_pathname=url_base_pathname,
+                    suppress_callback_exceptions=lazy, external_stylesheets=[dbc.themes.BOOTSTRAP])
     
-    # 儀表板佈局
-    app.layout = dbc.Container([
-        dbc.Row([
-            dbc.Col([
-                html.H1("Student Case Orders 分析儀表板", 
-                        className="text-center text-primary mb-4"),
-                html.Hr()
-            ])
-        ]),
+    # 儀表板佈局（每次開啟頁面時以目前的資料建立）
+    def serve_layout():
+        df = watcher.current()['df']
         
-        # 統計摘要卡片
-        dbc.Row([
-            dbc.Col([
-                dbc.Card([
-                    dbc.CardBody([
-                        html.H4(f"{len(df)}", className="card-title text-center"),
-                        html.P("總訂單數", className="card-text text-center")
-                    ])
-                ], className="text-center mb-3")
-            ], width=3),
-            dbc.Col([
-                dbc.Card([
-                    dbc.CardBody([
-                        html.H4(f"${df['total_with_tax'].sum():,.2f}", className="card-title text-center"),
-                        html.P("總營收", className="card-text text-center")
-                    ])
-                ], className="text-center mb-3")
-            ], width=3),
-            dbc.Col([
-                dbc.Card([
-                    dbc.CardBody([
-                        html.H4(f"{df['product_id'].nunique()}", className="card-title text-center"),
-                        html.P("產品種類", className="card-text text-center")
-                    ])
-                ], className="text-center mb-3")
-            ], width=3),
-            dbc.Col([
-                dbc.Card([
-                    dbc.CardBody([
-                        html.H4(f"{df['category'].nunique()}", className="card-title text-center"),
-                        html.P("產品類別", className="card-text text-center")
-                    ])
-                ], className="text-center mb-3")
-            ], width=3)
-        ]),
+        return dbc.Container([
+            dbc.Row([
+                dbc.Col([
+                    html.H1("Student Case Orders 分析儀表板", 
+                            className="text-center text-primary mb-4"),
+                    html.Hr()
+                ])
+            ]),
         
-        # 圖表區域
-        dbc.Row([
-            # 左側圖表
-            dbc.Col([
-                dbc.Card([
-                    dbc.CardHeader("營收趨勢（按月份）"),
-                    dbc.CardBody([
-                        dcc.Graph(id='monthly-revenue-chart')
-                    ])
-                ], className="mb-3"),
+            # 統計摘要卡片
+            dbc.Row([
+                dbc.Col([
+                    dbc.Card([
+                        dbc.CardBody([
+                            html.H4(f"{len(df)}", className="card-title text-center"),
+                            html.P("總訂單數", className="card-text text-center")
+                        ])
+                    ], className="text-center mb-3")
+                ], width=3),
+                dbc.Col([
+                    dbc.Card([
+                        dbc.CardBody([
+                            html.H4(f"${df['total_with_tax'].sum():,.2f}", className="card-title text-center"),
+                            html.P("總營收", className="card-text text-center")
+                        ])
+                    ], className="text-center mb-3")
+                ], width=3),
+                dbc.Col([
+                    dbc.Card([
+                        dbc.CardBody([
+                            html.H4(f"{df['product_id'].nunique()}", className="card-title text-center"),
+                            html.P("產品種類", className="card-text text-center")
+                        ])
+                    ], className="text-center mb-3")
+                ], width=3),
+                dbc.Col([
+                    dbc.Card([
+                        dbc.CardBody([
+                            html.H4(f"{df['category'].nunique()}", className="card-title text-center"),
+                            html.P("產品類別", className="card-text text-center")
+                        ])
+                    ], className="text-center mb-3")
+                ], width=3)
+            ]),
+        
+            # 交叉篩選：點選圖表中的項目篩選其他圖表與表格，再點一次取消
+            dbc.Row([
+                dbc.Col([
+                    dbc.Button("清除圖表篩選", id='clear-cross-filter', color='secondary',
+                               size='sm', className="mb-3"),
+                    dcc.Store(id='chart-aggregates'),
+                    dcc.Store(id='cross-filter', data={})
+                ])
+            ]),
+
+            # 圖表區域
+            dbc.Row([
+                # 左側圖表
+                dbc.Col([
+                    dbc.Card([
+                        dbc.CardHeader("營收趨勢（按月份）"),
+                        dbc.CardBody([
+                            dcc.Graph(id='monthly-revenue-chart')
+                        ])
+                    ], className="mb-3"),
                 
-                dbc.Card([
-                    dbc.CardHeader("產品類別營收分布"),
-                    dbc.CardBody([
-                        dcc.Graph(id='category-revenue-chart')
-                    ])
-                ], className="mb-3")
-            ], width=6),
+                    dbc.Card([
+                        dbc.CardHeader("產品類別營收分布"),
+                        dbc.CardBody([
+                            dcc.Graph(id='category-revenue-chart')
+                        ])
+                    ], className="mb-3")
+                ], width=6),
             
-            # 右側圖表
-            dbc.Col([
-                dbc.Card([
-                    dbc.CardHeader("產品營收排行"),
-                    dbc.CardBody([
-                        dcc.Graph(id='product-revenue-chart')
-                    ])
-                ], className="mb-3"),
+                # 右側圖表
+                dbc.Col([
+                    dbc.Card([
+                        dbc.CardHeader("產品營收排行"),
+                        dbc.CardBody([
+                            dcc.Graph(id='product-revenue-chart')
+                        ])
+                    ], className="mb-3"),
                 
-                dbc.Card([
-                    dbc.CardHeader("折扣分析"),
-                    dbc.CardBody([
-                        dcc.Graph(id='discount-analysis-chart')
-                    ])
-                ], className="mb-3")
-            ], width=6)
-        ]),
+                    dbc.Card([
+                        dbc.CardHeader("折扣分析"),
+                        dbc.CardBody([
+                            dcc.Graph(id='discount-analysis-chart')
+                        ])
+                    ], className="mb-3")
+                ], width=6)
+            ]),
         
-        # 資料表格
-        dbc.Row([
-            dbc.Col([
-                dbc.Card([
-                    dbc.CardHeader("訂單詳細資料"),
-                    dbc.CardBody([
-                        dash_table.DataTable(
-                            id='orders-table',
-                            columns=[
-                                {"name": "訂單日期", "id": "order_date"},
-                                {"name": "產品名稱", "id": "product_name"},
-                                {"name": "類別", "id": "category"},
-                                {"name": "數量", "id": "qty"},
-                                {"name": "單價", "id": "unit_price"},
-                                {"name": "折扣", "id": "discount"},
-                                {"name": "總金額", "id": "total_with_tax"}
-                            ],
-                            data=df.to_dict('records'),
-                            page_size=10,
-                            style_table={'overflowX': 'auto'},
-                            style_cell={'textAlign': 'center'},
-                            style_header={'backgroundColor': 'rgb(230, 230, 230)', 'fontWeight': 'bold'}
-                        )
+            # 資料表格
+            dbc.Row([
+                dbc.Col([
+                    dbc.Card([
+                        dbc.CardHeader("訂單詳細資料"),
+                        dbc.CardBody([
+                            dash_table.DataTable(
+                                id='orders-table',
+                                columns=[
+                                    {"name": "訂單日期", "id": "order_date"},
+                                    {"name": "產品名稱", "id": "product_name"},
+                                    {"name": "類別", "id": "category"},
+                                    {"name": "數量", "id": "qty"},
+                                    {"name": "單價", "id": "unit_price"},
+                                    {"name": "折扣", "id": "discount"},
+                                    {"name": "總金額", "id": "total_with_tax"}
+                                ],
+                                # 伺服器端分頁：只傳送目前頁面的資料
+                                page_size=10,
+                                **CUSTOM_PAGING_PROPS,
+                                style_table={'overflowX': 'auto'},
+                                style_cell={'textAlign': 'center'},
+                                style_header={'backgroundColor': 'rgb(230, 230, 230)', 'fontWeight': 'bold'}
+                            )
+                        ])
                     ])
                 ])
-            ])
-        ]),
+            ]),
         
-        # 篩選器
-        dbc.Row([
-            dbc.Col([
-                dbc.Card([
-                    dbc.CardHeader("資料篩選"),
-                    dbc.CardBody([
-                        dbc.Row([
-                            dbc.Col([
-                                html.Label("產品類別:"),
-                                dcc.Dropdown(
-                                    id='category-filter',
-                                    options=[{'label': cat, 'value': cat} for cat in sorted(df['category'].unique())],
-                                    value=sorted(df['category'].unique()),
-                                    multi=True,
-                                    placeholder="選擇產品類別"
-                                )
-                            ], width=4),
-                            dbc.Col([
-                                html.Label("日期範圍:"),
-                                dcc.DatePickerRange(
-                                    id='date-filter',
-                                    start_date=df['order_date'].min(),
-                                    end_date=df['order_date'].max(),
-                                    display_format='YYYY-MM-DD'
-                                )
-                            ], width=4),
-                            dbc.Col([
-                                html.Label("最小金額:"),
-                                dcc.Input(
-                                    id='min-amount-filter',
-                                    type='number',
-                                    placeholder='最小金額',
-                                    value=0
-                                )
-                            ], width=4)
+            # 篩選器
+            dbc.Row([
+                dbc.Col([
+                    dbc.Card([
+                        dbc.CardHeader("資料篩選"),
+                        dbc.CardBody([
+                            dbc.Row([
+                                dbc.Col([
+                                    html.Label("產品類別:"),
+                                    dcc.Dropdown(
+                                        id='category-filter',
+                                        options=[{'label': cat, 'value': cat} for cat in sorted(df['category'].unique())],
+                                        value=sorted(df['category'].unique()),
+                                        multi=True,
+                                        placeholder="選擇產品類別"
+                                    )
+                                ], width=4),
+                                dbc.Col([
+                                    html.Label("日期範圍:"),
+                                    dcc.DatePickerRange(
+                                        id='date-filter',
+                                        start_date=df['order_date'].min(),
+                                        end_date=df['order_date'].max(),
+                                        display_format='YYYY-MM-DD'
+                                    )
+                                ], width=4),
+                                dbc.Col([
+                                    html.Label("最小金額:"),
+                                    dcc.Input(
+                                        id='min-amount-filter',
+                                        type='number',
+                                        placeholder='最小金額',
+                                        value=0
+                                    )
+                                ], width=4)
+                            ])
                         ])
-                    ])
-                ], className="mb-3")
-            ])
-        ])
-        
-    ], fluid=True)
+                    ], className="mb-3")
+                ])
+            ]),
+            
+            # 資料版本（資料更新時推送給回調）
+            *version_components(watcher)
+        ], fluid=True)
+    
+    app.layout = STARTUP_TIMER.first_call('layout', serve_layout)
+    
+    register_version_push(app, watcher)
+    
+    # 回調結果快取（LRU；設定 CALLBACK_CACHE_DIR 時多個 worker 共用磁碟快取）
+    # 鍵值包含資料狀態的版本，資料更新後舊結果不再使用
+    chart_cache = CallbackCache('student_case_charts')
+    table_cache = CallbackCache('student_case_table')
+    register_metrics_endpoint(app, [chart_cache, table_cache], path=f"{url_base_pathname}metrics", extra={'data_loader': cache_info, 'startup': STARTUP_TIMER.report})
+    
+    def chart_key(state, *filters):
+        return (state['version'],) + normalize_filters(*filters)
     
-    # 回調函數：更新圖表
+    def table_key(state, selected_categories, start_date, end_date, min_amount, cross_filter,
+                  page_current, page_size, sort_by, filter_query):
+        sort_key = tuple((item['column_id'], item.get('direction')) for item in (sort_by or []))
+        return chart_key(state, selected_categories, start_date, end_date, min_amount) + (
+            normalize_cross_filter(cross_filter), page_current or 0, page_size, sort_key, filter_query or '')
+    
+    @chart_cache.memoize(chart_key)
+    def build_aggregates(state, selected_categories, start_date, end_date, min_amount):
+        # 篩選條件（索引上的日期區段、類別查表與金額條件，不複製資料）
+        selection = state['filter_index'].select(selected_categories, start_date, end_date, min_amount)
+        return build_chart_aggregates(state, selection)
+    
+    @table_cache.memoize(table_key)
+    def build_table_page(state, selected_categories, start_date, end_date, min_amount, cross_filter,
+                         page_current, page_size, sort_by, filter_query):
+        filter_index = state['filter_index']
+        selection = filter_index.select(selected_categories, start_date, end_date, min_amount,
+                                        groups=cross_filter_groups(state, cross_filter))
+        base_mask = filter_index.mask(selection)
+        base_key = (state['version'], tuple(selected_categories or []), start_date, end_date, min_amount,
+                    normalize_cross_filter(cross_filter))
+        try:
+            return state['table_index'].page(page_current, page_size, sort_by, filter_query, base_mask, base_key)
+        except ValueError as e:
+            # 表格篩選條件無法解析時顯示空白頁面
+            print(f"表格篩選失敗: {e}")
+            return [], 1
+    
+    # 回調函數：篩選器改變時產生圖表彙總資料（每個回調只取一次目前的資料狀態，重新載入不影響進行中的請求）
     @app.callback(
+        Output('chart-aggregates', 'data'),
+        [Input('category-filter', 'value'),
+         Input('date-filter', 'start_date'),
+         Input('date-filter', 'end_date'),
+         Input('min-amount-filter', 'value'),
+         Input(DATA_VERSION_STORE, 'data')]
+    )
+    def update_aggregates(selected_categories, start_date, end_date, min_amount, data_version):
+        return build_aggregates(watcher.current(), selected_categories, start_date, end_date, min_amount)
+    
+    # 瀏覽器端回調：點選圖表更新交叉篩選，並由彙總資料繪製圖表（assets/student_case_cross_filter.js）
+    app.clientside_callback(
+        ClientsideFunction('student_case', 'update_cross_filter'),
+        Output('cross-filter', 'data'),
+        [Input('category-revenue-chart', 'clickData'),
+         Input('monthly-revenue-chart', 'clickData'),
+         Input('product-revenue-chart', 'clickData'),
+         Input('discount-analysis-chart', 'clickData'),
+         Input('clear-cross-filter', 'n_clicks')],
+        [State('cross-filter', 'data')],
+        prevent_initial_call=True
+    )
+    app.clientside_callback(
+        ClientsideFunction('student_case', 'render_charts'),
         [Output('monthly-revenue-chart', 'figure'),
          Output('category-revenue-chart', 'figure'),
          Output('product-revenue-chart', 'figure'),
-         Output('discount-analysis-chart', 'figure'),
-         Output('orders-table', 'data')],
+         Output('discount-analysis-chart', 'figure')],
+        [Input('chart-aggregates', 'data'),
+         Input('cross-filter', 'data')]
+    )
+    
+    # 回調函數：表格分頁（只序列化目前頁面），依交叉篩選顯示點選項目的明細
+    @app.callback(
+        [Output('orders-table', 'data'),
+         Output('orders-table', 'page_count')],
         [Input('category-filter', 'value'),
          Input('date-filter', 'start_date'),
          Input('date-filter', 'end_date'),
-         Input('min-amount-filter', 'value')]
+         Input('min-amount-filter', 'value'),
+         Input('cross-filter', 'data'),
+         Input('orders-table', 'page_current'),
+         Input('orders-table', 'page_size'),
+         Input('orders-table', 'sort_by'),
+         Input('orders-table', 'filter_query'),
+         Input(DATA_VERSION_STORE, 'data')]
     )
-    def update_charts(selected_categories, start_date, end_date, min_amount):
-        # 篩選資料
-        filtered_df = df.copy()
-        
-        if selected_categories:
-            filtered_df = filtered_df[filtered_df['category'].isin(selected_categories)]
-        
-        if start_date and end_date:
-            filtered_df = filtered_df[
-                (filtered_df['order_date'] >= start_date) & 
-                (filtered_df['order_date'] <= end_date)
-            ]
-        
-        if min_amount is not None:
-            filtered_df = filtered_df[filtered_df['total_with_tax'] >= min_amount]
-        
-        # 1. 月度營收趨勢圖
-        monthly_revenue = filtered_df.groupby(['year', 'month', 'month_name'])['total_with_tax'].sum().reset_index()
-        monthly_revenue = monthly_revenue.sort_values(['year', 'month'])
-        
-        fig1 = px.line(
-            monthly_revenue, 
-            x='month_name', 
-            y='total_with_tax',
-            color='year',
-            title='月度營收趨勢',
-            labels={'month_name': '月份', 'total_with_tax': '營收 ($)', 'year': '年份'}
-        )
-        fig1.update_layout(xaxis={'categoryorder': 'array', 'categoryarray': ['January', 'February', 'March']})
-        
-        # 2. 產品類別營收分布
-        category_revenue = filtered_df.groupby('category')['total_with_tax'].sum().reset_index()
-        fig2 = px.pie(
-            category_revenue, 
-            values='total_with_tax', 
-            names='category',
-            title='產品類別營收分布'
-        )
-        
-        # 3. 產品營收排行
-        product_revenue = filtered_df.groupby('product_name')['total_with_tax'].sum().reset_index()
-        product_revenue = product_revenue.sort_values('total_with_tax', ascending=True)
-        fig3 = px.bar(
-            product_revenue, 
-            x='total_with_tax', 
-            y='product_name',
-            orientation='h',
-            title='產品營收排行',
-            labels={'total_with_tax': '營收 ($)', 'product_name': '產品名稱'}
-        )
-        
-        # 4. 折扣分析
-        discount_stats = filtered_df.groupby('discount')['total_with_tax'].sum().reset_index()
-        fig4 = px.scatter(
-            discount_stats, 
-            x='discount', 
-            y='total_with_tax',
-            size='total_with_tax',
-            title='折扣與營收關係',
-            labels={'discount': '折扣 (%)', 'total_with_tax': '營收 ($)'}
-        )
-        
-        # 更新表格資料
-        table_data = filtered_df.to_dict('records')
-        
-        return fig1, fig2, fig3, fig4, table_data
+    def update_table(selected_categories, start_date, end_date, min_amount, cross_filter,
+                     page_current, page_size, sort_by, filter_query, data_version):
+        return build_table_page(watcher.current(), selected_categories, start_date, end_date, min_amount,
+                                cross_filter, page_current, page_size, sort_by, filter_query)
+    
+    STARTUP_TIMER.attach(app)
+    STARTUP_TIMER.mark('app')
     
     return app
 
@@ -301,6 +497,7 @@ def main():
     
     # 啟動應用
     print("儀表板已創建完成！")
+    STARTUP_TIMER.print_report()
     print("請在瀏覽器中開啟 http://127.0.0.1:8050 來查看儀表板")
     
     app.run_server(debug=True, host='127.0.0.1', port=8050)
@@ -3,6 +3,11 @@ import numpy as np
 import re
 from datetime import datetime
 import warnings
+from date_utils import to_date_column, excel_writer
+from wide_to_long import detect_month_columns, clean_month_values, melt_month_columns
+from key_join import KeyIndex
+from pivot_engine import build_pivot
+from olap_cube import materialize_cube, default_cube_path
 warnings.filterwarnings('ignore')
 
 def clean_orders_data(df):
@@ -10,7 +15,7 @@ def clean_orders_data(df):
     清洗 orders 資料
     
     清洗邏輯：
-    - 日期欄（order_date）統一為 YYYY-MM-DD（無法解析 → NaN）
+    - 日期欄（order_date）統一為日期型別 datetime64（無法解析 → NaT）
     - qty 轉數值：「seven」→ 7；不可解析 → NaN
     - discount 去掉 % 後轉數值；無效或空字串 → 0
     """
@@ -19,7 +24,7 @@ def clean_orders_data(df):
     # 複製資料避免修改原始資料
     df_clean = df.copy()
     
-    # 1. 清洗日期欄位 - 統一為 YYYY-MM-DD 格式
+    # 1. 清洗日期欄位 - 統一格式後轉為日期型別
     def standardize_date(date_str):
         if pd.isna(date_str):
             return np.nan
@@ -55,7 +60,7 @@ def clean_orders_data(df):
             return np.nan
     
     # 清洗 order_date 欄位
-    df_clean['order_date'] = df_clean['order_date'].apply(standardize_date)
+    df_clean['order_date'] = to_date_column(df_clean['order_date'].apply(standardize_date))
     print("  已清洗 order_date 欄位")
     
     # 2. 清洗 qty - 轉數值（seven→7；不可解析→NaN）
@@ -204,7 +209,7 @@ def clean_monthly_sales_wide_data(df):
     
     清洗邏輯：
     - region 欄位去空白、Title Case
-    - 月份欄位（Jan, Feb, Mar）確保為數值格式
+    - 月份欄位（自動偵測 Jan ~ Dec、2025-01、一月 ...）確保為數值格式
     """
     print("開始清洗 monthly_sales_wide 資料...")
     
@@ -220,12 +225,10 @@ def clean_monthly_sales_wide_data(df):
     df_clean['region'] = df_clean['region'].apply(clean_region)
     print("  已清洗 region 欄位")
     
-    # 2. 清洗月份欄位 - 確保為數值格式
-    month_columns = ['Jan', 'Feb', 'Mar']
-    for month in month_columns:
-        if month in df_clean.columns:
-            df_clean[month] = pd.to_numeric(df_clean[month], errors='coerce')
-            print(f"  已清洗 {month} 欄位")
+    # 2. 清洗月份欄位 - 整塊一次轉為數值格式
+    month_columns = detect_month_columns(df_clean)
+    df_clean = clean_month_values(df_clean, month_columns)
+    print(f"  已清洗月份欄位: {month_columns}")
     
     print("monthly_sales_wide 資料清洗完成！")
     return df_clean
@@ -263,10 +266,12 @@ def main():
         
         # 將 products_master_clean 的資料合併到 orders_clean
         print("\n開始合併 products_master 資料到 orders...")
-        orders_clean = orders_clean.merge(
-            products_master_clean[['product_id', 'product_name', 'category', 'unit_price', 'tax_rate']], 
-            on='product_id', 
-            how='left'
+        # 以 product_id 建立鍵值索引（會檢查 product_id 是否唯一），一次補上多個欄位
+        product_index = KeyIndex(products_master_clean, key='product_id', name='products_master')
+        orders_clean, _ = product_index.enrich(
+            orders_clean,
+            ['product_name', 'category', 'unit_price', 'tax_rate'],
+            copy=False
         )
         print("  已合併 products_master 資料")
         
@@ -287,32 +292,28 @@ def main():
         print("\n開始建立樞紐表分析...")
         
         # 建立樞紐表：以 total_with_tax 做匯總，index=category，columns=product_name
-        pivot_table = pd.pivot_table(
+        # 總計由分組結果直接彙總；組合過多時自動改用稀疏模式，以長表輸出
+        pivot = build_pivot(
             orders_clean,
-            values='total_with_tax',
             index='category',
             columns='product_name',
-            aggfunc='sum',
-            fill_value=0
+            values='total_with_tax',
+            row_total_label='Total',
+            column_total_label='Total'
         )
         
-        # 計算每個 category 的總計
-        pivot_table['Total'] = pivot_table.sum(axis=1)
-        
-        # 計算每個 product_name 的總計
-        pivot_table.loc['Total'] = pivot_table.sum()
-        
         print("  已建立樞紐表分析")
-        print(f"  樞紐表大小: {pivot_table.shape}")
+        print(f"  樞紐表大小: {pivot.shape}（稀疏模式: {pivot.sparse}）")
         
         # 建立資料轉置（unpivoting/melting）
         print("\n開始建立資料轉置...")
         
         # 將 monthly_sales_wide_clean 從寬格式轉為長格式
         # 欄位：region, month, revenue
-        monthly_sales_long = monthly_sales_wide_clean.melt(
-            id_vars=['region'],
-            value_vars=['Jan', 'Feb', 'Mar'],
+        # month 為依月份先後排序的有序類別，結果已按 region 和 month 排序
+        monthly_sales_long = melt_month_columns(
+            monthly_sales_wide_clean,
+            id_column='region',
             var_name='month',
             value_name='revenue'
         )
@@ -320,33 +321,18 @@ def main():
         print("  已建立資料轉置")
         print(f"  轉置後資料大小: {monthly_sales_long.shape}")
         print(f"  轉置後欄位: {list(monthly_sales_long.columns)}")
-        
-        # 排序 monthly_sales_long 資料
-        print("\n開始排序 monthly_sales_long 資料...")
-        
-        # 定義月份的正確順序（Jan → Feb → Mar）
-        month_order = ['Jan', 'Feb', 'Mar']
-        
-        # 將 month 欄位轉換為 Categorical 類型，確保正確的排序順序
-        monthly_sales_long['month'] = pd.Categorical(
-            monthly_sales_long['month'], 
-            categories=month_order, 
-            ordered=True
-        )
-        
-        # 按 region 和 month 排序
-        monthly_sales_long = monthly_sales_long.sort_values(['region', 'month'])
-        print("  已排序 monthly_sales_long 資料（月份按 Jan → Feb → Mar 順序）")
+        print(f"  月份順序: {list(monthly_sales_long['month'].cat.categories)}")
         
         # 建立輸出檔案名稱
         output_file = 'clean/student_case_clean.xlsx'
         
         # 儲存清洗後的資料
-        with pd.ExcelWriter(output_file, engine='openpyxl') as writer:
+        with excel_writer(output_file) as writer:
             orders_clean.to_excel(writer, sheet_name='orders_clean', index=False)
             products_master_clean.to_excel(writer, sheet_name='products_master_clean', index=False)
             monthly_sales_wide_clean.to_excel(writer, sheet_name='monthly_sales_wide_clean', index=False)
-            pivot_table.to_excel(writer, sheet_name='pivot_analysis')
+            for sheet_name, sheet_df in pivot.to_sheets('pivot_analysis').items():
+                sheet_df.to_excel(writer, sheet_name=sheet_name)
             monthly_sales_long.to_excel(writer, sheet_name='monthly_sales_long', index=False)
         
         print(f"\n資料清洗完成！已儲存至 {output_file}")
@@ -355,6 +341,9 @@ def main():
         print(f"monthly_sales_wide_clean: {monthly_sales_wide_clean.shape}")
         print(f"monthly_sales_long: {monthly_sales_long.shape}")
         
+        # 物化 OLAP cube（date × product × category）供報表與儀表板查詢
+        materialize_cube(orders_clean, 'student_case', default_cube_path(output_file))
+        
         # 顯示清洗前後的對比
         print("\n=== 清洗前後對比 ===")
         print("\norders 清洗前（前5筆）:")
@@ -396,9 +385,8 @@ def main():
         print(f"  原始資料筆數: {len(monthly_sales_wide_df)}")
         print(f"  清洗後資料筆數: {len(monthly_sales_wide_clean)}")
         print(f"  region 欄位有效值: {monthly_sales_wide_clean['region'].notna().sum()}/{len(monthly_sales_wide_clean)}")
-        print(f"  Jan 欄位有效值: {monthly_sales_wide_clean['Jan'].notna().sum()}/{len(monthly_sales_wide_clean)}")
-        print(f"  Feb 欄位有效值: {monthly_sales_wide_clean['Feb'].notna().sum()}/{len(monthly_sales_wide_clean)}")
-        print(f"  Mar 欄位有效值: {monthly_sales_wide_clean['Mar'].notna().sum()}/{len(monthly_sales_wide_clean)}")
+        for month in detect_month_columns(monthly_sales_wide_clean):
+            print(f"  {month} 欄位有效值: {monthly_sales_wide_clean[month].notna().sum()}/{len(monthly_sales_wide_clean)}")
         
     except Exception as e:
         print(f"處理過程中發生錯誤: {str(e)}")
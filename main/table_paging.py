@@ -0,0 +1,332 @@
+import math
+import re
+import threading
+import numpy as np
+import pandas as pd
+from dash import Input, Output
+
+# Dash DataTable filter_query 的運算子（符號與英文寫法）
+FILTER_OPERATORS = {
+    '>=': 'ge', '<=': 'le', '!=': 'ne', '>': 'gt', '<': 'lt', '=': 'eq',
+    'ge': 'ge', 'le': 'le', 'ne': 'ne', 'gt': 'gt', 'lt': 'lt', 'eq': 'eq',
+    'contains': 'contains', 'datestartswith': 'datestartswith'
+}
+
+# 不需要值的運算子：nil 為缺失值，blank 另包含空字串
+UNARY_OPERATORS = {
+    'is nil': 'nil', 'is not nil': 'not nil',
+    'is blank': 'blank', 'is not blank': 'not blank'
+}
+
+# DataTable 改由伺服器端分頁、排序與篩選時的共用設定
+CUSTOM_PAGING_PROPS = {
+    'page_current': 0,
+    'page_action': 'custom',
+    'sort_action': 'custom',
+    'sort_mode': 'multi',
+    'sort_by': [],
+    'filter_action': 'custom',
+    'filter_query': ''
+}
+
+# 例如 {qty} s> 5、{category} contains "Office"、{order_date} datestartswith 2024-01
+_FILTER_PATTERN = re.compile(
+    r"^\s*\{(?P<column>[^}]+)\}\s+(?:[si](?=\S))?(?P<operator>>=|<=|!=|>|<|=|ge|le|ne|gt|lt|eq|contains|datestartswith)\s+(?P<value>.+?)\s*$"
+)
+
+# 例如 {product_name} is blank、{discount} is not nil
+_UNARY_PATTERN = re.compile(
+    r"^\s*\{(?P<column>[^}]+)\}\s+(?P<operator>is\s+(?:not\s+)?(?:nil|blank))\s*$"
+)
+
+def parse_filter_query(filter_query):
+    """
+    解析 DataTable 的 filter_query
+
+    Args:
+        filter_query (str): 以 && 串接的條件
+
+    Returns:
+        list: [(欄位, 運算子, 值)]，is nil / is blank 等條件的值為 None；
+            無法解析的條件拋出 ValueError
+    """
+    conditions = []
+    for part in (filter_query or '').split(' && '):
+        if not part.strip():
+            continue
+        unary = _UNARY_PATTERN.match(part)
+        if unary is not None:
+            operator = ' '.join(unary.group('operator').split())
+            conditions.append((unary.group('column'), UNARY_OPERATORS[operator], None))
+            continue
+        match = _FILTER_PATTERN.match(part)
+        if match is None:
+            raise ValueError(f"無法解析的篩選條件: {part}")
+        value = match.group('value')
+        if len(value) >= 2 and value[0] == value[-1] and value[0] in '"\'`':
+            value = value[1:-1]
+        conditions.append((match.group('column'), FILTER_OPERATORS[match.group('operator')], value))
+    return conditions
+
+def _code_dtype(n_uniques):
+    # 代碼範圍為 -1 到 n_uniques（排序時缺失值使用 n_uniques）
+    for dtype in (np.int8, np.int16, np.int32):
+        if n_uniques < np.iinfo(dtype).max:
+            return dtype
+    return np.int64
+
+class TableIndex:
+    """
+    DataTable 伺服器端分頁、排序與篩選的索引
+
+    - 每個欄位建立一次排序後的不重複值與整數代碼（代碼順序即排序順序）
+    - 排序只對篩選後的列比較整數代碼；大小比較以二分搜尋找到代碼門檻
+    - contains 等字串條件只對不重複值判斷一次，再以代碼展開
+    - 每次只序列化目前頁面的資料列
+    """
+
+    def __init__(self, df, columns=None):
+        """
+        Args:
+            df (pd.DataFrame): 表格資料（不複製，建立後請勿修改）
+            columns (list): 可排序／篩選的欄位，預設為全部欄位
+        """
+        self.df = df
+        self.columns = list(columns or df.columns)
+        self._codes = {}
+        self._lock = threading.Lock()
+        self._last_rows = (None, None)
+
+    def __len__(self):
+        return len(self.df)
+
+    def column_codes(self, column):
+        """
+        取得欄位的 (整數代碼, 排序後的不重複值)；缺失值代碼為 -1（排序時排在最後）
+        """
+        if column not in self.columns:
+            raise ValueError(f"表格沒有欄位: {column}（可用: {self.columns}）")
+        with self._lock:
+            cached = self._codes.get(column)
+        if cached is None:
+            values = self.df[column]
+            try:
+                codes, uniques = pd.factorize(values, sort=True)
+            except TypeError:
+                # 混合型別無法直接排序，改以字串排序
+                codes, uniques = pd.factorize(values.where(values.isna(), values.astype(str)), sort=True)
+            # 代碼以足夠容納不重複值數量的最小整數型別保存（每個 worker 各有一份）
+            cached = (codes.astype(_code_dtype(len(uniques)), copy=False), uniques)
+            with self._lock:
+                self._codes[column] = cached
+        return cached
+
+    def prepare(self):
+        """
+        預先建立所有欄位的索引（啟動時呼叫，第一次互動不需等待）
+        """
+        for column in self.columns:
+            self.column_codes(column)
+        return self
+
+    def to_arrays(self, prefix=''):
+        """
+        匯出所有欄位的代碼與不重複值（寫入啟動快照，供其他 worker 記憶體映射）
+
+        Args:
+            prefix (str): 陣列名稱前綴
+
+        Returns:
+            dict: {名稱: np.ndarray}
+        """
+        self.prepare()
+        arrays = {}
+        for i, column in enumerate(self.columns):
+            codes, uniques = self._codes[column]
+            arrays[f'{prefix}{i}.codes'] = codes
+            arrays[f'{prefix}{i}.uniques'] = uniques.to_numpy()
+        return arrays
+
+    @classmethod
+    def from_arrays(cls, df, arrays, columns=None, prefix=''):
+        """
+        由 to_arrays 匯出的陣列還原索引（不重新排序欄位）
+
+        Args:
+            df (pd.DataFrame): 表格資料（可為快照映射的資料）
+            arrays (dict): load_snapshot_arrays 讀取的陣列
+            columns (list): 與匯出時相同的欄位
+            prefix (str): 陣列名稱前綴
+
+        Returns:
+            TableIndex: 還原的索引
+        """
+        index = cls(df, columns)
+        for i, column in enumerate(index.columns):
+            index._codes[column] = (arrays[f'{prefix}{i}.codes'], pd.Index(arrays[f'{prefix}{i}.uniques']))
+        return index
+
+    def _coerce(self, uniques, value):
+        # 篩選值依欄位型別轉換，無法轉換時以字串比較
+        if isinstance(uniques, pd.DatetimeIndex):
+            return pd.Timestamp(value)
+        if pd.api.types.is_numeric_dtype(uniques.dtype):
+            return float(value)
+        return str(value)
+
+    def condition_mask(self, column, operator, value):
+        """
+        單一條件的布林遮罩
+        """
+        codes, uniques = self.column_codes(column)
+
+        if operator in ('nil', 'not nil'):
+            missing = codes < 0
+            return missing if operator == 'nil' else ~missing
+        if operator in ('blank', 'not blank'):
+            if pd.api.types.is_string_dtype(uniques.dtype) or uniques.dtype == object:
+                hits = pd.Series(uniques.astype(str)).str.strip().eq('').to_numpy()
+            else:
+                hits = np.zeros(len(uniques), dtype=bool)
+            # 代碼 -1（缺失值）對應最後一個位置
+            blank = np.append(hits, True)[codes]
+            return blank if operator == 'blank' else ~blank
+
+        if operator in ('contains', 'datestartswith'):
+            if isinstance(uniques, pd.DatetimeIndex):
+                labels = pd.Series(uniques.strftime('%Y-%m-%d %H:%M:%S'))
+            else:
+                labels = pd.Series(uniques.astype(str))
+            if operator == 'contains':
+                hits = labels.str.contains(str(value), case=False, regex=False).to_numpy()
+            else:
+                hits = labels.str.startswith(str(value)).to_numpy()
+            return np.append(hits, False)[codes]
+
+        try:
+            value = self._coerce(uniques, value)
+            left = uniques.searchsorted(value, side='left')
+            right = uniques.searchsorted(value, side='right')
+        except (TypeError, ValueError):
+            # 型別不相容（如數值欄位輸入文字）時沒有相符的列
+            return np.zeros(len(codes), dtype=bool) if operator != 'ne' else codes >= 0
+
+        valid = codes >= 0
+        if operator == 'eq':
+            return (codes >= left) & (codes < right)
+        if operator == 'ne':
+            return valid & ((codes < left) | (codes >= right))
+        if operator == 'lt':
+            return valid & (codes < left)
+        if operator == 'le':
+            return valid & (codes < right)
+        if operator == 'gt':
+            return codes >= right
+        return codes >= left
+
+    def filter_rows(self, filter_query='', base_mask=None):
+        """
+        篩選後的列位置（維持原始順序）
+
+        Args:
+            filter_query (str): DataTable 的 filter_query
+            base_mask (np.ndarray): 頁面其他篩選器的結果，None 表示全部
+        """
+        mask = np.ones(len(self.df), dtype=bool) if base_mask is None else np.asarray(base_mask, dtype=bool).copy()
+        for column, operator, value in parse_filter_query(filter_query):
+            mask &= self.condition_mask(column, operator, value)
+        return np.flatnonzero(mask)
+
+    def sort_rows(self, rows, sort_by=None):
+        """
+        依 sort_by（[{column_id, direction}, ...]）排序列位置，缺失值排在最後
+        """
+        if not sort_by:
+            return rows
+        keys = []
+        for item in sort_by:
+            codes, uniques = self.column_codes(item['column_id'])
+            key = codes[rows].astype(np.int64)
+            key[key < 0] = len(uniques)
+            if item.get('direction') == 'desc':
+                key = np.where(key == len(uniques), len(uniques), len(uniques) - 1 - key)
+            keys.append(key)
+        # lexsort 以最後一個鍵為主要排序鍵
+        return rows[np.lexsort(keys[::-1])]
+
+    def rows(self, filter_query='', sort_by=None, base_mask=None, base_key=None):
+        """
+        篩選並排序後的列位置
+
+        base_key 為 base_mask 的識別值（例如篩選器狀態）；條件相同時（翻頁）
+        直接使用上一次的結果。
+        """
+        sort_key = tuple((item['column_id'], item.get('direction')) for item in (sort_by or []))
+        key = (filter_query or '', sort_key, base_key) if base_mask is None or base_key is not None else None
+        with self._lock:
+            last_key, last_rows = self._last_rows
+        if key is not None and key == last_key:
+            return last_rows
+
+        rows = self.sort_rows(self.filter_rows(filter_query, base_mask), sort_by)
+        if key is not None:
+            with self._lock:
+                self._last_rows = (key, rows)
+        return rows
+
+    def page(self, page_current, page_size, sort_by=None, filter_query='', base_mask=None, base_key=None, columns=None):
+        """
+        取得目前頁面的資料
+
+        Args:
+            page_current (int): 目前頁碼（從 0 開始），超過最後一頁時顯示最後一頁
+            page_size (int): 每頁筆數
+            sort_by (list): DataTable 的 sort_by
+            filter_query (str): DataTable 的 filter_query
+            base_mask (np.ndarray): 頁面其他篩選器的結果
+            base_key: base_mask 的識別值，用於翻頁時重複使用結果
+            columns (list): 要輸出的欄位，預設為 TableIndex 的欄位
+
+        Returns:
+            tuple: (目前頁面的 records, 總頁數)
+        """
+        rows = self.rows(filter_query, sort_by, base_mask, base_key)
+        page_count = max(1, math.ceil(len(rows) / page_size))
+        page_current = min(page_current or 0, page_count - 1)
+        start = page_current * page_size
+        page_rows = rows[start:start + page_size]
+        return self.df.iloc[page_rows][columns or self.columns].to_dict('records'), page_count
+
+def register_paging_callback(app, table_id, table_index, version_store=None):
+    """
+    為 DataTable 註冊伺服器端分頁回調（表格需使用 CUSTOM_PAGING_PROPS）
+
+    Args:
+        app (dash.Dash): Dash 應用
+        table_id (str): DataTable 的 id
+        table_index (TableIndex 或 callable): 表格資料索引，或回傳目前索引的函數（資料會重新載入時）
+        version_store (str): 資料版本元件的 id；版本改變時重新取得目前頁面
+
+    篩選條件無法解析（如輸入錯誤）時回傳空白頁面，不讓回調失敗
+    """
+    inputs = [Input(table_id, 'page_current'),
+              Input(table_id, 'page_size'),
+              Input(table_id, 'sort_by'),
+              Input(table_id, 'filter_query')]
+    if version_store:
+        inputs.append(Input(version_store, 'data'))
+
+    @app.callback(
+        [Output(table_id, 'data'),
+         Output(table_id, 'page_count')],
+        inputs
+    )
+    def update_table_page(page_current, page_size, sort_by, filter_query, *data_version):
+        index = table_index() if callable(table_index) else table_index
+        try:
+            return index.page(page_current, page_size, sort_by, filter_query)
+        except ValueError as e:
+            print(f"表格 {table_id} 篩選失敗: {e}")
+            return [], 1
+
+    return update_table_page
@@ -0,0 +1,179 @@
+import html
+import pandas as pd
+
+NA_REP = 'N/A'
+
+# Email 表格的共用樣式（Gmail 不支援 <style>，樣式需直接寫在每個標籤上）
+BORDER_STYLE = "border: 1px solid #dee2e6;"
+TABLE_STYLE = "width: 100%; border-collapse: collapse; margin: 20px 0; font-family: Arial, sans-serif;"
+HEADER_ROW_STYLE = "background-color: #f8f9fa; border: 1px solid #dee2e6;"
+HEADER_CELL_STYLE = "font-weight: bold; color: #495057;"
+HIGHLIGHT_STYLE = "color: #dc3545; font-weight: bold;"
+
+# 各欄位型別的格式：非缺失值套用格式字串，缺失值顯示 na_rep
+FORMATS = {
+    'text': None,
+    'currency': '${:,.2f}',
+    'percent': '{:.2f}%',
+    'number': '{:,.2f}'
+}
+
+class TableColumn:
+    """
+    表格欄位設定
+    """
+
+    def __init__(self, key, header=None, kind='text', style='', highlight=None,
+                 highlight_style=HIGHLIGHT_STYLE, na_rep=NA_REP):
+        """
+        Args:
+            key (str): 資料欄位
+            header (str): 表頭文字，預設為欄位名稱
+            kind (str): text / currency / percent / number
+            style (str): 此欄每個儲存格固定加上的樣式
+            highlight: 需要醒目標示的儲存格；True 表示所有非缺失值，
+                或傳入函數(Series) → 布林遮罩
+            highlight_style (str): 醒目標示的樣式
+            na_rep (str): 缺失值顯示文字
+        """
+        if kind not in FORMATS:
+            raise ValueError(f"不支援的欄位型別: {kind}（可用: {list(FORMATS)}）")
+        self.key = key
+        self.header = header if header is not None else key
+        self.kind = kind
+        self.style = style
+        self.highlight = highlight
+        self.highlight_style = highlight_style
+        self.na_rep = na_rep
+
+    def format(self, values):
+        """
+        整欄一次格式化為字串
+        """
+        present = values.notna()
+        formatted = pd.Series(self.na_rep, index=values.index, dtype=object)
+        template = FORMATS[self.kind]
+        if template is None:
+            formatted[present] = values[present].astype(str)
+        else:
+            formatted[present] = values[present].map(template.format)
+        return formatted
+
+    def cell_styles(self, values):
+        """
+        整欄一次決定每個儲存格的額外樣式（不標示的儲存格為空字串）
+        """
+        styles = pd.Series('', index=values.index, dtype=object)
+        if self.highlight is None:
+            return styles
+        if self.highlight is True:
+            mask = values.notna()
+        else:
+            mask = pd.Series(self.highlight(values), index=values.index).fillna(False).astype(bool)
+        styles[mask] = self.highlight_style
+        return styles
+
+class TableRenderer:
+    """
+    以欄位為單位格式化、再填入預先編譯的列模板產生表格
+
+    - 每一欄只格式化一次（貨幣、百分比、N/A），不逐列判斷型別
+    - HTML 與純文字的列模板在建立時組好，產生表格時每列只做一次 str.format
+    - 所有列最後一次 join，避免重複字串相加
+    """
+
+    def __init__(self, columns, cell_padding='8px', text_align='center', font_size=None,
+                 text_header=None, text_row_template=None):
+        """
+        Args:
+            columns (list): TableColumn 清單
+            cell_padding (str): 儲存格內距
+            text_align (str): 儲存格對齊
+            font_size (str): 表格字體大小，None 表示不指定
+            text_header (str): 純文字版表頭，預設以 tab 分隔表頭文字
+            text_row_template (str): 純文字版的列模板，以欄位名稱為欄位，
+                例如 "{emp_id}\t\t{name:<8}"；預設以 tab 分隔
+        """
+        self.columns = list(columns)
+        self.table_style = TABLE_STYLE + (f" font-size: {font_size};" if font_size else "")
+        self.cell_style = f"padding: {cell_padding}; text-align: {text_align}; {BORDER_STYLE}"
+        self.header_html, self.row_template = self._compile_html(self.columns)
+        self.text_header = text_header
+        self.text_row_template = text_row_template
+
+    def _compile_html(self, columns):
+        """
+        組出表頭與列模板；列模板依序以位置欄位填入各欄的值與醒目標示樣式
+        """
+        header_cells = ''.join(
+            f'<th style="{self.cell_style} {HEADER_CELL_STYLE}">{html.escape(str(col.header))}</th>'
+            for col in columns
+        )
+        header_html = f'<tr style="{HEADER_ROW_STYLE}">{header_cells}</tr>'
+
+        row_cells = []
+        position = 0
+        for col in columns:
+            fixed_style = f" {col.style}" if col.style else ""
+            if col.highlight is not None:
+                row_cells.append(f'<td style="{self.cell_style}{fixed_style}{{{position + 1}}}">{{{position}}}</td>')
+                position += 2
+            else:
+                row_cells.append(f'<td style="{self.cell_style}{fixed_style}">{{{position}}}</td>')
+                position += 1
+        row_template = f'<tr style="{BORDER_STYLE}">' + ''.join(row_cells) + '</tr>'
+        return header_html, row_template
+
+    def _available(self, df):
+        # 資料中不存在的欄位略過
+        return [col for col in self.columns if col.key in df.columns]
+
+    def render_html(self, df):
+        """
+        產生 HTML 表格（文字內容會做 HTML 跳脫）
+        """
+        columns = self._available(df)
+        if len(columns) == len(self.columns):
+            header_html, row_template = self.header_html, self.row_template
+        else:
+            header_html, row_template = self._compile_html(columns)
+
+        fields = []
+        for col in columns:
+            fields.append(col.format(df[col.key]).map(html.escape).tolist())
+            if col.highlight is not None:
+                fields.append([f" {style}" if style else "" for style in col.cell_styles(df[col.key])])
+
+        rows = [row_template.format(*values) for values in zip(*fields)]
+        return (
+            f'<table style="{self.table_style}">\n'
+            f'<thead>\n{header_html}\n</thead>\n'
+            '<tbody>\n' + ''.join(row + '\n' for row in rows) + '</tbody>\n'
+            '</table>'
+        )
+
+    def render_text(self, df):
+        """
+        產生純文字表格（表頭、分隔線與每列一行）
+        """
+        columns = self._available(df)
+        text_header = self.text_header
+        if text_header is None:
+            text_header = '\t'.join(str(col.header) for col in columns)
+        text_row_template = self.text_row_template
+        if text_row_template is None or len(columns) != len(self.columns):
+            text_row_template = '\t'.join(f"{{{col.key}}}" for col in columns)
+
+        keys = [col.key for col in columns]
+        fields = [col.format(df[col.key]).tolist() for col in columns]
+        rows = [text_row_template.format(**dict(zip(keys, values))) for values in zip(*fields)]
+        return text_header + "\n" + "-" * 80 + "\n" + ''.join(row + "\n" for row in rows)
+
+    def render(self, df):
+        """
+        同時產生 HTML 與純文字版本
+
+        Returns:
+            tuple: (html, text)
+        """
+        return self.render_html(df), self.render_text(df)
@@ -1,125 +1,184 @@
-import pandas as pd
-import plotly.express as px
 import dash
 from dash import dcc, html, Input, Output, dash_table
 import dash_bootstrap_components as dbc
+from data_loader import load_sheet, cache_info
+from callback_cache import register_metrics_endpoint
+from startup import LazyFigures
+from table_paging import TableIndex, CUSTOM_PAGING_PROPS, register_paging_callback
+from data_watcher import DataWatcher, DATA_VERSION_STORE, version_components, register_version_push
 
-def create_simple_dashboard():
+DATA_FILE = 'clean/student_case_clean.xlsx'
+WATCH_FILES = [DATA_FILE]
+TABLE_COLUMNS = ['order_date', 'product_name', 'category', 'qty', 'unit_price', 'discount', 'total_with_tax']
+
+def overview_builders(df):
+    """
+    兩張圖表的建立函數（供 LazyFigures 使用，每個資料版本只彙總並建立一次）
+    """
+    def category_pie():
+        # plotly 延遲到建立圖表時才匯入，縮短啟動時間
+        import plotly.express as px
+        return px.pie(
+            df.groupby('category')['total_with_tax'].sum().reset_index(),
+            values='total_with_tax',
+            names='category',
+            title='產品類別營收分布'
+        )
+    
+    def product_bar():
+        import plotly.express as px
+        return px.bar(
+            df.groupby('product_name')['total_with_tax'].sum().reset_index().sort_values('total_with_tax', ascending=True),
+            x='total_with_tax',
+            y='product_name',
+            orientation='h',
+            title='產品營收排行'
+        )
+    
+    return {'category_pie': category_pie, 'product_bar': product_bar}
+
+def load_dashboard_state(version):
+    """
+    載入資料並建立摘要、圖表與表格索引（啟動與資料更新時執行）
+    
+    Returns:
+        dict: version、df、stats（摘要數字）、figures、table_index
+    """
+    df = load_sheet(DATA_FILE, sheet_name='orders_clean')
+    print(f"成功載入資料，共 {len(df)} 筆記錄")
+    stats = {
+        'orders': len(df),
+        'revenue': df['total_with_tax'].sum(),
+        'products': df['product_id'].nunique(),
+        'categories': df['category'].nunique()
+    }
+    return {'version': version, 'df': df, 'stats': stats,
+            'figures': LazyFigures(overview_builders(df)),
+            'table_index': TableIndex(df, TABLE_COLUMNS).prepare()}
+
+def create_simple_dashboard(server=True, url_base_pathname='/', watcher=None):
     """
     創建簡化版儀表板
+    
+    Args:
+        server (flask.Flask 或 bool): 共用的 Flask 伺服器，True 表示建立新的伺服器
+        url_base_pathname (str): 儀表板的路徑前綴（多頁面中心中的頁面路徑）
+        watcher (LazyWatcher): 共用的資料監看器；None 表示啟動時立即載入資料
     """
-    # 載入資料
-    try:
-        df = pd.read_excel('clean/student_case_clean.xlsx', sheet_name='orders_clean')
-        print(f"成功載入資料，共 {len(df)} 筆記錄")
-    except Exception as e:
-        print(f"載入資料失敗: {e}")
-        return None
+    # 載入資料；資料檔更新時在背景重新載入，重新整理頁面即顯示新資料
+    lazy = watcher is not None
+    if not lazy:
+        try:
+            watcher = DataWatcher('test_dashboard', WATCH_FILES, load_dashboard_state)
+        except Exception as e:
+            print(f"載入資料失敗: {e}")
+            return None
+    watcher.start()
     
     # 創建 Dash 應用
-    app = dash.Dash(__name__, external_stylesheets=[dbc.themes.BOOTSTRAP])
+    # 共用的監看器延遲載入資料：不在建立時呼叫版面函數驗證回調，第一次開啟頁面才載入
+    app = dash.Dash(__name__, server=server, url_base_pathname=url_base_pathname,
+                    suppress_callback_exceptions=lazy, external_stylesheets=[dbc.themes.BOOTSTRAP])
     
-    # 簡化佈局
-    app.layout = dbc.Container([
-        html.H1("Student Case Orders 分析儀表板", className="text-center text-primary mb-4"),
-        html.Hr(),
+    # 簡化佈局（每次開啟頁面時以目前資料版本已建立的摘要與圖表組成）
+    def serve_layout():
+        state = watcher.current()
+        stats, figures = state['stats'], state['figures']
         
-        # 統計摘要
-        dbc.Row([
-            dbc.Col([
-                dbc.Card([
-                    dbc.CardBody([
-                        html.H4(f"{len(df)}", className="card-title text-center"),
-                        html.P("總訂單數", className="card-text text-center")
+        return dbc.Container([
+            html.H1("Student Case Orders 分析儀表板", className="text-center text-primary mb-4"),
+            html.Hr(),
+        
+            # 統計摘要
+            dbc.Row([
+                dbc.Col([
+                    dbc.Card([
+                        dbc.CardBody([
+                            html.H4(f"{stats['orders']}", className="card-title text-center"),
+                            html.P("總訂單數", className="card-text text-center")
+                        ])
                     ])
-                ])
-            ], width=3),
-            dbc.Col([
-                dbc.Card([
-                    dbc.CardBody([
-                        html.H4(f"${df['total_with_tax'].sum():,.2f}", className="card-title text-center"),
-                        html.P("總營收", className="card-text text-center")
+                ], width=3),
+                dbc.Col([
+                    dbc.Card([
+                        dbc.CardBody([
+                            html.H4(f"${stats['revenue']:,.2f}", className="card-title text-center"),
+                            html.P("總營收", className="card-text text-center")
+                        ])
                     ])
-                ])
-            ], width=3),
-            dbc.Col([
-                dbc.Card([
-                    dbc.CardBody([
-                        html.H4(f"{df['product_id'].nunique()}", className="card-title text-center"),
-                        html.P("產品種類", className="card-text text-center")
+                ], width=3),
+                dbc.Col([
+                    dbc.Card([
+                        dbc.CardBody([
+                            html.H4(f"{stats['products']}", className="card-title text-center"),
+                            html.P("產品種類", className="card-text text-center")
+                        ])
                     ])
-                ])
-            ], width=3),
-            dbc.Col([
-                dbc.Card([
-                    dbc.CardBody([
-                        html.H4(f"{df['category'].nunique()}", className="card-title text-center"),
-                        html.P("產品類別", className="card-text text-center")
+                ], width=3),
+                dbc.Col([
+                    dbc.Card([
+                        dbc.CardBody([
+                            html.H4(f"{stats['categories']}", className="card-title text-center"),
+                            html.P("產品類別", className="card-text text-center")
+                        ])
                     ])
-                ])
-            ], width=3)
-        ], className="mb-4"),
+                ], width=3)
+            ], className="mb-4"),
         
-        # 圖表
-        dbc.Row([
-            dbc.Col([
-                dbc.Card([
-                    dbc.CardHeader("產品類別營收分布"),
-                    dbc.CardBody([
-                        dcc.Graph(
-                            figure=px.pie(
-                                df.groupby('category')['total_with_tax'].sum().reset_index(),
-                                values='total_with_tax',
-                                names='category',
-                                title='產品類別營收分布'
-                            )
-                        )
+            # 圖表
+            dbc.Row([
+                dbc.Col([
+                    dbc.Card([
+                        dbc.CardHeader("產品類別營收分布"),
+                        dbc.CardBody([
+                            dcc.Graph(figure=figures.get('category_pie'))
+                        ])
                     ])
-                ])
-            ], width=6),
-            dbc.Col([
-                dbc.Card([
-                    dbc.CardHeader("產品營收排行"),
-                    dbc.CardBody([
-                        dcc.Graph(
-                            figure=px.bar(
-                                df.groupby('product_name')['total_with_tax'].sum().reset_index().sort_values('total_with_tax', ascending=True),
-                                x='total_with_tax',
-                                y='product_name',
-                                orientation='h',
-                                title='產品營收排行'
-                            )
-                        )
+                ], width=6),
+                dbc.Col([
+                    dbc.Card([
+                        dbc.CardHeader("產品營收排行"),
+                        dbc.CardBody([
+                            dcc.Graph(figure=figures.get('product_bar'))
+                        ])
                     ])
-                ])
-            ], width=6)
-        ], className="mb-4"),
-        
-        # 資料表格
-        dbc.Card([
-            dbc.CardHeader("訂單詳細資料"),
-            dbc.CardBody([
-                dash_table.DataTable(
-                    id='orders-table',
-                    columns=[
-                        {"name": "訂單日期", "id": "order_date"},
-                        {"name": "產品名稱", "id": "product_name"},
-                        {"name": "類別", "id": "category"},
-                        {"name": "數量", "id": "qty"},
-                        {"name": "單價", "id": "unit_price"},
-                        {"name": "折扣", "id": "discount"},
-                        {"name": "總金額", "id": "total_with_tax"}
-                    ],
-                    data=df.to_dict('records'),
-                    page_size=10,
-                    style_table={'overflowX': 'auto'},
-                    style_cell={'textAlign': 'center'},
-                    style_header={'backgroundColor': 'rgb(230, 230, 230)', 'fontWeight': 'bold'}
-                )
-            ])
-        ])
+                ], width=6)
+            ], className="mb-4"),
         
-    ], fluid=True)
+            # 資料表格
+            dbc.Card([
+                dbc.CardHeader("訂單詳細資料"),
+                dbc.CardBody([
+                    dash_table.DataTable(
+                        id='orders-table',
+                        columns=[
+                            {"name": "訂單日期", "id": "order_date"},
+                            {"name": "產品名稱", "id": "product_name"},
+                            {"name": "類別", "id": "category"},
+                            {"name": "數量", "id": "qty"},
+                            {"name": "單價", "id": "unit_price"},
+                            {"name": "折扣", "id": "discount"},
+                            {"name": "總金額", "id": "total_with_tax"}
+                        ],
+                        # 伺服器端分頁：版面不內嵌資料，由回調只傳送目前頁面
+                        page_size=10,
+                        **CUSTOM_PAGING_PROPS,
+                        style_table={'overflowX': 'auto'},
+                        style_cell={'textAlign': 'center'},
+                        style_header={'backgroundColor': 'rgb(230, 230, 230)', 'fontWeight': 'bold'}
+                    )
+                ])
+            ]),
+            
+            # 資料版本（資料更新時重新取得表格頁面）
+            *version_components(watcher)
+        ], fluid=True)
+    
+    app.layout = serve_layout
+    
+    register_version_push(app, watcher)
+    register_paging_callback(app, 'orders-table', lambda: watcher.current()['table_index'], DATA_VERSION_STORE)
+    register_metrics_endpoint(app, [], path=f"{url_base_pathname}metrics", extra={'data_loader': cache_info})
     
     return app
 
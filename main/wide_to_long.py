@@ -0,0 +1,160 @@
+import re
+from datetime import date
+import numpy as np
+import pandas as pd
+
+# 英文月份縮寫與全名 → 月份數字
+ENGLISH_MONTHS = {
+    'jan': 1, 'feb': 2, 'mar': 3, 'apr': 4, 'may': 5, 'jun': 6,
+    'jul': 7, 'aug': 8, 'sep': 9, 'oct': 10, 'nov': 11, 'dec': 12,
+    'january': 1, 'february': 2, 'march': 3, 'april': 4, 'june': 6,
+    'july': 7, 'august': 8, 'september': 9, 'sept': 9, 'october': 10,
+    'november': 11, 'december': 12
+}
+
+# 中文月份 → 月份數字（一月 ~ 十二月）
+CHINESE_MONTHS = {
+    '一月': 1, '二月': 2, '三月': 3, '四月': 4, '五月': 5, '六月': 6,
+    '七月': 7, '八月': 8, '九月': 9, '十月': 10, '十一月': 11, '十二月': 12
+}
+
+YEAR_MONTH_PATTERN = re.compile(r'^(\d{4})[-/.](\d{1,2})$')
+NUMERIC_MONTH_PATTERN = re.compile(r'^(\d{1,2})月$')
+
+def parse_month_label(label):
+    """
+    將欄位名稱解析為可排序的月份鍵值 (year, month)
+
+    支援：
+    - Jan ~ Dec、January ~ December（無年份 → year = 0）
+    - 2025-01、2025/1（年-月）
+    - 一月 ~ 十二月、1月 ~ 12月
+    - 日期型別的欄位名稱（datetime.date、datetime.datetime、pd.Timestamp、np.datetime64）
+
+    Returns:
+        tuple 或 None: (year, month)，非月份欄位回傳 None
+    """
+    # pd.Timestamp 與 datetime.datetime 都是 datetime.date 的子類別
+    if isinstance(label, (date, np.datetime64)):
+        label = pd.Timestamp(label)
+        return (label.year, label.month)
+
+    text = str(label).strip()
+
+    month = ENGLISH_MONTHS.get(text.lower())
+    if month is not None:
+        return (0, month)
+
+    month = CHINESE_MONTHS.get(text)
+    if month is not None:
+        return (0, month)
+
+    match = YEAR_MONTH_PATTERN.match(text)
+    if match:
+        year, month = int(match.group(1)), int(match.group(2))
+        if 1 <= month <= 12:
+            return (year, month)
+        return None
+
+    match = NUMERIC_MONTH_PATTERN.match(text)
+    if match:
+        month = int(match.group(1))
+        if 1 <= month <= 12:
+            return (0, month)
+
+    return None
+
+def detect_month_columns(df):
+    """
+    自動找出寬表中的月份欄位，並依時間先後排序
+
+    Args:
+        df (pd.DataFrame): 寬表資料
+
+    Returns:
+        list: 依月份順序排列的欄位名稱
+    """
+    keyed = []
+    for position, col in enumerate(df.columns):
+        key = parse_month_label(col)
+        if key is not None:
+            keyed.append((key, position, col))
+    keyed.sort()
+    return [col for _, _, col in keyed]
+
+def clean_month_values(df, month_columns=None):
+    """
+    將所有月份欄位一次轉為數值
+
+    整個月份區塊攤平成單一欄位處理：原本就是數值的儲存格直接沿用，
+    其餘去掉逗號與空白後以 pd.to_numeric 轉換，無法解析 → NaN。
+
+    Args:
+        df (pd.DataFrame): 寬表資料
+        month_columns (list): 月份欄位，預設自動偵測
+
+    Returns:
+        pd.DataFrame: 月份欄位已轉為數值的新資料框
+    """
+    if month_columns is None:
+        month_columns = detect_month_columns(df)
+
+    df_clean = df.copy()
+    if not month_columns:
+        return df_clean
+
+    block = df_clean[month_columns].to_numpy(dtype=object)
+    flat = pd.Series(block.ravel())
+
+    values = pd.to_numeric(flat, errors='coerce')
+    needs_text = values.isna() & flat.notna()
+    if needs_text.any():
+        text = flat[needs_text].astype(str).str.replace(',', '', regex=False).str.strip()
+        values[needs_text] = pd.to_numeric(text, errors='coerce')
+
+    cleaned = values.to_numpy(dtype=float).reshape(block.shape)
+    df_clean[month_columns] = pd.DataFrame(cleaned, index=df_clean.index, columns=month_columns)
+    return df_clean
+
+def melt_month_columns(df, id_column, month_columns=None, var_name='month', value_name='revenue'):
+    """
+    將月份寬表轉為長表
+
+    從: id_column | Jan | Feb | ...
+    到: id_column | month | revenue
+
+    month 欄位為依時間排序的有序類別（ordered Categorical），
+    結果已依 id_column、month 排序。
+
+    Args:
+        df (pd.DataFrame): 寬表資料
+        id_column (str): 保持不變的識別欄位（如 product、region）
+        month_columns (list): 月份欄位，預設自動偵測
+        var_name (str): 月份欄位名稱
+        value_name (str): 數值欄位名稱
+
+    Returns:
+        pd.DataFrame: 長表資料
+    """
+    if month_columns is None:
+        month_columns = detect_month_columns(df)
+    else:
+        month_columns = sorted(month_columns, key=parse_month_label)
+
+    n_rows = len(df)
+    n_months = len(month_columns)
+
+    # 以 NumPy 重複/攤平取代逐格處理：每一列展開為 n_months 筆
+    ids = np.repeat(df[id_column].to_numpy(), n_months)
+    month_codes = np.tile(np.arange(n_months), n_rows)
+    values = df[month_columns].to_numpy().ravel()
+
+    months = pd.Categorical.from_codes(
+        month_codes,
+        categories=pd.Index(month_columns, dtype=object),
+        ordered=True
+    )
+
+    df_long = pd.DataFrame({id_column: ids, var_name: months, value_name: values})
+    df_long = df_long.sort_values([id_column, var_name], kind='stable').reset_index(drop=True)
+    return df_long
@@ -0,0 +1,47 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'main'))
+
+from heavy_hitters import DEFAULT_CAPACITY, HeavyHitters, top_items
+
+def test_top_items_keeps_negative_lines():
+    df = pd.DataFrame({'product': ['a', 'a', 'b'], 'amount': [100.0, -90.0, 50.0]})
+    result = top_items(df, 'product', 'amount', 2)
+    assert list(result.index) == ['b', 'a']
+    assert list(result) == [50.0, 10.0]
+
+def test_top_items_matches_groupby_without_negatives():
+    df = pd.DataFrame({'product': ['a', 'b', 'a', 'c', None], 'amount': [10.0, 30.0, 25.0, None, 5.0]})
+    expected = df.groupby('product')['amount'].sum().sort_values(ascending=False)
+    result = top_items(df, 'product', 'amount', 3)
+    assert list(result.index) == list(expected.index)
+    assert list(result) == list(expected)
+
+def _many_products():
+    # 1000 個營收 100 的產品，之後是 5000 個營收 99 的產品（品項數超過 capacity）
+    leaders = [f"top{i}" for i in range(DEFAULT_CAPACITY)]
+    others = [f"x{i}" for i in range(5000)]
+    return pd.DataFrame({'p': leaders + others, 'v': [100.0] * len(leaders) + [99.0] * len(others)})
+
+def test_top_items_is_exact_above_capacity():
+    result = top_items(_many_products(), 'p', 'v', 5)
+    # 前 1000 名同為 100，任取 5 個都正確
+    assert all(item.startswith('top') for item in result.index)
+    assert list(result) == [100.0] * 5
+
+def test_heavy_hitters_bounds_hold_above_capacity():
+    df = _many_products().sample(frac=1, random_state=0).reset_index(drop=True)
+    tracker = HeavyHitters('p', {'revenue': 'v'})
+    for start in range(0, len(df), 500):
+        tracker.update(df.iloc[start:start + 500])
+
+    truth = df.groupby('p')['v'].sum()
+    ranked = tracker.top(5, by='revenue')
+    actual = truth.reindex(ranked['p']).to_numpy()
+    assert np.all(ranked['lower_bound'].to_numpy() <= actual)
+    assert np.all(actual <= ranked['estimate'].to_numpy())
+    # 沒有明顯的大項目時不應宣稱保證
+    assert not ranked['guaranteed'].any()
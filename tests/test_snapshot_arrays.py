@@ -0,0 +1,59 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'main'))
+
+from filter_index import OrderFilterIndex
+from startup import shared_snapshot
+from table_paging import TableIndex
+
+def make_orders(n=200):
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({
+        'order_date': pd.to_datetime('2023-01-01') + pd.to_timedelta(rng.integers(0, 300, n), unit='D'),
+        'category': rng.choice(['文具', '書籍', '電子', None], n),
+        'product_name': rng.choice(['筆', '本子', '耳機'], n),
+        'discount': rng.choice([0.0, 0.05, 0.1], n),
+        'total_with_tax': rng.uniform(10, 2000, n)
+    })
+
+def build(df):
+    arrays = {**OrderFilterIndex(df).to_arrays('filter_index.'),
+              **TableIndex(df, ['order_date', 'category', 'total_with_tax']).to_arrays('table_index.')}
+    return df, {}, arrays
+
+def test_shared_snapshot_builds_once_and_maps_indexes(tmp_path):
+    df = make_orders()
+    calls = []
+
+    def build_once():
+        calls.append(1)
+        return build(df)
+
+    snapshot = shared_snapshot('orders', 'v1', build_once, str(tmp_path))
+    assert shared_snapshot('orders', 'v1', build_once, str(tmp_path)) is not None
+    assert len(calls) == 1
+
+    mapped, _, arrays = snapshot
+    index = OrderFilterIndex.from_arrays(mapped, arrays, 'filter_index.')
+    reference = OrderFilterIndex(df)
+    for selection in ({}, {'categories': ['書籍']}, {'start_date': '2023-03-10', 'end_date': '2023-08-01', 'min_amount': 900},
+                      {'groups': {'discount': [0.05]}}):
+        assert np.array_equal(index.rows(index.select(**selection)), reference.rows(reference.select(**selection)))
+        expected = reference.sum_by_groups(['product_name'], reference.select(**selection))
+        result = index.sum_by_groups(['product_name'], index.select(**selection))
+        pd.testing.assert_frame_equal(result, expected, check_index_type=False)
+
+    table = TableIndex.from_arrays(mapped, arrays, ['order_date', 'category', 'total_with_tax'], 'table_index.')
+    sort_by = [{'column_id': 'total_with_tax', 'direction': 'desc'}]
+    matches = np.flatnonzero((df['category'] == '書籍').to_numpy())
+    expected = matches[np.argsort(-df['total_with_tax'].to_numpy()[matches])]
+    assert np.array_equal(table.rows('{category} eq 書籍', sort_by), expected)
+
+def test_new_version_replaces_old_arrays(tmp_path):
+    df = make_orders(50)
+    shared_snapshot('orders', 'v1', lambda: build(df), str(tmp_path))
+    shared_snapshot('orders', 'v2', lambda: build(df), str(tmp_path))
+    assert sorted(entry for entry in os.listdir(tmp_path) if entry.endswith('.arrays')) == ['orders.v2.arrays']